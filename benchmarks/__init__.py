@@ -0,0 +1,5 @@
+"""Performance benchmarks for the Weather Aggregator.
+
+Benchmarks are run from the repository root as modules, e.g.:
+    python -m benchmarks.bench_http_session
+"""
@@ -0,0 +1,62 @@
+"""Benchmark: Scalar vs. Vectorized Bulk Aggregation.
+
+Aggregates the provider data points of many cities with the per-city
+average_city_weather_data function and with the columnar
+average_city_weather_data_bulk engine. The vectorized engine is timed both on
+prebuilt columns (as a columnar refresh pipeline would hold them) and including
+the conversion from and to CityWeatherData objects.
+
+Requires NumPy.
+
+Usage:
+    python -m benchmarks.bench_bulk_aggregation --cities 10000 --providers 2
+"""
+
+import argparse
+import random
+import time
+
+from bulk_aggregation import (average_city_weather_data_bulk, city_weather_data_from_bulk_result,
+                              weather_data_columns_from_city_weather_data)
+from city_weather_data import CityWeatherData, STALE_CUTOFF_NUM_SECONDS, WeatherCondition, average_city_weather_data
+
+
+def best_of(function, repeat: int) -> float:
+    """Returns the best wall time of several runs of function, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cities", type=int, default=10_000)
+    parser.add_argument("--providers", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    now = time.time()
+    conditions = list(WeatherCondition)
+    weather_data_rows = [[CityWeatherData(rng.uniform(-90, 90), rng.uniform(-180, 180),
+                                          int(now) - rng.randint(0, 2 * STALE_CUTOFF_NUM_SECONDS),
+                                          rng.uniform(-30, 45), rng.choice(conditions))
+                          for _ in range(args.providers)] for _ in range(args.cities)]
+    columns = weather_data_columns_from_city_weather_data(weather_data_rows)
+
+    scalar_ms = best_of(lambda: [average_city_weather_data(row, now=now) for row in weather_data_rows], args.repeat)
+    bulk_ms = best_of(lambda: average_city_weather_data_bulk(columns, now=now), args.repeat)
+    round_trip_ms = best_of(lambda: city_weather_data_from_bulk_result(average_city_weather_data_bulk(
+        weather_data_columns_from_city_weather_data(weather_data_rows), now=now)), args.repeat)
+
+    print(f"{args.cities} cities x {args.providers} providers")
+    print(f"           scalar: {scalar_ms:8.2f} ms")
+    print(f"  bulk (columnar): {bulk_ms:8.2f} ms ({scalar_ms / bulk_ms:.0f}x)")
+    print(f"bulk (w/ objects): {round_trip_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
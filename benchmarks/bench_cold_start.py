@@ -0,0 +1,103 @@
+"""Benchmark: Cold Start Import and First Invocation Time.
+
+Every sample runs in a fresh Python interpreter, as on a cold Lambda container, and measures:
+    - import: 'import lambda_function'.
+    - first invalid invocation: a request missing its 'city' parameter, which should not
+      import any heavy module.
+    - first valid invocation: a full request (providers stubbed in-process and DynamoDB
+      replaced by the local_dynamodb stand-in), which pays for the deferred imports.
+    - eager imports: the cost of importing city_weather_data and boto3 up front, which
+      every cold start paid before imports were deferred.
+
+Usage:
+    python -m benchmarks.bench_cold_start --runs 20
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+SAMPLE_SCRIPT = r'''
+import json, sys, time
+start = time.perf_counter()
+import lambda_function
+import_ms = (time.perf_counter() - start) * 1000
+
+class Context:
+    aws_request_id = "benchmark"
+
+start = time.perf_counter()
+lambda_function.lambda_handler({}, Context())
+invalid_ms = (time.perf_counter() - start) * 1000
+heavy_modules = [m for m in ("requests", "boto3", "city_weather_data") if m in sys.modules]
+
+valid_ms = None
+try:
+    import local_dynamodb
+except ImportError:
+    local_dynamodb = None
+
+if local_dynamodb is not None:
+    start = time.perf_counter()
+    import city_weather_data, ip_history
+    from open_meteo import OpenMeteoResponse
+    from weather_api import WeatherApiResponse
+    now = int(time.time())
+    city_weather_data.weather_api.fetch_data_weather_api = \
+        lambda city: WeatherApiResponse(city, "", 32.07, 34.76, now, 25.0, "Sunny", 1000)
+    city_weather_data.open_meteo.fetch_data_open_meteo_batch = \
+        lambda coordinates: [OpenMeteoResponse(lat, lon, None, 25.0, 0) for lat, lon in coordinates]
+    city_weather_data.geocode_cache.path = city_weather_data.geocode_cache.seed_path = None
+    ip_history.set_ip_table(local_dynamodb.LocalDynamoDBTable("ip"))
+    lambda_function.lambda_handler({"queryStringParameters": {"city": "Tel Aviv"},
+                                    "requestContext": {"http": {"sourceIp": "127.0.0.1"}}}, Context())
+    valid_ms = (time.perf_counter() - start) * 1000
+
+print("RESULT" + json.dumps({"import_ms": import_ms, "invalid_ms": invalid_ms, "valid_ms": valid_ms,
+                             "heavy_modules_after_invalid": heavy_modules}))
+'''
+
+EAGER_SCRIPT = r'''
+import json, time
+start = time.perf_counter()
+import city_weather_data
+try:
+    import boto3
+except ImportError:
+    pass
+print("RESULT" + json.dumps({"eager_ms": (time.perf_counter() - start) * 1000}))
+'''
+
+
+def run_sample(script: str) -> dict:
+    """Runs a script in a fresh interpreter and returns the JSON result it prints."""
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT_DIR, capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(next(line for line in output.splitlines() if line.startswith("RESULT"))[len("RESULT"):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="number of fresh interpreters to sample")
+    args = parser.parse_args()
+
+    samples = [run_sample(SAMPLE_SCRIPT) for _ in range(args.runs)]
+    eager_samples = [run_sample(EAGER_SCRIPT) for _ in range(args.runs)]
+
+    print(f"Median over {args.runs} fresh interpreters:")
+    print(f"  import lambda_function         {statistics.median(s['import_ms'] for s in samples):8.2f}ms")
+    print(f"  first invalid invocation       {statistics.median(s['invalid_ms'] for s in samples):8.2f}ms "
+          f"(heavy modules imported: {samples[0]['heavy_modules_after_invalid'] or 'none'})")
+    if samples[0]["valid_ms"] is not None:
+        print(f"  first valid invocation         {statistics.median(s['valid_ms'] for s in samples):8.2f}ms")
+    print(f"  eager city_weather_data+boto3  {statistics.median(s['eager_ms'] for s in eager_samples):8.2f}ms "
+          f"(previously paid by every cold start at import time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""Benchmark: End-to-End Lambda Invocations Against Local Provider and DynamoDB Stand-Ins.
+
+Drives lambda_function.lambda_handler through its whole request path, with:
+    - WeatherAPI and OpenMeteo replayed by benchmarks.stub_providers (recorded payloads,
+      configurable latency), run as a separate process so that its CPU time is not measured.
+    - The RequestIPLogs table replaced by the local_dynamodb stand-in (configurable latency).
+
+It reports, for every concurrency level:
+    - Throughput (invocations per second).
+    - Latency percentiles of whole invocations and of their stages: the IP history update,
+      the WeatherAPI and OpenMeteo calls, the weather fetch as a whole and the response
+      serialization.
+and, from a separate serial pass under tracemalloc, the memory allocated per invocation.
+
+Results can be saved and compared between commits:
+    git checkout main && python -m benchmarks.bench_end_to_end --output main.json
+    git checkout my-branch && python -m benchmarks.bench_end_to_end --compare main.json
+
+Usage:
+    python -m benchmarks.bench_end_to_end --concurrency 1,4,16 --requests 200 --cache cold \\
+        --weather-api-latency-ms 80 --open-meteo-latency-ms 40 --dynamodb-latency-ms 10
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+FIXTURE_CITIES = list(json.loads((ROOT_DIR / "benchmarks" / "fixtures" / "weather_api_current.json")
+                                 .read_text(encoding="utf-8")))
+
+PERCENTILES = (50, 95, 99)
+NUM_CLIENT_IPS = 100
+
+# (module name, function name) of every instrumented stage, looked up by their callers at call time
+STAGE_FUNCTIONS = {
+    "ip_history": ("ip_history", "update_ip_fields_in_db"),
+    "weather_api": ("weather_api", "fetch_data_weather_api"),
+    "open_meteo": ("open_meteo", "fetch_data_open_meteo_batch"),
+    "weather_fetch": ("city_weather_data", "fetch_cities_weather_data"),
+    "serialization": ("json_codec", "dumps"),
+}
+
+
+class Context:
+    """A minimal Lambda context with a unique request id per invocation."""
+    def __init__(self):
+        self.aws_request_id = str(uuid.uuid4())
+
+
+def percentiles_ms(samples_num_seconds: List[float]) -> Dict[str, float]:
+    """Returns the mean and the PERCENTILES of latency samples, in milliseconds."""
+    if not samples_num_seconds:
+        return {}
+    samples_ms = sorted(sample * 1000 for sample in samples_num_seconds)
+    quantiles = statistics.quantiles(samples_ms, n=100, method="inclusive") if len(samples_ms) > 1 \
+        else samples_ms * 99
+    return {"mean": statistics.fmean(samples_ms)} | {f"p{p}": quantiles[p - 1] for p in PERCENTILES}
+
+
+class StageTimer:
+    """Times the instrumented stage functions by replacing them with timing wrappers."""
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._originals = []
+
+    def install(self):
+        for stage, (module_name, function_name) in STAGE_FUNCTIONS.items():
+            module = sys.modules[module_name]
+            function = getattr(module, function_name)
+            self._originals.append((module, function_name, function))
+            setattr(module, function_name, self._timed(stage, function))
+
+    def uninstall(self):
+        for module, function_name, function in self._originals:
+            setattr(module, function_name, function)
+        self._originals.clear()
+
+    def _timed(self, stage: str, function: Callable) -> Callable:
+        samples = self.samples[stage]
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                # list.append is atomic, so samples of concurrent invocations do not need a lock
+                samples.append(time.perf_counter() - start)
+
+        return timed
+
+    def reset(self):
+        for samples in self.samples.values():
+            samples.clear()
+
+
+def start_stub_server(args) -> subprocess.Popen:
+    """Starts benchmarks.stub_providers in a separate process and points the provider clients at it."""
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.stub_providers", "--port", "0",
+                                "--weather-api-latency-ms", str(args.weather_api_latency_ms),
+                                "--open-meteo-latency-ms", str(args.open_meteo_latency_ms),
+                                "--jitter-ms", str(args.jitter_ms),
+                                "--error-rate", str(args.error_rate)],
+                               cwd=ROOT_DIR, stdout=subprocess.PIPE, text=True)
+    base_url = process.stdout.readline().strip().removeprefix("Serving on ")
+    os.environ["WEATHER_API_ENDPOINT"] = f"{base_url}/weatherapi/v1/current.json"
+    os.environ["OPEN_METEO_ENDPOINT"] = f"{base_url}/openmeteo/v1/forecast"
+    return process
+
+
+def make_events(num_requests: int, batch_size: int) -> List[dict]:
+    """Builds single-city (batch_size 0) or batch invocation events, cycling through the recorded cities."""
+    cities = itertools.cycle(FIXTURE_CITIES)
+    events = []
+    for i in range(num_requests):
+        request_context = {"http": {"sourceIp": f"10.0.0.{i % NUM_CLIENT_IPS}", "method": "GET"}}
+        if batch_size > 0:
+            query = {"cities": ",".join(next(cities) for _ in range(batch_size))}
+        else:
+            query = {"city": next(cities)}
+        events.append({"queryStringParameters": query, "requestContext": request_context})
+    return events
+
+
+def invoke(event: dict, cold_cache: bool) -> tuple:
+    """Invokes the handler once, returning its (status code, latency in seconds)."""
+    import city_weather_data
+    import lambda_function
+
+    if cold_cache:
+        city_weather_data.city_weather_data_cache.clear()
+        city_weather_data.geocode_cache.clear()
+
+    start = time.perf_counter()
+    response = lambda_function.lambda_handler(event, Context())
+    return response["statusCode"], time.perf_counter() - start
+
+
+def run_level(concurrency: int, events: List[dict], cold_cache: bool, stage_timer: StageTimer) -> dict:
+    """Runs all events with the given number of concurrent invocations."""
+    stage_timer.reset()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(lambda event: invoke(event, cold_cache), events))
+        elapsed_num_seconds = time.perf_counter() - start
+
+    latency_ms = {"total": percentiles_ms([latency for _, latency in results])}
+    latency_ms |= {stage: percentiles_ms(samples) for stage, samples in stage_timer.samples.items() if samples}
+    return {
+        "concurrency": concurrency,
+        "requests": len(events),
+        "throughput_rps": len(events) / elapsed_num_seconds,
+        "status_counts": {str(status): count for status, count in Counter(status for status, _ in results).items()},
+        "stage_calls": {stage: len(samples) for stage, samples in stage_timer.samples.items()},
+        "latency_ms": latency_ms,
+    }
+
+
+def measure_allocations(events: List[dict], cold_cache: bool) -> dict:
+    """Measures the memory allocated by serial invocations (peak and retained, per invocation)."""
+    peaks_kib, retained_kib = [], []
+    tracemalloc.start()
+    try:
+        for event in events:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            invoke(event, cold_cache)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks_kib.append((peak - before) / 1024)
+            retained_kib.append((current - before) / 1024)
+    finally:
+        tracemalloc.stop()
+
+    return {"requests": len(events), "peak_kib_mean": statistics.fmean(peaks_kib),
+            "peak_kib_max": max(peaks_kib), "retained_kib_mean": statistics.fmean(retained_kib)}
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict):
+    print(f"Commit {results['commit'] or 'unknown'}, config: {results['config']}")
+    for level in results["levels"]:
+        print(f"\nconcurrency {level['concurrency']:>3}: {level['throughput_rps']:8.1f} req/s, "
+              f"status codes {level['status_counts']}")
+        for stage, stats in level["latency_ms"].items():
+            print(f"  {stage:<14} " + "  ".join(f"{name} {value:8.2f}ms" for name, value in stats.items())
+                  + f"  ({level['stage_calls'].get(stage, level['requests'])} calls)")
+    allocations = results["allocations"]
+    print(f"\nallocations over {allocations['requests']} serial invocations: "
+          f"peak {allocations['peak_kib_mean']:.1f} KiB mean / {allocations['peak_kib_max']:.1f} KiB max, "
+          f"retained {allocations['retained_kib_mean']:.1f} KiB mean")
+
+
+def print_comparison(baseline: dict, results: dict):
+    """Prints every metric of the current results next to the baseline's, with the relative change."""
+    def row(name: str, old: Optional[float], new: Optional[float]):
+        if old is None or new is None:
+            return
+        change = f"{(new - old) / old * 100:+7.1f}%" if old else "      -"
+        print(f"  {name:<32} {old:10.2f} {new:10.2f} {change}")
+
+    print(f"\nComparison with {baseline['commit'] or 'baseline'} (baseline, current, change):")
+    if baseline["config"] != results["config"]:
+        print(f"  warning: configs differ, baseline config: {baseline['config']}")
+
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in results["levels"]:
+        old_level = baseline_levels.get(level["concurrency"])
+        if old_level is None:
+            continue
+        print(f" concurrency {level['concurrency']}")
+        row("throughput (req/s)", old_level["throughput_rps"], level["throughput_rps"])
+        for stage, stats in level["latency_ms"].items():
+            for name, value in stats.items():
+                row(f"{stage} {name} (ms)", old_level["latency_ms"].get(stage, {}).get(name), value)
+    row("allocations peak mean (KiB)", baseline["allocations"]["peak_kib_mean"],
+        results["allocations"]["peak_kib_mean"])
+    row("allocations retained mean (KiB)", baseline["allocations"]["retained_kib_mean"],
+        results["allocations"]["retained_kib_mean"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="invocations per concurrency level")
+    parser.add_argument("--batch-size", type=int, default=0, help="cities per batch request (0 for single-city)")
+    parser.add_argument("--cache", choices=("cold", "warm"), default="cold",
+                        help="cold clears the weather and geocode caches before every invocation")
+    parser.add_argument("--weather-api-latency-ms", type=float, default=80.0)
+    parser.add_argument("--open-meteo-latency-ms", type=float, default=40.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of provider requests answered with a 503 (exercises retries)")
+    parser.add_argument("--dynamodb-latency-ms", type=float, default=10.0)
+    parser.add_argument("--alloc-requests", type=int, default=50, help="serial invocations traced for allocations")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results with a JSON file written by --output")
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    cold_cache = args.cache == "cold"
+
+    stub_server = start_stub_server(args)
+    # the geocode cache must not read or persist entries across runs
+    os.environ["GEOCODE_CACHE_PATH"] = os.environ["GEOCODE_CACHE_SEED_PATH"] = ""
+    try:
+        import city_weather_data  # noqa: F401 (imported before instrumenting its functions)
+        import ip_history
+        import json_codec  # noqa: F401
+        from local_dynamodb import LocalDynamoDBTable
+
+        ip_history.set_ip_table(LocalDynamoDBTable("ip", args.dynamodb_latency_ms / 1000))
+        stage_timer = StageTimer()
+        stage_timer.install()
+
+        levels = []
+        # the service logs every invocation, which would dominate the measurements when written to a terminal
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            # warms up connections, imports and the providers' latency trackers
+            run_level(4, make_events(2 * len(FIXTURE_CITIES), args.batch_size), cold_cache, stage_timer)
+            for concurrency in (int(level) for level in args.concurrency.split(",")):
+                levels.append(run_level(concurrency, make_events(args.requests, args.batch_size), cold_cache,
+                                        stage_timer))
+            stage_timer.uninstall()
+            allocations = measure_allocations(make_events(args.alloc_requests, args.batch_size), cold_cache)
+    finally:
+        stub_server.terminate()
+        stub_server.wait()
+
+    results = {"commit": get_commit(), "python": sys.version.split()[0], "config": config,
+               "levels": levels, "allocations": allocations}
+    print_results(results)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        print_comparison(json.loads(Path(args.compare).read_text()), results)
+
+
+if __name__ == "__main__":
+    main()
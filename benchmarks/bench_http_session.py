@@ -0,0 +1,96 @@
+"""Benchmark: Pooled Keep-Alive Sessions vs. a New Connection per Request.
+
+Measures the per-request latency of bare requests.get calls (a new TCP, and for
+https URLs a new TLS, connection every time, as on every invocation before pooling)
+against the shared sessions of the http_session module (connection reused by a
+warm container). The difference is the handshake time saved per warm invocation.
+
+By default the benchmark targets a local keep-alive HTTP server, which isolates the
+TCP handshake cost. Pass --url to measure against a real provider endpoint, where
+the TLS handshake and network round trips dominate, e.g.:
+    python -m benchmarks.bench_http_session --url "https://api.open-meteo.com/v1/forecast?latitude=52.52&longitude=13.41&current_weather=true"
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List
+
+import requests
+
+import http_session
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Serves a small JSON body over HTTP/1.1 so that connections can be kept alive."""
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, so avoid Nagle + delayed ACK stalls on kept-alive sockets
+    disable_nagle_algorithm = True
+    body = b'{"current_weather": {"temperature": 20.0, "weathercode": 0}}'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_local_server() -> ThreadingHTTPServer:
+    """Starts a keep-alive HTTP server on an ephemeral localhost port in a daemon thread."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(request_function: Callable[[], requests.Response], num_requests: int) -> List[float]:
+    """Returns the latency in milliseconds of each of num_requests sequential calls."""
+    latencies_ms = []
+    for _ in range(num_requests):
+        start = time.perf_counter()
+        request_function().raise_for_status()
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+    return latencies_ms
+
+
+def report(label: str, latencies_ms: List[float]):
+    latencies_ms = sorted(latencies_ms)
+    p95 = latencies_ms[int(len(latencies_ms) * 0.95) - 1]
+    print(f"{label:<32} mean={statistics.mean(latencies_ms):8.3f}ms "
+          f"p50={statistics.median(latencies_ms):8.3f}ms p95={p95:8.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="endpoint to benchmark (defaults to a local keep-alive server)")
+    parser.add_argument("--requests", type=int, default=200, help="number of requests per mode")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = start_local_server()
+        url = f"http://127.0.0.1:{server.server_address[1]}/v1/forecast"
+
+    config = http_session.HttpSessionConfig("BENCHMARK", connect_timeout_num_seconds=5.0,
+                                            read_timeout_num_seconds=10.0)
+
+    print(f"Benchmarking {args.requests} sequential GET requests to {url}")
+    report("new connection per request", measure(lambda: requests.get(url, timeout=config.timeout),
+                                                  args.requests))
+    # first request opens the pooled connection, as on a cold container
+    http_session.session_get(config, url)
+    report("pooled keep-alive session", measure(lambda: http_session.session_get(config, url), args.requests))
+
+    http_session.close_sessions()
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark: Offline Bulk Re-Normalization Throughput.
+
+Builds a synthetic archive from the recorded provider payloads (see fixtures/), one
+WeatherAPI and one OpenMeteo response per record, and streams it through
+renormalize.renormalize_archive with an increasing number of worker processes,
+reporting the records/s of each run overall and per core.
+
+Usage:
+    python -m benchmarks.bench_renormalize --records 200000 --workers 1,2,4
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import tempfile
+
+import renormalize
+from benchmarks.stub_providers import FIXTURES_DIR
+
+
+def write_archive(path: str, num_records: int):
+    """Writes num_records archive lines, cycling through the recorded cities with perturbed temperatures."""
+    with open(FIXTURES_DIR / "weather_api_current.json", encoding="utf-8") as f:
+        weather_api_payloads = list(json.load(f).values())
+    with open(FIXTURES_DIR / "open_meteo_forecast.json", encoding="utf-8") as f:
+        open_meteo_payloads = json.load(f)
+
+    rng = random.Random(0)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(num_records):
+            weather_api_payload = weather_api_payloads[i % len(weather_api_payloads)]
+            open_meteo_payload = open_meteo_payloads[i % len(open_meteo_payloads)]
+            weather_api_payload["current"]["temp_c"] = round(rng.uniform(-10, 35), 1)
+            f.write(json.dumps({"city": weather_api_payload["location"]["name"],
+                                "archived_at": weather_api_payload["current"]["last_updated_epoch"] + 600,
+                                "responses": {"WeatherAPI": weather_api_payload,
+                                              "OpenMeteo": open_meteo_payload}}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, 2, os.cpu_count() or 1})),
+                        help="comma-separated worker counts to run with")
+    parser.add_argument("--format", choices=renormalize.OUTPUT_FORMATS, default="jsonl")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        archive_path = os.path.join(temp_dir, "archive.jsonl")
+        write_archive(archive_path, args.records)
+        print(f"{args.records} records, {os.path.getsize(archive_path) / 1e6:.0f} MB, {os.cpu_count()} cores")
+
+        for num_workers in (int(n) for n in args.workers.split(",")):
+            with open(archive_path, encoding="utf-8") as input_file:
+                stats = renormalize.renormalize_archive(input_file, io.StringIO(), num_workers,
+                                                        output_format=args.format)
+            print(f"{num_workers:>3} workers: {stats.records_per_second:>9.0f} records/s, "
+                  f"{stats.records_per_second_per_core:>7.0f} records/s per core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark: Response Serialization Cost.
+
+Measures the cost of building a batch response body for many cities:
+    - double-encoded: every city's weather is serialized to a JSON string with to_json,
+      and the body (embedding those strings) is serialized again, as before.
+    - single-pass: every city's weather is converted with to_dict and the whole body is
+      serialized once with the json_codec backend (orjson, when installed).
+    - single-pass (json): the same with the standard library json module.
+
+Usage:
+    python -m benchmarks.bench_serialization --cities 50 --number 2000
+"""
+
+import argparse
+import json
+import random
+import time
+import timeit
+
+import json_codec
+from city_weather_data import CityWeatherData, WeatherCondition
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cities", type=int, default=50, help="cities per response")
+    parser.add_argument("--number", type=int, default=2000, help="responses serialized per strategy")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    now = int(time.time())
+    conditions = list(WeatherCondition)
+    weather_data_list = [CityWeatherData(rng.uniform(-90, 90), rng.uniform(-180, 180), now - rng.randrange(0, 900, 60),
+                                         rng.uniform(-30, 45), rng.sample(conditions, rng.randint(1, 2)))
+                         for _ in range(args.cities)]
+
+    strategies = {
+        "double-encoded": lambda: json.dumps({"requestId": "id", "cities": [
+            {"status": 200, "weather": data.to_json()} for data in weather_data_list]}),
+        f"single-pass ({json_codec.BACKEND_NAME})": lambda: json_codec.dumps({"requestId": "id", "cities": [
+            {"status": 200, "weather": data.to_dict()} for data in weather_data_list]}),
+        "single-pass (json)": lambda: json.dumps({"requestId": "id", "cities": [
+            {"status": 200, "weather": data.to_dict()} for data in weather_data_list]}),
+    }
+
+    for name, serialize in strategies.items():
+        num_seconds = min(timeit.repeat(serialize, number=args.number, repeat=3))
+        print(f"{name:>22}: {num_seconds / args.number * 1e6:8.1f} us/response "
+              f"({len(serialize())} bytes, {args.cities} cities)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark: Upstream Calls of Concurrent Requests for Trending Cities, With and Without Single-Flight.
+
+Simulates bursts of concurrent requests for a few trending cities hitting a cold cache
+(e.g. right after the cached aggregates expire), with the providers replayed by an
+in-process benchmarks.stub_providers server. Every burst is run once with
+city_weather_data.SINGLE_FLIGHT_ENABLED and once without, and the number of upstream
+provider requests and the request latencies are reported for both.
+
+Usage:
+    python -m benchmarks.bench_single_flight --bursts 10 --burst-size 50 --cities 3
+"""
+
+import argparse
+import contextlib
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_end_to_end import FIXTURE_CITIES
+from benchmarks.stub_providers import StubProviderServer
+
+
+def run_burst(city_names, burst_size: int) -> list:
+    """Fires burst_size concurrent fetches at once, cycling through city_names, and returns their latencies."""
+    import city_weather_data
+
+    city_weather_data.city_weather_data_cache.clear()
+    city_weather_data.geocode_cache.clear()
+    all_requests_ready = threading.Barrier(burst_size)
+
+    def fetch(i: int) -> float:
+        city_name = city_names[i % len(city_names)]
+        all_requests_ready.wait()
+        start = time.perf_counter()
+        city_weather_data.fetch_cities_weather_data([city_name])
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=burst_size) as executor:
+        return list(executor.map(fetch, range(burst_size)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--burst-size", type=int, default=50, help="concurrent requests per burst")
+    parser.add_argument("--cities", type=int, default=3, help="number of trending cities shared by a burst")
+    parser.add_argument("--weather-api-latency-ms", type=float, default=80.0)
+    parser.add_argument("--open-meteo-latency-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    os.environ["GEOCODE_CACHE_PATH"] = os.environ["GEOCODE_CACHE_SEED_PATH"] = ""
+    os.environ.setdefault("FETCH_MAX_WORKERS", str(2 * args.burst_size))
+    os.environ.setdefault("WEATHER_API_POOL_MAXSIZE", str(args.burst_size))
+    import city_weather_data
+
+    city_names = FIXTURE_CITIES[:args.cities]
+    with StubProviderServer(weather_api_latency_num_seconds=args.weather_api_latency_ms / 1000,
+                            open_meteo_latency_num_seconds=args.open_meteo_latency_ms / 1000) as stub_server:
+        city_weather_data.weather_api.WEATHER_API_ENDPOINT = stub_server.weather_api_endpoint
+        city_weather_data.open_meteo.OPEN_METEO_ENDPOINT = stub_server.open_meteo_endpoint
+
+        print(f"{args.bursts} bursts of {args.burst_size} concurrent requests for {len(city_names)} cities, "
+              f"cold cache:")
+        for single_flight_enabled in (False, True):
+            city_weather_data.SINGLE_FLIGHT_ENABLED = single_flight_enabled
+            stub_server.request_counts.clear()
+            latencies = []
+            # the service logs every provider call, which would dominate the measurements when written to a terminal
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                for _ in range(args.bursts):
+                    latencies += run_burst(city_names, args.burst_size)
+
+            upstream_calls = sum(stub_server.request_counts.values())
+            quantiles = statistics.quantiles(latencies, n=100)
+            print(f"  single-flight {'on ' if single_flight_enabled else 'off'}: "
+                  f"{upstream_calls / args.bursts:7.1f} upstream calls per burst "
+                  f"({dict(stub_server.request_counts)}), "
+                  f"latency p50 {quantiles[49] * 1000:7.2f}ms p95 {quantiles[94] * 1000:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark: Nearest Known City Lookup.
+
+Measures the per-lookup cost of finding the nearest indexed location within a radius,
+as done for every coordinate query (see city_weather_data.fetch_location_weather_data),
+with the grid SpatialIndex against a linear scan over every location. Locations are
+clustered around random 'metro areas', like resolved cities, and queried around them.
+
+Usage:
+    python -m benchmarks.bench_spatial_index --locations 100000 --radius-km 5
+"""
+
+import argparse
+import random
+import timeit
+
+from spatial_index import SpatialIndex, haversine_distance_km
+
+NUM_METRO_AREAS = 2000
+METRO_AREA_SPREAD_DEGREES = 0.5
+NUM_QUERIES = 1000
+
+
+def random_location(rng: random.Random, centers):
+    latitude, longitude = rng.choice(centers)
+    return (max(-90.0, min(90.0, latitude + rng.gauss(0, METRO_AREA_SPREAD_DEGREES))),
+            (longitude + rng.gauss(0, METRO_AREA_SPREAD_DEGREES) + 180) % 360 - 180)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--locations", type=int, default=100_000, help="number of indexed locations")
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    centers = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(NUM_METRO_AREAS)]
+    locations = [random_location(rng, centers) for _ in range(args.locations)]
+    queries = [random_location(rng, centers) for _ in range(NUM_QUERIES)]
+
+    index = SpatialIndex()
+    for i, (latitude, longitude) in enumerate(locations):
+        index.insert(latitude, longitude, i)
+
+    def grid_lookups():
+        return sum(index.nearest(latitude, longitude, args.radius_km) is not None for latitude, longitude in queries)
+
+    def linear_scan(latitude, longitude):
+        distance_km = min(haversine_distance_km(latitude, longitude, *location) for location in locations)
+        return distance_km <= args.radius_km
+
+    num_found = grid_lookups()
+    total = min(timeit.repeat(grid_lookups, number=1, repeat=5))
+    print(f"{len(index)} locations, {num_found}/{NUM_QUERIES} queries within {args.radius_km} km")
+    print(f"{'grid index':>12}: {total / NUM_QUERIES * 1e6:.1f} us/lookup")
+
+    sample = queries[:20]
+    total = timeit.timeit(lambda: [linear_scan(*query) for query in sample], number=1)
+    print(f"{'linear scan':>12}: {total / len(sample) * 1e6:.1f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Benchmark: Weather Condition Classification.
+
+Compares the per-call cost of classifying a provider weather description with the
+text normalization rules (applied to every data point before code tables existed)
+against resolving the provider's weather code through the precompiled
+WEATHER_CONDITIONS_BY_PROVIDER_CODE table, over every known code of both providers.
+
+Usage:
+    python -m benchmarks.bench_weather_condition --number 200
+"""
+
+import argparse
+import timeit
+
+import weather_code_tables
+from city_weather_data import (OPEN_METEO_PROVIDER_NAME, WEATHER_API_PROVIDER_NAME, get_weather_condition,
+                               convert_weather_condition_text_to_weather_condition)
+
+SAMPLES = ([(OPEN_METEO_PROVIDER_NAME, code, description)
+            for code, (description, _) in weather_code_tables.OPEN_METEO_WEATHER_CODES.items()]
+           + [(WEATHER_API_PROVIDER_NAME, code, description)
+              for code, (description, _) in weather_code_tables.WEATHER_API_WEATHER_CODES.items()])
+
+
+def classify_by_text():
+    for _, _, description in SAMPLES:
+        convert_weather_condition_text_to_weather_condition(description)
+
+
+def classify_by_code():
+    for provider_name, code, description in SAMPLES:
+        get_weather_condition(provider_name, code, description)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200, help="passes over all known codes per strategy")
+    args = parser.parse_args()
+
+    num_calls = args.number * len(SAMPLES)
+    for name, function in (("text classifier", classify_by_text), ("code table", classify_by_code)):
+        total = min(timeit.repeat(function, number=args.number, repeat=5))
+        print(f"{name:>16}: {total / num_calls * 1e6:.3f} us/call over {len(SAMPLES)} codes")
+
+
+if __name__ == "__main__":
+    main()
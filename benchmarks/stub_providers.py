@@ -0,0 +1,271 @@
+"""Local Stand-In for the WeatherAPI and OpenMeteo Services.
+
+Serves recorded WeatherAPI current.json and OpenMeteo forecast payloads (see fixtures/)
+over keep-alive HTTP/1.1, with a configurable latency per provider, so that the whole
+request path (HTTP sessions, parsing, normalization, aggregation) can be benchmarked
+without network access or API quotas.
+
+Replay rules:
+    - WeatherAPI: the 'q' parameter is looked up (case, accent and whitespace insensitive)
+      in weather_api_current.json. Unknown cities are answered like the real service,
+      with a 400 response carrying error code 1006.
+    - OpenMeteo: comma-separated 'latitude'/'longitude' lists are answered with one
+      recorded payload per location (a list for several locations, an object for one).
+      Locations without a recording get the first recording, moved to the requested coordinates.
+    - Timestamps are moved to the start of the current 15 minute period, so that replayed
+      data is never filtered out as stale.
+
+Failures can be injected, to exercise the clients' retries: a random share of the requests
+(error_rate) is answered with a 503, and the next requests to a provider can be made to
+fail with a given status or a connection reset (see StubProviderServer.fail_next_requests).
+
+The server runs in-process (StubProviderServer) or, to keep its CPU time out of the
+measured process, as a separate process:
+    python -m benchmarks.stub_providers --port 8080 --weather-api-latency-ms 80 --open-meteo-latency-ms 40
+with the service pointed at it through WEATHER_API_ENDPOINT and OPEN_METEO_ENDPOINT.
+"""
+
+import argparse
+import copy
+import json
+import random
+import socket
+import struct
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from geocode_cache import normalize_city_name
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+WEATHER_API_PATH = "/weatherapi/v1/current.json"
+OPEN_METEO_PATH = "/openmeteo/v1/forecast"
+
+# replayed payloads are re-stamped with the start of the current period, like providers publishing every 15 minutes
+REPLAY_PERIOD_NUM_SECONDS = 15 * 60
+
+WEATHER_API_CITY_NOT_FOUND_BODY = json.dumps(
+    {"error": {"code": 1006, "message": "No matching location found."}}).encode("utf-8")
+INJECTED_FAILURE_BODY = json.dumps({"error": {"code": 9999, "message": "Injected failure."}}).encode("utf-8")
+
+# an injected failure closing the connection with a TCP reset instead of answering
+RESET_CONNECTION = "reset"
+
+
+class RecordedPayloads:
+    """The recorded provider payloads, re-stamped and encoded once per replay period."""
+    def __init__(self, fixtures_dir: Path = FIXTURES_DIR):
+        with open(fixtures_dir / "weather_api_current.json", encoding="utf-8") as f:
+            self._weather_api = {normalize_city_name(city): payload for city, payload in json.load(f).items()}
+        with open(fixtures_dir / "open_meteo_forecast.json", encoding="utf-8") as f:
+            self._open_meteo = {(payload["latitude"], payload["longitude"]): payload for payload in json.load(f)}
+        self._default_open_meteo = next(iter(self._open_meteo.values()))
+        self._lock = threading.Lock()
+        self._period_epoch = None
+        self._weather_api_bodies: Dict[str, bytes] = {}
+        self._open_meteo_payloads: Dict[Tuple[float, float], dict] = {}
+
+    def _restamp(self):
+        period_epoch = int(time.time()) // REPLAY_PERIOD_NUM_SECONDS * REPLAY_PERIOD_NUM_SECONDS
+        if period_epoch == self._period_epoch:
+            return
+        with self._lock:
+            if period_epoch == self._period_epoch:
+                return
+            period_time = datetime.fromtimestamp(period_epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M")
+
+            weather_api_bodies = {}
+            for city, payload in self._weather_api.items():
+                payload = copy.deepcopy(payload)
+                payload["current"]["last_updated_epoch"] = period_epoch
+                weather_api_bodies[city] = json.dumps(payload).encode("utf-8")
+
+            open_meteo_payloads = {}
+            for coordinates, payload in self._open_meteo.items():
+                payload = copy.deepcopy(payload)
+                payload["current_weather"]["time"] = period_time
+                open_meteo_payloads[coordinates] = payload
+
+            self._weather_api_bodies, self._open_meteo_payloads = weather_api_bodies, open_meteo_payloads
+            self._period_epoch = period_epoch
+
+    def weather_api_body(self, city_name: str) -> Optional[bytes]:
+        """Returns the encoded current.json payload of a city, or None if it was not recorded."""
+        self._restamp()
+        return self._weather_api_bodies.get(normalize_city_name(city_name))
+
+    def open_meteo_payload(self, latitude: float, longitude: float) -> dict:
+        """Returns the forecast payload of a location, falling back to the first recording moved to it."""
+        self._restamp()
+        payload = self._open_meteo_payloads.get((latitude, longitude))
+        if payload is None:
+            payload = dict(self._open_meteo_payloads[(self._default_open_meteo["latitude"],
+                                                      self._default_open_meteo["longitude"])],
+                           latitude=latitude, longitude=longitude)
+        return payload
+
+
+class StubProviderHandler(BaseHTTPRequestHandler):
+    """Replays the recorded payloads of the server's RecordedPayloads."""
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, so avoid Nagle + delayed ACK stalls on kept-alive sockets
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        provider_name = {WEATHER_API_PATH: "WeatherAPI", OPEN_METEO_PATH: "OpenMeteo"}.get(url.path)
+
+        if provider_name is not None:
+            self.server.simulate_latency(provider_name)
+            failure = self.server.next_failure(provider_name)
+            if failure == RESET_CONNECTION:
+                # a zero linger time makes closing the socket send a RST
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                self.close_connection = True
+                return
+            elif failure is not None:
+                self.send_body(failure, INJECTED_FAILURE_BODY)
+                return
+
+        if url.path == WEATHER_API_PATH:
+            body = self.server.payloads.weather_api_body(params.get("q", ""))
+            if body is None:
+                self.send_body(400, WEATHER_API_CITY_NOT_FOUND_BODY)
+            else:
+                self.send_body(200, body)
+        elif url.path == OPEN_METEO_PATH:
+            try:
+                coordinates = list(zip((float(lat) for lat in params["latitude"].split(",")),
+                                       (float(lon) for lon in params["longitude"].split(","))))
+            except (KeyError, ValueError):
+                self.send_body(400, b'{"error": true, "reason": "Invalid latitude or longitude"}')
+                return
+            payloads = [self.server.payloads.open_meteo_payload(lat, lon) for lat, lon in coordinates]
+            self.send_body(200, json.dumps(payloads if len(payloads) > 1 else payloads[0]).encode("utf-8"))
+        else:
+            self.send_body(404, b'{"error": "Not found"}')
+
+    def send_body(self, status_code: int, body: bytes):
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubProviderServer(ThreadingHTTPServer):
+    """A threaded HTTP server replaying recorded WeatherAPI and OpenMeteo payloads.
+
+        Attributes:
+            latencies_num_seconds: The latency added to every response, per provider name.
+            jitter_num_seconds: Upper bound of a uniformly distributed extra latency.
+            error_rate: The probability of a request being answered with a 503.
+            request_counts: Number of requests served per provider name.
+    """
+    daemon_threads = True
+    # bursts of concurrent requests open many connections at once, which overflow the default listen backlog of 5
+    request_queue_size = 1024
+
+    def __init__(self, port: int = 0, weather_api_latency_num_seconds: float = 0.0,
+                 open_meteo_latency_num_seconds: float = 0.0, jitter_num_seconds: float = 0.0,
+                 fixtures_dir: Path = FIXTURES_DIR, error_rate: float = 0.0):
+        super().__init__(("127.0.0.1", port), StubProviderHandler)
+        self.payloads = RecordedPayloads(fixtures_dir)
+        self.latencies_num_seconds = {"WeatherAPI": weather_api_latency_num_seconds,
+                                      "OpenMeteo": open_meteo_latency_num_seconds}
+        self.jitter_num_seconds = jitter_num_seconds
+        self.error_rate = error_rate
+        self.request_counts = Counter()
+        self._request_counts_lock = threading.Lock()
+        self._injected_failures = defaultdict(deque)
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @property
+    def weather_api_endpoint(self) -> str:
+        return self.base_url + WEATHER_API_PATH
+
+    @property
+    def open_meteo_endpoint(self) -> str:
+        return self.base_url + OPEN_METEO_PATH
+
+    def simulate_latency(self, provider_name: str):
+        with self._request_counts_lock:
+            self.request_counts[provider_name] += 1
+        latency_num_seconds = self.latencies_num_seconds[provider_name] + random.uniform(0, self.jitter_num_seconds)
+        if latency_num_seconds > 0:
+            time.sleep(latency_num_seconds)
+
+    def fail_next_requests(self, provider_name: str, *failures: Union[int, str]):
+        """Makes the next requests to a provider fail, in order.
+
+            Args:
+                provider_name: 'WeatherAPI' or 'OpenMeteo'.
+                *failures: HTTP status codes to answer with, or RESET_CONNECTION.
+        """
+        with self._request_counts_lock:
+            self._injected_failures[provider_name].extend(failures)
+
+    def next_failure(self, provider_name: str) -> Optional[Union[int, str]]:
+        """Returns the failure the current request to a provider should end with, or None to answer it."""
+        with self._request_counts_lock:
+            if self._injected_failures[provider_name]:
+                return self._injected_failures[provider_name].popleft()
+        return 503 if self.error_rate > 0 and random.random() < self.error_rate else None
+
+    def start(self) -> "StubProviderServer":
+        """Serves requests on a background daemon thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops serving and closes the listening socket."""
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=0, help="port to listen on (0 picks a free port)")
+    parser.add_argument("--weather-api-latency-ms", type=float, default=0.0)
+    parser.add_argument("--open-meteo-latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniformly distributed extra latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    args = parser.parse_args()
+
+    server = StubProviderServer(args.port, args.weather_api_latency_ms / 1000, args.open_meteo_latency_ms / 1000,
+                                args.jitter_ms / 1000, error_rate=args.error_rate)
+    # the first line is parsed by benchmarks that start the server as a subprocess
+    print(f"Serving on {server.base_url}", flush=True)
+    print(f"  WEATHER_API_ENDPOINT={server.weather_api_endpoint}", flush=True)
+    print(f"  OPEN_METEO_ENDPOINT={server.open_meteo_endpoint}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Per-Provider Circuit Breaker Module.
+
+This module provides a circuit breaker that stops calling a weather service provider
+once it keeps failing, so that during an outage requests fail fast instead of each
+waiting for a provider call to time out.
+
+The breaker follows the classic three-state scheme:
+    - closed: Calls go through. Consecutive failures are counted, and reaching
+      failure_threshold opens the circuit.
+    - open: Calls are rejected with a CircuitOpenError without reaching the provider,
+      until reset_timeout_num_seconds have passed.
+    - half open: A single trial call goes through. Its success closes the circuit, its
+      failure opens it again for another reset_timeout_num_seconds.
+"""
+
+import threading
+import time
+from typing import Callable
+
+from weather_service import WeatherServiceError
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(WeatherServiceError):
+    """Raised instead of calling a provider whose circuit is open.
+
+        Attributes:
+            provider_name: The name of the provider whose circuit is open.
+            retry_after_num_seconds: The time left until a trial call is let through.
+    """
+    def __init__(self, provider_name: str, retry_after_num_seconds: float):
+        self.provider_name = provider_name
+        self.retry_after_num_seconds = retry_after_num_seconds
+
+    def __repr__(self):
+        """Returns a string representation of the CircuitOpenError instance."""
+        return f"{self.__class__.__name__}({self.provider_name!r}, {self.retry_after_num_seconds!r})"
+
+
+class CircuitBreaker:
+    """A thread-safe circuit breaker guarding the calls to a single provider.
+
+        Attributes:
+            name: The name of the guarded provider.
+            failure_threshold: The number of consecutive failures that opens the circuit.
+            reset_timeout_num_seconds: How long the circuit stays open before a trial call is let through.
+    """
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout_num_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """Initializes a closed circuit breaker.
+
+            Args:
+                name: The name of the guarded provider.
+                failure_threshold: The number of consecutive failures that opens the circuit.
+                reset_timeout_num_seconds: How long the circuit stays open before a trial call.
+                clock: The source of the current monotonic time, replaceable in tests.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_num_seconds = reset_timeout_num_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CIRCUIT_CLOSED
+        self._num_consecutive_failures = 0
+        self._opened_at = 0.0
+
+    def __repr__(self):
+        """Returns a string representation of the CircuitBreaker instance."""
+        return f"{self.__class__.__name__}({self.name!r}, state={self.state!r})"
+
+    @property
+    def state(self) -> str:
+        """The current state: CIRCUIT_CLOSED, CIRCUIT_OPEN or CIRCUIT_HALF_OPEN."""
+        with self._lock:
+            return self._state
+
+    def before_call(self):
+        """Admits a call, or rejects it if the circuit is open (or a half open trial call is in flight).
+
+            Raises:
+                CircuitOpenError: If the call must not reach the provider.
+        """
+        with self._lock:
+            if self._state == CIRCUIT_CLOSED:
+                return
+
+            retry_after_num_seconds = self._opened_at + self.reset_timeout_num_seconds - self._clock()
+            if self._state == CIRCUIT_OPEN and retry_after_num_seconds <= 0:
+                print(f"Circuit of {self.name} is half open, letting a trial call through")
+                self._state = CIRCUIT_HALF_OPEN
+                return
+
+            raise CircuitOpenError(self.name, max(retry_after_num_seconds, 0.0))
+
+    def record_success(self):
+        """Records a successful call, closing the circuit."""
+        with self._lock:
+            if self._state != CIRCUIT_CLOSED:
+                print(f"Circuit of {self.name} is closed again")
+            self._state = CIRCUIT_CLOSED
+            self._num_consecutive_failures = 0
+
+    def record_failure(self):
+        """Records a failed call, opening the circuit once failure_threshold is reached (or on a failed trial)."""
+        with self._lock:
+            self._num_consecutive_failures += 1
+            if self._state == CIRCUIT_HALF_OPEN or self._num_consecutive_failures >= self.failure_threshold:
+                if self._state != CIRCUIT_OPEN:
+                    print(f"Circuit of {self.name} is open after {self._num_consecutive_failures} consecutive failures")
+                self._state = CIRCUIT_OPEN
+                self._opened_at = self._clock()
+
+    def reset(self):
+        """Closes the circuit and forgets all recorded failures."""
+        with self._lock:
+            self._state = CIRCUIT_CLOSED
+            self._num_consecutive_failures = 0
@@ -6,45 +6,43 @@ API responses into a unified format, and creating a standardized, averaged city
 object while filtering out stale or invalid information.
 
 Main components:
-    - WeatherCondition: Unified enum for cross-provider weather states.
+    - WeatherCondition: Unified enum for cross-provider weather states (defined in weather_condition).
     - CityWeatherData: The primary data model for aggregated results.
-    - Data Processing: Functions for text-to-enum mapping and multi-source averaging.
+    - Data Processing: Functions for code/text-to-enum mapping and multi-source averaging.
+    - Provider Registration: WeatherAPI (primary) and OpenMeteo are registered in the
+      provider_registry, and every registered provider is queried concurrently.
+    - Coordinate Queries: Locations are served with the data of the nearest known city
+      (see fetch_location_weather_data).
 """
 
-import csv
+import copy
+import functools
 import json
+import os
+from collections import Counter
 from datetime import datetime, timezone
+import threading
 import time
-from enum import Enum
-from typing import Any, List, Optional
+from types import MappingProxyType
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Tuple
+import fetch_engine
+import metrics
 import open_meteo
+import provider_registry
+import shared_weather_cache
+from geocode_cache import GeocodeEntry, geocode_cache, normalize_city_name
 import utils
-from open_meteo import OpenMeteoRequestError, OpenMeteoResponse
+import weather_code_tables
+from open_meteo import OpenMeteoResponse
+from provider_registry import WeatherProvider
 import weather_api
-from weather_api import WeatherApiRequestError, WeatherApiCityNotFoundError, WeatherApiResponse
-from weather_service import WeatherServiceError
-
-
-class WeatherCondition(Enum):
-    """Enumeration of normalized weather condition states used across the application.
-
-        Each member contains a tuple of (id, display_name) to allow for
-        consistent UI rendering and internal logic.
-    """
-    CLEAR = (0, "Clear")
-    PARTIALLY_CLOUDY = (1, "Partially Cloudy")
-    CLOUDY = (2, "Cloudy")
-    DRIZZLE = (3, "Drizzle")
-    LIGHT_RAIN = (4, "Light Rain")
-    MODERATE_RAIN = (5, "Moderate Rain")
-    HEAVY_RAIN = (6, "Heavy Rain")
-    LIGHT_SNOW = (7, "Light Snow")
-    MODERATE_SNOW = (8, "Moderate Snow")
-    HEAVY_SNOW = (9, "Heavy Snow")
-    OVERCAST = (10, "Overcast")
-    MIST = (11, "Mist")
-    FOG = (12, "Fog")
-    UNRECOGNIZED = (13, "Unrecognized")
+from weather_api import WeatherApiResponse
+from weather_service import WeatherServiceError, WeatherServiceCityNotFoundError
+from single_flight import SingleFlight
+from ttl_cache import TTLCache
+from weather_condition import (WeatherCondition, convert_weather_condition_text_to_weather_condition,
+                               format_weather_conditions)
 
 
 class CityWeatherData:
@@ -56,9 +54,17 @@ class CityWeatherData:
             last_update_epoch: The most recent valid data point's Unix timestamp.
             temp_c: The calculated average temperature in Celsius.
             weather_condition: A list of unique weather conditions reported by the service providers.
+            providers: The names of the service providers whose data contributed, in alphabetical order.
+            is_stale: Whether this is previously cached data, served while fresh data is being fetched.
+            expires_at_epoch: Until when an aggregate is expected to stay up to date (see
+                get_city_weather_data_expiry_epoch), or None if unknown.
     """
+    # many instances are created per batch request and kept in the cache, so no per-instance __dict__ is allocated
+    __slots__ = ("latitude", "longitude", "last_update_epoch", "temp_c", "weather_condition", "providers", "is_stale",
+                 "expires_at_epoch")
+
     def __init__(self, latitude: float, longitude: float, last_update_epoch: int, temp_c: float,
-                 weather_condition: WeatherCondition | List[WeatherCondition]):
+                 weather_condition: WeatherCondition | List[WeatherCondition], providers: Optional[List[str]] = None):
         """Initializes CityWeatherData and normalizes weather_condition into a list.
 
             Args:
@@ -67,6 +73,7 @@ class CityWeatherData:
                 last_update_epoch: Unix epoch timestamp.
                 temp_c: Temperature in Celsius.
                 weather_condition: A single WeatherCondition or a list of them.
+                providers: The names of the contributing service providers, if known.
         """
         self.latitude = latitude
         self.longitude = longitude
@@ -74,6 +81,9 @@ class CityWeatherData:
         self.temp_c = temp_c
         self.weather_condition = weather_condition \
             if type(weather_condition) is list else [weather_condition]
+        self.providers = providers if providers is not None else []
+        self.is_stale = False
+        self.expires_at_epoch = None
 
     def __repr__(self):
         """Returns a string representation of the CityWeatherData instance."""
@@ -83,28 +93,52 @@ class CityWeatherData:
             f"longitude={self.longitude!r}, "
             f"last_update_epoch={self.last_update_epoch!r}, "
             f"temp_c={self.temp_c!r}, "
-            f"weather_condition={self.weather_condition!r})"
+            f"weather_condition={self.weather_condition!r}, "
+            f"providers={self.providers!r}, "
+            f"is_stale={self.is_stale!r})"
         )
 
-    def to_json(self):
-        """Serializes the object state into a JSON-formatted string.
+    def get_max_age_num_seconds(self, now: Optional[float] = None) -> int:
+        """Returns for how many more seconds this data may be cached by clients (0 if stale or of unknown expiry)."""
+        if self.is_stale or self.expires_at_epoch is None:
+            return 0
+        return max(int(self.expires_at_epoch - (time.time() if now is None else now)), 0)
+
+    def as_stale(self) -> "CityWeatherData":
+        """Returns a copy of this object marked as stale, leaving the (cached) original untouched."""
+        stale_copy = copy.copy(self)
+        stale_copy.is_stale = True
+        return stale_copy
+
+    def to_dict(self) -> dict:
+        """Converts the object state into a JSON-serializable dict.
 
             Transforms internal attributes into a consumer-ready format, including
             ISO 8601 timestamps, rounded temperatures, and human-readable
-            descriptions of weather conditions.
+            descriptions of weather conditions. The dict is meant to be embedded
+            in a response body that is serialized once, as a whole.
 
             Returns:
-                str: A JSON string containing the processed weather data.
+                dict: The processed weather data.
         """
-        return json.dumps({
+        return {
             "latitude": self.latitude,
             "longitude": self.longitude,
             "last_update": utils.epoch_timestamp_to_iso_format(self.last_update_epoch),
             "temp_c": f"{self.temp_c:.2f}" if self.temp_c is not None else "N / A",
-            "weather_condition": " or ".join(wc.value[1] for wc in self.weather_condition)
-            if len(self.weather_condition) > 0
-            else "N / A"
-        })
+            "weather_condition": format_weather_conditions(tuple(self.weather_condition)),
+            "providers": self.providers,
+            "stale": self.is_stale
+        }
+
+    @metrics.timed("Serialize")
+    def to_json(self) -> str:
+        """Serializes the object state into a JSON-formatted string (see to_dict).
+
+            Returns:
+                str: A JSON string containing the processed weather data.
+        """
+        return json.dumps(self.to_dict())
 
 
 class CityWeatherDataFetchError(Exception):
@@ -135,138 +169,177 @@ class CityWeatherDataRequestError(CityWeatherDataFetchError):
 
 STALE_CUTOFF_NUM_SECONDS = 6 * 60 * 60
 
+WEATHER_API_PROVIDER_NAME = "WeatherAPI"
+OPEN_METEO_PROVIDER_NAME = "OpenMeteo"
+
+# Aggregated data is cached per location, with coordinates rounded to 2 decimal places (roughly 1 km)
+LOCATION_KEY_NUM_DECIMALS = 2
+# Grace period for cached aggregates whose providers are late to publish their next update
+MIN_CACHE_TTL_NUM_SECONDS = 60
+CITY_WEATHER_DATA_CACHE_MAX_ENTRIES = int(os.environ.get("CITY_WEATHER_DATA_CACHE_MAX_ENTRIES", 1024))
+
+city_weather_data_cache = TTLCache(CITY_WEATHER_DATA_CACHE_MAX_ENTRIES)
+
+# Whether expired cached aggregates (up to STALE_CUTOFF_NUM_SECONDS old) are served right away while
+# being refreshed in the background. When disabled, they are only served if the primary provider fails.
+STALE_WHILE_REVALIDATE = os.environ.get("STALE_WHILE_REVALIDATE", "true").lower() == "true"
+
+# Background refreshes run on their own thread, so they never wait for a provider fetch worker they occupy.
+# A Lambda container is frozen between invocations, so a refresh started by one request may complete during the next.
+_revalidation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="revalidate")
+_revalidating_location_keys = set()
+_revalidating_location_keys_lock = threading.Lock()
+
+# Whether concurrent fetches of the same city (or location) share a single upstream fan-out
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+# A leader's fan-out is made of at most two waves of provider calls, each bounded by the providers' deadlines
+SINGLE_FLIGHT_WAIT_TIMEOUT_NUM_SECONDS = 2 * max(weather_api.FETCH_TIMEOUT_NUM_SECONDS,
+                                                 open_meteo.FETCH_TIMEOUT_NUM_SECONDS) + 1
+city_fetch_flights = SingleFlight()
+
+# Number of providers with fresh data a city needs before the providers still in flight are skipped, once the
+# primary provider has answered. 0 waits for every provider (up to its deadline).
+AGGREGATION_QUORUM = int(os.environ.get("AGGREGATION_QUORUM", 0))
+# Provider data older than this does not count towards the quorum
+QUORUM_MAX_DATA_AGE_NUM_SECONDS = int(os.environ.get("QUORUM_MAX_DATA_AGE_NUM_SECONDS", 30 * 60))
+# Aggregates missing the providers skipped by a quorum are only cached briefly, so that they are soon
+# revalidated with every provider (in the background, with STALE_WHILE_REVALIDATE)
+QUORUM_AGGREGATE_CACHE_TTL_NUM_SECONDS = MIN_CACHE_TTL_NUM_SECONDS
+
+# Coordinate queries are served with the data of the nearest known city within this distance
+NEARBY_LOCATION_RADIUS_KM = float(os.environ.get("NEARBY_LOCATION_RADIUS_KM", 5))
+
+
+# Resolved once per container from the build-time generated weather_code_tables module
+WEATHER_CONDITIONS_BY_PROVIDER_CODE: Mapping[Tuple[str, int], WeatherCondition] = MappingProxyType({
+    (provider_name, code): WeatherCondition[condition_name]
+    for provider_name, weather_codes in ((OPEN_METEO_PROVIDER_NAME, weather_code_tables.OPEN_METEO_WEATHER_CODES),
+                                         (WEATHER_API_PROVIDER_NAME, weather_code_tables.WEATHER_API_WEATHER_CODES))
+    for code, (_, condition_name) in weather_codes.items()
+})
+
+# Counts of (provider, code) pairs missing from WEATHER_CONDITIONS_BY_PROVIDER_CODE, to be added to the code tables
+unseen_weather_codes: Counter = Counter()
 
-def convert_weather_condition_text_to_weather_condition(weather_condition_text: str) -> WeatherCondition:
-    """Normalizes raw weather description strings into a standard WeatherCondition enum.
+classify_weather_condition_text = functools.lru_cache(maxsize=256)(convert_weather_condition_text_to_weather_condition)
 
-        This function performs 'fuzzy' text matching by stripping common API modifiers
-        (e.g., 'at times', 'slight', 'patchy') and mapping the core keywords to an
-        internal, provider-agnostic WeatherCondition representation.
+
+def get_weather_condition(provider_name: str, weather_code: Optional[int],
+                          weather_condition_text: Optional[str] = None) -> WeatherCondition:
+    """Resolves a provider's weather code into a WeatherCondition.
+
+        Known codes are resolved in O(1) through the precomputed WEATHER_CONDITIONS_BY_PROVIDER_CODE
+        table. Unknown codes are counted in unseen_weather_codes (and reported the first time they
+        are seen) and fall back to the memoized text classification, if the provider sent a text.
 
         Args:
-            weather_condition_text: The raw condition string from a weather service.
+            provider_name: The provider the code originates from (e.g. WEATHER_API_PROVIDER_NAME).
+            weather_code: The provider's numeric weather code.
+            weather_condition_text: The provider's weather description, if any.
 
         Returns:
-            A WeatherCondition enum member. Defaults to UNRECOGNIZED if no match is found.
+            A WeatherCondition enum member. Defaults to UNRECOGNIZED if neither code nor text are recognized.
     """
-    clear_weather_condition_text = (weather_condition_text.lower().replace("shower", "")
-                              .replace("at times", "")
-                              .replace("slight", "light")
-                              .replace("fall", "")
-                              .replace("partly", "partially")
-                              .replace("patchy", "light")
-                              .replace("violent", "heavy")
-                              .strip())
-
-    if "clear" in clear_weather_condition_text or "sunny" in clear_weather_condition_text:
-        return WeatherCondition.CLEAR
-    elif "cloudy" in clear_weather_condition_text:
-        if "partially" in clear_weather_condition_text:
-            return WeatherCondition.PARTIALLY_CLOUDY
-        else:
-            return WeatherCondition.CLOUDY
-    elif "drizzle" in clear_weather_condition_text:
-        return WeatherCondition.DRIZZLE
-    elif "rain" in clear_weather_condition_text:
-        if "light" in clear_weather_condition_text:
-            return WeatherCondition.LIGHT_RAIN
-        elif "moderate" in clear_weather_condition_text:
-            return WeatherCondition.MODERATE_RAIN
-        elif "heavy" in clear_weather_condition_text:
-            return WeatherCondition.HEAVY_RAIN
-        else:
-            return WeatherCondition.MODERATE_RAIN
-    elif "snow" in clear_weather_condition_text:
-        if "light" in clear_weather_condition_text:
-            return WeatherCondition.LIGHT_SNOW
-        elif "moderate" in clear_weather_condition_text:
-            return WeatherCondition.MODERATE_SNOW
-        elif "heavy" in clear_weather_condition_text:
-            return WeatherCondition.HEAVY_SNOW
-        else:
-            return WeatherCondition.MODERATE_SNOW
-    elif "mist" in clear_weather_condition_text:
-        return WeatherCondition.MIST
-    elif "fog" in clear_weather_condition_text:
-        return WeatherCondition.FOG
-    elif "overcast" in clear_weather_condition_text:
-        return WeatherCondition.OVERCAST
-    else:
-        return WeatherCondition.UNRECOGNIZED
+    weather_condition = WEATHER_CONDITIONS_BY_PROVIDER_CODE.get((provider_name, weather_code))
+    if weather_condition is not None:
+        return weather_condition
+
+    unseen_weather_codes[(provider_name, weather_code)] += 1
+    if unseen_weather_codes[(provider_name, weather_code)] == 1:
+        print(f"Weather code {weather_code!r} ({weather_condition_text!r}) received in {provider_name} response "
+              f"is not in the weather code tables")
+
+    return classify_weather_condition_text(weather_condition_text) \
+        if weather_condition_text else WeatherCondition.UNRECOGNIZED
+
+
+def convert_weather_api_response_to_weather_data(weather_api_response: WeatherApiResponse) -> CityWeatherData:
+    """Transforms a WeatherAPI response into the unified CityWeatherData format.
+
+        The condition code is resolved through the precomputed WEATHER_CONDITIONS_BY_PROVIDER_CODE
+        table, falling back to the condition text for unknown codes (see get_weather_condition).
+    """
+    weather_condition = get_weather_condition(WEATHER_API_PROVIDER_NAME, weather_api_response.condition_code,
+                                              weather_api_response.condition_text)
+
+    return CityWeatherData(weather_api_response.latitude, weather_api_response.longitude,
+                           weather_api_response.last_update_epoch, weather_api_response.temp_c, weather_condition,
+                           [WEATHER_API_PROVIDER_NAME])
+
+
+def convert_open_meteo_response_to_weather_data(open_meteo_response: OpenMeteoResponse) -> CityWeatherData:
+    """Transforms an OpenMeteo response into the unified CityWeatherData format.
+
+        OpenMeteo reports naive UTC times, which are converted into Unix epochs.
+    """
+    # fromisoformat parses OpenMeteo's "%Y-%m-%dT%H:%M" times without strptime's costly first-call imports
+    last_update_epoch = int(datetime.fromisoformat(open_meteo_response.time)
+                            .replace(tzinfo=timezone.utc).timestamp()) \
+        if open_meteo_response.time \
+        else None
 
+    weather_condition = get_weather_condition(OPEN_METEO_PROVIDER_NAME, open_meteo_response.weather_code)
 
+    return CityWeatherData(open_meteo_response.latitude, open_meteo_response.longitude,
+                           last_update_epoch, open_meteo_response.temp_c, weather_condition,
+                           [OPEN_METEO_PROVIDER_NAME])
+
+
+@metrics.timed("Normalize")
 def convert_weather_service_response_to_weather_data(weather_service_response: Any) -> CityWeatherData:
     """Transforms provider-specific response object into a unified CityWeatherData format.
 
-        Supports WeatherApiResponse (WeatherAPI) and OpenMeteoResponse (OpenMeteo).
-        For OpenMeteo, it performs an additional lookup against a local CSV file
-        to map numeric WMO weather codes to human-readable text before normalization.
+        Dispatches to the normalizer of the registered provider the response belongs to.
 
         Args:
-            weather_service_response: An instance of WeatherApiResponse or OpenMeteoResponse.
+            weather_service_response: A response of a registered provider (e.g. WeatherApiResponse).
 
         Returns:
             A normalized CityWeatherData object.
 
         Raises:
-            ValueError: If the response type is not recognized.
+            ValueError: If the response type does not belong to any registered provider.
     """
-    OPEN_METEO_WEATHER_CODES_FILENAME = "open_meteo_weather_codes.csv"
-    weather_condition_text = None
-
-    if type(weather_service_response) is WeatherApiResponse:
-        last_update_epoch = weather_service_response.last_update_epoch
-        weather_condition_text = weather_service_response.condition_text
-    elif type(weather_service_response) is OpenMeteoResponse:
-        last_update_epoch = int(datetime.strptime(weather_service_response.time, "%Y-%m-%dT%H:%M")
-                                .replace(tzinfo=timezone.utc).timestamp()) \
-                            if weather_service_response.time \
-                            else None
-
-        try:
-            with open(OPEN_METEO_WEATHER_CODES_FILENAME, newline="") as f:
-                weather_dict = {int(row["code"]): row["description"] for row in csv.DictReader(f)}
-                if weather_service_response.weather_code in weather_dict:
-                    weather_condition_text = weather_dict[weather_service_response.weather_code]
-                else:
-                    print(f"Weather code received in OpenMeteo response not in {OPEN_METEO_WEATHER_CODES_FILENAME}")
+    return provider_registry.get_provider_for_response(weather_service_response).normalize(weather_service_response)
 
-        except IOError as e:
-            print(f"Could not read open meteo weather codes file: {e}")
 
-    else:
-        raise ValueError(f"weather_service_response must be an instance of {WeatherApiResponse.__class__.__name__}"
-                         f" or {OpenMeteoResponse.__class__.__name__}")
+# Provider fetch functions are looked up on their module at call time, so that they can be replaced (e.g. in tests)
+provider_registry.register_provider(WeatherProvider(
+    WEATHER_API_PROVIDER_NAME, WeatherApiResponse, convert_weather_api_response_to_weather_data,
+    weather_api.FETCH_TIMEOUT_NUM_SECONDS, weather_api.UPDATE_INTERVAL_NUM_SECONDS,
+    fetch_by_city_name=lambda city_name: weather_api.fetch_data_weather_api(city_name), primary=True))
 
-    latitude = weather_service_response.latitude
-    longitude = weather_service_response.longitude
-    temp_c = weather_service_response.temp_c
-    weather_condition = convert_weather_condition_text_to_weather_condition(weather_condition_text) \
-        if weather_condition_text else WeatherCondition.UNRECOGNIZED
-
-    return CityWeatherData(latitude, longitude, last_update_epoch, temp_c, weather_condition)
+provider_registry.register_provider(WeatherProvider(
+    OPEN_METEO_PROVIDER_NAME, OpenMeteoResponse, convert_open_meteo_response_to_weather_data,
+    open_meteo.FETCH_TIMEOUT_NUM_SECONDS, open_meteo.UPDATE_INTERVAL_NUM_SECONDS,
+    fetch_by_coordinates_batch=lambda coordinates_list: open_meteo.fetch_data_open_meteo_batch(coordinates_list)))
 
 
-def average_city_weather_data(weather_data_list: List[CityWeatherData]) -> Optional[CityWeatherData]:
+def average_city_weather_data(weather_data_list: List[CityWeatherData], now: Optional[float] = None) \
+        -> Optional[CityWeatherData]:
     """Aggregates multiple normalized weather data points into a single unified average report.
 
         The function applies a filter based firstly on 'freshness' defined by STALE_CUTOFF_NUM_SECONDS
         and secondly by the existence of location metadata and a timestamp.
         Among data points for which the existence condition holds,
         It calculates the mean temperature and identifies the set of unique weather
-        conditions across all non-stale data points.
+        conditions across all non-stale data points, and records the providers they came from.
 
         Args:
             weather_data_list: A list of normalized CityWeatherData objects.
+            now: The Unix timestamp freshness is measured against. Defaults to the current time.
 
         Returns:
             An aggregated CityWeatherData object, or None if no data point passes the
             existence and freshness filters.
     """
+    # read the clock once, so that all data points are judged against the same instant
+    stale_cutoff_epoch = (time.time() if now is None else now) - STALE_CUTOFF_NUM_SECONDS
+
     def city_weather_data_filter(city_weather_data: CityWeatherData) -> bool:
         return (city_weather_data.latitude is not None and city_weather_data.longitude is not None
                 and city_weather_data.last_update_epoch is not None
-                and time.time() - city_weather_data.last_update_epoch <= STALE_CUTOFF_NUM_SECONDS)
+                and city_weather_data.last_update_epoch >= stale_cutoff_epoch)
 
     filtered_weather_data_list = list(filter(city_weather_data_filter, weather_data_list))
 
@@ -281,49 +354,559 @@ def average_city_weather_data(weather_data_list: List[CityWeatherData]) -> Optio
                                         if data.weather_condition is not None
                                         and data.weather_condition != [WeatherCondition.UNRECOGNIZED]))
 
+    providers = sorted(set(provider_name for data in filtered_weather_data_list for provider_name in data.providers))
+
     return CityWeatherData(filtered_weather_data_list[0].latitude, filtered_weather_data_list[0].longitude,
-                           avg_last_update_epoch, avg_temp_c, avg_weather_condition)
+                           avg_last_update_epoch, avg_temp_c, avg_weather_condition, providers)
 
 
-def fetch_city_weather_data(city_name: str) -> CityWeatherData:
-    """Orchestrates multi-source weather data retrieval and aggregation for a city.
+def get_location_key(latitude: float, longitude: float) -> Tuple[float, float]:
+    """Returns the cache key of a location, so that nearby coordinates of the same city share an entry."""
+    return round(latitude, LOCATION_KEY_NUM_DECIMALS), round(longitude, LOCATION_KEY_NUM_DECIMALS)
 
-        Flow:
-            1. Query WeatherAPI by city name (Primary).
-            2. Use coordinates from the primary result to query OpenMeteo (Backup).
-            3. Normalize both responses into CityWeatherData objects.
-            4. Average the data and apply data integrity and stale-data filtering.
+
+def get_city_flight_key(city_name: str, coordinates: Optional[Tuple[float, float]]) -> Hashable:
+    """Returns the key coalescing concurrent fetches of a city: its location key if known, else its normalized name."""
+    return get_location_key(*coordinates) if coordinates is not None else normalize_city_name(city_name)
+
+
+def get_city_weather_data_expiry_epoch(weather_data_by_provider: Dict[str, CityWeatherData]) -> Optional[float]:
+    """Determines until when the aggregate of the given provider data points may be served from cache.
+
+        The aggregate stays valid until the earliest moment one of its contributing providers
+        is expected to publish newer data (its last_update_epoch plus its update interval),
+        but never beyond the moment its oldest data point exceeds STALE_CUTOFF_NUM_SECONDS.
+        Providers that are late to publish still get a MIN_CACHE_TTL_NUM_SECONDS grace period.
 
         Args:
-            city_name: The name of the city to query.
+            weather_data_by_provider: A mapping of provider name to its normalized CityWeatherData.
 
         Returns:
-            A final, aggregated CityWeatherData object.
+            The expiry time as a Unix epoch, or None if no data point is fresh.
+    """
+    now = time.time()
+    fresh_update_epochs = {name: data.last_update_epoch for name, data in weather_data_by_provider.items()
+                           if data.last_update_epoch is not None
+                           and now - data.last_update_epoch <= STALE_CUTOFF_NUM_SECONDS}
+
+    if len(fresh_update_epochs) == 0:
+        return None
+
+    stale_epoch = min(fresh_update_epochs.values()) + STALE_CUTOFF_NUM_SECONDS
+    next_update_epoch = min(epoch + provider_registry.get_provider(name).update_interval_num_seconds
+                            for name, epoch in fresh_update_epochs.items())
+
+    return min(stale_epoch, max(next_update_epoch, now + MIN_CACHE_TTL_NUM_SECONDS))
+
+
+def aggregate_provider_results(provider_results: Dict[str, Any],
+                               normalized_weather_data: Optional[Dict[str, CityWeatherData]] = None) \
+        -> Tuple[CityWeatherData, Optional[float]]:
+    """Normalizes and averages the provider results of a single city.
+
+        A failed primary provider fails the city, while any other provider that failed
+        with a WeatherServiceError (including a missed deadline) is left out of the aggregate.
+        An aggregate missing providers skipped by a quorum (see ProviderQuorum) expires after
+        QUORUM_AGGREGATE_CACHE_TTL_NUM_SECONDS at most.
+
+        Args:
+            provider_results: A mapping of provider name to the provider's response for the city,
+                or to the exception its fetch ended with. Providers that were not queried are absent.
+            normalized_weather_data: Optional already normalized data of some of the providers.
+
+        Returns:
+            A tuple containing (aggregated CityWeatherData, cache expiry epoch or None).
 
         Raises:
             CityWeatherDataCityNotFoundError: If the city cannot be found.
-            CityWeatherDataRequestError: If the primary service request fails.
+            CityWeatherDataRequestError: If the primary service request failed or timed out.
             CityWeatherDataFetchError: If all retrieved data is considered stale.
     """
-    try:
-        weather_service_responses = [weather_api.fetch_data_weather_api(city_name)]
-
-        try:
-            if weather_service_responses[0].latitude is not None and weather_service_responses[0].longitude is not None:
-                weather_service_responses.append(open_meteo.fetch_data_open_meteo(weather_service_responses[0].latitude,
-                                                                       weather_service_responses[0].longitude))
-        except OpenMeteoRequestError as e:
-            print(f'Could not fetch weather data from OpenMeteo: {e}')
+    primary_provider_name = provider_registry.get_primary_provider().name
+    normalized_weather_data = normalized_weather_data or {}
 
-        weather_data_list = [convert_weather_service_response_to_weather_data(response)
-                                             for response in weather_service_responses]
-        avg_weather_data = average_city_weather_data(weather_data_list)
+    try:
+        weather_service_responses = {}
+        num_skipped_providers = 0
+
+        for provider_name, result in provider_results.items():
+            if not isinstance(result, Exception):
+                weather_service_responses[provider_name] = result
+            elif provider_name != primary_provider_name and isinstance(result, fetch_engine.ProviderSkippedError):
+                num_skipped_providers += 1
+            elif provider_name != primary_provider_name and isinstance(result, WeatherServiceError):
+                print(f'Could not fetch weather data from {provider_name}: {result!r}')
+            else:
+                raise result
+
+        weather_data_by_provider = {name: normalized_weather_data[name] if name in normalized_weather_data
+                                    else convert_weather_service_response_to_weather_data(response)
+                                    for name, response in weather_service_responses.items()}
+        avg_weather_data = average_city_weather_data(list(weather_data_by_provider.values()))
 
         if avg_weather_data is None:
             raise CityWeatherDataFetchError("All city weather datas were filtered out")
 
-        return avg_weather_data
-    except WeatherApiCityNotFoundError:
+        expiry_epoch = get_city_weather_data_expiry_epoch(weather_data_by_provider)
+        if num_skipped_providers > 0 and expiry_epoch is not None:
+            metrics.increment("ProviderSkipped", num_skipped_providers)
+            expiry_epoch = min(expiry_epoch, time.time() + QUORUM_AGGREGATE_CACHE_TTL_NUM_SECONDS)
+
+        return avg_weather_data, expiry_epoch
+    except WeatherServiceCityNotFoundError:
         raise CityWeatherDataCityNotFoundError()
-    except WeatherApiRequestError as e:
+    except WeatherServiceError as e:
         raise CityWeatherDataRequestError(e)
+
+
+def submit_coordinates_batch_fetches(providers: List[WeatherProvider],
+                                     coordinates_by_city: Dict[str, Tuple[float, float]]) \
+        -> Dict[Hashable, Tuple[Future, float]]:
+    """Submits one batched request per coordinate-based provider for the given cities.
+
+        Returns:
+            A mapping of (provider name, tuple of city names) to the (future, timeout) of the batch,
+            to be passed to fetch_engine.gather_provider_results.
+    """
+    if len(coordinates_by_city) == 0:
+        return {}
+
+    city_names = tuple(coordinates_by_city)
+    return {(provider.name, city_names): provider.submit_fetch(provider.fetch_by_coordinates_batch,
+                                                               list(coordinates_by_city.values()))
+            for provider in providers if provider.fetch_by_coordinates_batch is not None}
+
+
+def collect_provider_results(gathered_results: Dict[Hashable, Any], results_by_city: Dict[str, Dict[str, Any]]):
+    """Distributes gathered provider results into per-city mappings of provider name to result.
+
+        Args:
+            gathered_results: The output of fetch_engine.gather_provider_results, keyed by
+                (provider name, city name) for per-city calls or by (provider name, tuple of
+                city names) for batched calls.
+            results_by_city: The per-city mappings to add the results to, updated in place.
+    """
+    for (provider_name, city_key), result in gathered_results.items():
+        if not isinstance(city_key, tuple):
+            results_by_city[city_key][provider_name] = result
+        elif isinstance(result, Exception):
+            for city_name in city_key:
+                results_by_city[city_name][provider_name] = result
+        else:
+            for city_name, city_result in zip(city_key, result):
+                results_by_city[city_name][provider_name] = city_result
+
+
+class ProviderQuorum:
+    """Folds the provider results of several cities in as they arrive, and tells when every city has a quorum.
+
+        A city has a quorum once its primary provider has answered and at least `quorum` providers
+        returned data at most QUORUM_MAX_DATA_AGE_NUM_SECONDS old, or once its primary provider
+        failed, which decides the city on its own (see aggregate_provider_results). Responses are
+        normalized as they arrive, and the normalized data is reused by the aggregation.
+
+        Attributes:
+            quorum: The number of providers with fresh data a city needs.
+            weather_data_by_city: The normalized data of every city, per provider name.
+    """
+    def __init__(self, city_names: List[str], quorum: int):
+        self.quorum = quorum
+        self.weather_data_by_city: Dict[str, Dict[str, CityWeatherData]] = {city_name: {} for city_name in city_names}
+        self._primary_provider_name = provider_registry.get_primary_provider().name
+        self._num_fresh_providers_by_city = Counter()
+        self._decided_city_names = set()
+
+    def has_quorum(self, city_name: str) -> bool:
+        """Returns whether the city has a quorum, i.e. whether its remaining providers can be skipped."""
+        return city_name in self._decided_city_names
+
+    def add(self, key: Hashable, result: Any) -> bool:
+        """Folds in the result of a provider call, keyed like the calls passed to collect_provider_results.
+
+            Returns:
+                Whether every city has a quorum, as expected by fetch_engine.gather_provider_results.
+        """
+        provider_name, city_key = key
+        if not isinstance(city_key, tuple):
+            self._add_city_result(provider_name, city_key, result)
+        elif isinstance(result, Exception):
+            for city_name in city_key:
+                self._add_city_result(provider_name, city_name, result)
+        else:
+            for city_name, city_result in zip(city_key, result):
+                self._add_city_result(provider_name, city_name, city_result)
+
+        return len(self._decided_city_names) == len(self.weather_data_by_city)
+
+    def _add_city_result(self, provider_name: str, city_name: str, result: Any):
+        if isinstance(result, Exception):
+            if provider_name == self._primary_provider_name:
+                self._decided_city_names.add(city_name)
+            return
+
+        try:
+            weather_data = convert_weather_service_response_to_weather_data(result)
+        except Exception:
+            # left for aggregate_provider_results to report
+            return
+        self.weather_data_by_city[city_name][provider_name] = weather_data
+        if weather_data.last_update_epoch is not None \
+                and time.time() - weather_data.last_update_epoch <= QUORUM_MAX_DATA_AGE_NUM_SECONDS:
+            self._num_fresh_providers_by_city[city_name] += 1
+
+        if self._primary_provider_name in self.weather_data_by_city[city_name] \
+                and self._num_fresh_providers_by_city[city_name] >= self.quorum:
+            self._decided_city_names.add(city_name)
+
+
+def read_shared_cache_entries(city_names: List[str], coordinates_by_city: Dict[str, Tuple[float, float]],
+                              results: Dict[str, CityWeatherData], stale_results: Dict[str, CityWeatherData]):
+    """Serves cities missing from the in-process cache with their fresh shared cache entries, if any.
+
+        Served entries are also cached in-process until they expire. The given mappings are updated in place.
+    """
+    if len(city_names) == 0:
+        return
+
+    now = time.time()
+    num_hits = 0
+    for city_name, (weather_data, expires_at_epoch, stale_until_epoch) in \
+            shared_weather_cache.get_entries(city_names).items():
+        if expires_at_epoch <= now:
+            continue
+        num_hits += 1
+        weather_data.expires_at_epoch = expires_at_epoch
+        results[city_name] = weather_data
+        stale_results.pop(city_name, None)
+        coordinates_by_city.setdefault(city_name, (weather_data.latitude, weather_data.longitude))
+        city_weather_data_cache.put(get_location_key(weather_data.latitude, weather_data.longitude), weather_data,
+                                    expires_at_epoch, stale_until_epoch=stale_until_epoch)
+
+    metrics.increment("SharedCacheHit", num_hits)
+    metrics.increment("SharedCacheMiss", len(city_names) - num_hits)
+
+
+def revalidate_in_background(coordinates_by_city: Dict[str, Tuple[float, float]]) -> Optional[Future]:
+    """Refreshes the cached aggregates of the given cities on the background revalidation thread.
+
+        Cities whose location is already being refreshed are skipped, so that concurrent
+        requests for the same stale data trigger a single refresh. Refreshes wait for every
+        provider, so that aggregates answered early by a quorum are completed in the background.
+
+        Args:
+            coordinates_by_city: A mapping of city name to its (latitude, longitude).
+
+        Returns:
+            The Future of the refresh, or None if every location is already being refreshed.
+    """
+    with _revalidating_location_keys_lock:
+        coordinates_by_city = {city_name: coordinates for city_name, coordinates in coordinates_by_city.items()
+                               if get_location_key(*coordinates) not in _revalidating_location_keys}
+        location_keys = {get_location_key(*coordinates) for coordinates in coordinates_by_city.values()}
+        _revalidating_location_keys.update(location_keys)
+
+    if len(coordinates_by_city) == 0:
+        return None
+
+    def revalidate():
+        try:
+            results = fetch_cities_weather_data(list(coordinates_by_city), coordinates_by_city, allow_stale=False,
+                                                wait_for_all_providers=True)
+            for city_name, result in results.items():
+                if isinstance(result, CityWeatherDataFetchError):
+                    print(f"Could not revalidate the weather data of {city_name}: {result!r}")
+        finally:
+            with _revalidating_location_keys_lock:
+                _revalidating_location_keys.difference_update(location_keys)
+
+    return _revalidation_executor.submit(revalidate)
+
+
+@metrics.timed("WeatherFetch")
+def fetch_cities_weather_data(city_names: List[str],
+                              coordinates_by_city: Optional[Dict[str, Tuple[float, float]]] = None,
+                              allow_stale: bool = True, wait_for_all_providers: bool = False) \
+        -> Dict[str, CityWeatherData | CityWeatherDataFetchError]:
+    """Orchestrates multi-source weather data retrieval and aggregation for one or more cities.
+
+        Flow:
+            1. Look up every city's coordinates in the geocode cache, and serve cities whose
+               aggregate for that location is still cached and fresh, in this container or else
+               in the shared cache (see shared_weather_cache). With STALE_WHILE_REVALIDATE, also
+               serve expired aggregates (marked as stale) and refresh them in the background.
+            2. Query the primary provider (WeatherAPI) and every other name-based provider by
+               city name, for all remaining cities concurrently.
+            3. Query every coordinate-based provider (OpenMeteo) for all remaining cities whose
+               coordinates are already known with a single batched request per provider,
+               concurrently with step 2.
+            4. Once the primary provider resolves the coordinates of the other cities, cache them
+               and query the coordinate-based providers for those cities with a second batch.
+            5. Normalize, average and filter the data of every city, and cache each aggregate
+               until one of its providers is expected to publish newer data.
+
+        Each provider request is bounded by its provider's deadline and by the invocation's
+        deadline (see fetch_engine.set_invocation_deadline), and hedged past its p95 latency.
+        A slow or failing secondary provider is dropped rather than delaying or failing the result.
+        With AGGREGATION_QUORUM, the providers still in flight are skipped as soon as every city
+        has a quorum of fresh provider data (see ProviderQuorum).
+
+        With SINGLE_FLIGHT_ENABLED, steps 2 to 5 run only for cities whose location (or, if not
+        located yet, normalized name) is not already being fetched by a concurrent call. The other
+        cities await the result, or error, of the fetch in flight instead of repeating it.
+
+        Args:
+            city_names: The names of the cities to query.
+            coordinates_by_city: Optional (latitude, longitude) of some of the cities. Defaults
+                to the geocode-cached coordinates of each city, if any.
+            allow_stale: Whether expired cached aggregates may be served, either right away
+                (STALE_WHILE_REVALIDATE) or when the primary provider fails.
+            wait_for_all_providers: Whether every provider is awaited even if AGGREGATION_QUORUM is set.
+
+        Returns:
+            A mapping of every distinct city name to either its aggregated CityWeatherData
+            or the CityWeatherDataFetchError (or subclass) its retrieval failed with.
+    """
+    city_names = list(dict.fromkeys(city_names))
+    coordinates_by_city = dict(coordinates_by_city or {})
+    results = {}
+    stale_results = {}
+
+    for city_name in city_names:
+        if coordinates_by_city.get(city_name) is None:
+            geocode_entry = geocode_cache.get(city_name)
+            metrics.increment("GeocodeCacheHit" if geocode_entry is not None else "GeocodeCacheMiss")
+            if geocode_entry is not None:
+                coordinates_by_city[city_name] = geocode_entry.coordinates
+
+        if city_name in coordinates_by_city:
+            location_key = get_location_key(*coordinates_by_city[city_name])
+            cached_weather_data = city_weather_data_cache.get(location_key)
+            if cached_weather_data is not None:
+                results[city_name] = cached_weather_data
+            elif allow_stale:
+                stale_weather_data = city_weather_data_cache.get_stale(location_key)
+                if stale_weather_data is not None:
+                    stale_results[city_name] = stale_weather_data.as_stale()
+                    metrics.increment("WeatherCacheStaleHit")
+        metrics.increment("WeatherCacheHit" if city_name in results else "WeatherCacheMiss")
+
+    if shared_weather_cache.is_enabled():
+        read_shared_cache_entries([city_name for city_name in city_names if city_name not in results],
+                                  coordinates_by_city, results, stale_results)
+
+    if STALE_WHILE_REVALIDATE and len(stale_results) > 0:
+        results |= stale_results
+        revalidate_in_background({city_name: coordinates_by_city[city_name] for city_name in stale_results})
+
+    pending_city_names = [city_name for city_name in city_names if city_name not in results]
+    if len(pending_city_names) == 0:
+        return results
+
+    if not SINGLE_FLIGHT_ENABLED:
+        return results | fetch_and_aggregate_cities(pending_city_names, coordinates_by_city, stale_results,
+                                                    wait_for_all_providers=wait_for_all_providers)
+
+    # only one fan-out is in flight per location (or per city name, for cities not located yet)
+    flight_keys = {city_name: get_city_flight_key(city_name, coordinates_by_city.get(city_name))
+                   for city_name in pending_city_names}
+    flights = city_fetch_flights.claim(flight_keys.values())
+    led_city_names, led_flight_keys = [], set()
+    for city_name in pending_city_names:
+        if flights[flight_keys[city_name]].is_leader and flight_keys[city_name] not in led_flight_keys:
+            led_city_names.append(city_name)
+            led_flight_keys.add(flight_keys[city_name])
+    metrics.increment("CoalescedFetch", len(pending_city_names) - len(led_city_names))
+
+    if len(led_city_names) > 0:
+        try:
+            led_results = fetch_and_aggregate_cities(led_city_names, coordinates_by_city, stale_results,
+                                                     wait_for_all_providers=wait_for_all_providers)
+        except BaseException as e:
+            for city_name in led_city_names:
+                city_fetch_flights.land_with_error(flights[flight_keys[city_name]], e)
+            raise
+        for city_name in led_city_names:
+            city_fetch_flights.land(flights[flight_keys[city_name]], led_results[city_name])
+
+    # joined flights (including cities of this batch sharing a location) land once their leader's fan-out completes
+    wait_timeout_num_seconds = SINGLE_FLIGHT_WAIT_TIMEOUT_NUM_SECONDS
+    remaining_num_seconds = fetch_engine.get_invocation_remaining_num_seconds()
+    if remaining_num_seconds is not None:
+        wait_timeout_num_seconds = min(wait_timeout_num_seconds, remaining_num_seconds)
+    wait_deadline = time.monotonic() + wait_timeout_num_seconds
+    for city_name in pending_city_names:
+        try:
+            results[city_name] = flights[flight_keys[city_name]].future.result(
+                timeout=max(wait_deadline - time.monotonic(), 0))
+        except TimeoutError:
+            # the leader's fan-out waits on the primary provider, which did not answer in time for this call
+            results[city_name] = stale_results[city_name] if city_name in stale_results else \
+                CityWeatherDataRequestError(fetch_engine.ProviderTimeoutError(
+                    provider_registry.get_primary_provider().name, wait_timeout_num_seconds))
+
+    return results
+
+
+def fetch_and_aggregate_cities(city_names: List[str], coordinates_by_city: Dict[str, Tuple[float, float]],
+                               stale_results: Dict[str, CityWeatherData], publish_to_shared_cache: bool = False,
+                               wait_for_all_providers: bool = False) \
+        -> Dict[str, CityWeatherData | CityWeatherDataFetchError]:
+    """Queries every registered provider for cities missing from the cache, and aggregates and caches their data.
+
+        Performs steps 2 to 5 of fetch_cities_weather_data.
+
+        Args:
+            city_names: The names of the cities to query.
+            coordinates_by_city: The known (latitude, longitude) of some of the cities, completed
+                in place with the locations resolved by the primary provider.
+            stale_results: Expired aggregates of some of the cities, served instead of a
+                CityWeatherDataRequestError.
+            publish_to_shared_cache: Whether the aggregates are also written to the shared cache.
+            wait_for_all_providers: Whether every provider is awaited even if AGGREGATION_QUORUM is set.
+
+        Returns:
+            A mapping of every city name to either its aggregated CityWeatherData
+            or the CityWeatherDataFetchError (or subclass) its retrieval failed with.
+    """
+    results = {}
+    primary_provider = provider_registry.get_primary_provider()
+    providers = provider_registry.get_providers()
+    results_by_city = {city_name: {} for city_name in city_names}
+    quorum = ProviderQuorum(city_names, AGGREGATION_QUORUM) \
+        if AGGREGATION_QUORUM > 0 and not wait_for_all_providers else None
+    is_complete = quorum.add if quorum is not None else None
+
+    # name-based requests and the batched requests of already located cities are all in flight at once
+    provider_calls = {(provider.name, city_name): provider.submit_fetch(provider.fetch_by_city_name, city_name)
+                      for provider in providers
+                      if provider.primary or provider.fetch_by_coordinates_batch is None
+                      for city_name in city_names}
+    provider_calls |= submit_coordinates_batch_fetches(
+        providers, {city_name: coordinates_by_city[city_name]
+                    for city_name in city_names if city_name in coordinates_by_city})
+    collect_provider_results(fetch_engine.gather_provider_results(provider_calls, is_complete), results_by_city)
+
+    newly_located_coordinates_by_city = {}
+    for city_name in city_names:
+        primary_result = results_by_city[city_name][primary_provider.name]
+        if city_name not in coordinates_by_city and not isinstance(primary_result, Exception):
+            geocode_entry = geocode_cache.put(city_name, primary_result)
+            if geocode_entry is not None:
+                coordinates_by_city[city_name] = geocode_entry.coordinates
+                if quorum is None or not quorum.has_quorum(city_name):
+                    newly_located_coordinates_by_city[city_name] = geocode_entry.coordinates
+                else:
+                    # the second wave is not needed for cities that already have a quorum
+                    results_by_city[city_name] |= {provider.name: fetch_engine.ProviderSkippedError(provider.name)
+                                                   for provider in providers
+                                                   if provider.fetch_by_coordinates_batch is not None}
+
+    collect_provider_results(fetch_engine.gather_provider_results(
+        submit_coordinates_batch_fetches(providers, newly_located_coordinates_by_city), is_complete), results_by_city)
+
+    for city_name in city_names:
+        try:
+            avg_weather_data, expiry_epoch = aggregate_provider_results(
+                results_by_city[city_name], quorum.weather_data_by_city[city_name] if quorum is not None else None)
+            avg_weather_data.expires_at_epoch = expiry_epoch
+            results[city_name] = avg_weather_data
+
+            if city_name in coordinates_by_city and expiry_epoch is not None:
+                stale_until_epoch = avg_weather_data.last_update_epoch + STALE_CUTOFF_NUM_SECONDS
+                city_weather_data_cache.put(get_location_key(*coordinates_by_city[city_name]),
+                                            avg_weather_data, expiry_epoch, stale_until_epoch=stale_until_epoch)
+                if publish_to_shared_cache:
+                    shared_weather_cache.put_entry(city_name, avg_weather_data, expiry_epoch, stale_until_epoch)
+        except CityWeatherDataRequestError as e:
+            # the last good data of a city is preferred over failing it during a provider outage
+            results[city_name] = stale_results.get(city_name, e)
+        except CityWeatherDataFetchError as e:
+            results[city_name] = e
+
+    return results
+
+
+def refresh_cities_weather_data(city_names: List[str]) -> Dict[str, CityWeatherData | CityWeatherDataFetchError]:
+    """Fetches fresh aggregates of cities from the providers, bypassing every cache, and publishes them.
+
+        Used by the scheduled refresh of popular cities: aggregates are cached in-process and
+        written to the shared cache, from which every container serves them.
+
+        Returns:
+            A mapping of every distinct city name to either its aggregated CityWeatherData
+            or the CityWeatherDataFetchError (or subclass) its retrieval failed with.
+    """
+    city_names = list(dict.fromkeys(city_names))
+    coordinates_by_city = {}
+    for city_name in city_names:
+        geocode_entry = geocode_cache.get(city_name)
+        if geocode_entry is not None:
+            coordinates_by_city[city_name] = geocode_entry.coordinates
+
+    return fetch_and_aggregate_cities(city_names, coordinates_by_city, {}, publish_to_shared_cache=True,
+                                      wait_for_all_providers=True)
+
+
+def fetch_city_weather_data(city_name: str, coordinates: Optional[Tuple[float, float]] = None) -> CityWeatherData:
+    """Orchestrates multi-source weather data retrieval and aggregation for a city.
+
+        This is the single-city form of fetch_cities_weather_data, which describes the flow.
+        If the city's coordinates are already known (passed in or geocode-cached), WeatherAPI
+        and OpenMeteo are queried concurrently.
+
+        Args:
+            city_name: The name of the city to query.
+            coordinates: Optional (latitude, longitude) of the city. Defaults to the
+                geocode-cached coordinates of the city, if any.
+
+        Returns:
+            A final, aggregated CityWeatherData object.
+
+        Raises:
+            CityWeatherDataCityNotFoundError: If the city cannot be found.
+            CityWeatherDataRequestError: If the primary service request fails or times out.
+            CityWeatherDataFetchError: If all retrieved data is considered stale.
+    """
+    result = fetch_cities_weather_data([city_name],
+                                       {city_name: coordinates} if coordinates is not None else None)[city_name]
+
+    if isinstance(result, CityWeatherDataFetchError):
+        raise result
+    return result
+
+
+def format_location_query(latitude: float, longitude: float) -> str:
+    """Returns the WeatherAPI query of a location ('latitude,longitude', which WeatherAPI resolves to a nearby place)."""
+    return f"{latitude:.4f},{longitude:.4f}"
+
+
+def fetch_location_weather_data(latitude: float, longitude: float) -> Tuple[Optional[GeocodeEntry], CityWeatherData]:
+    """Retrieves the weather data of a location, given by its coordinates.
+
+        Locations within NEARBY_LOCATION_RADIUS_KM of a city in the geocode cache are served
+        with the data of the nearest such city, so that nearby queries share its cached aggregate
+        rather than each going upstream. Other locations are resolved by WeatherAPI to a nearby
+        place, which is geocode-cached (and so indexed) for the next queries around it.
+
+        Args:
+            latitude: Geographic latitude coordinate of the location.
+            longitude: Geographic longitude coordinate of the location.
+
+        Returns:
+            A tuple containing the GeocodeEntry of the city serving the location (None if it
+            could not be resolved), and its aggregated CityWeatherData.
+
+        Raises:
+            CityWeatherDataCityNotFoundError: If no place is found at the location.
+            CityWeatherDataRequestError: If the primary service request fails or times out.
+            CityWeatherDataFetchError: If all retrieved data is considered stale.
+    """
+    nearest = geocode_cache.nearest(latitude, longitude, NEARBY_LOCATION_RADIUS_KM)
+    metrics.increment("NearbyCityHit" if nearest is not None else "NearbyCityMiss")
+    if nearest is not None:
+        geocode_entry, _ = nearest
+        return geocode_entry, fetch_city_weather_data(geocode_entry.city_name, geocode_entry.coordinates)
+
+    location_query = format_location_query(latitude, longitude)
+    weather_data = fetch_city_weather_data(location_query)
+    return geocode_cache.get(location_query), weather_data
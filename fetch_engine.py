@@ -0,0 +1,330 @@
+"""Concurrent Provider Fetch Engine Module.
+
+This module runs service provider requests in parallel on a shared, module-level
+thread pool, so that a request which fans out to several providers only pays
+for the slowest of them instead of the sum of all round trips. The pool lives
+for the lifetime of the (warm) Lambda container and is reused across invocations.
+
+Every provider call is submitted with its own timeout. Results are collected as
+soon as they complete, and a provider that exceeds its timeout is reported as a
+ProviderTimeoutError without holding up the results of the other providers.
+
+Provider calls can also be hedged: if a call has not completed once it exceeds the
+provider's recent p95 latency, an identical second call is fired and whichever of
+the two succeeds first wins. This trims the latency tail caused by the occasional
+slow connection or overloaded upstream host, at the cost of about 5% extra calls.
+A losing attempt that is already running cannot be cancelled, and keeps its worker
+until its own request completes or times out. Hedges are therefore capped at
+MAX_HEDGES_IN_FLIGHT at once, counted until both of their attempts are done, so
+that under load hedging never takes more than that share of the pool from first
+attempts. A call past its hedge delay while the cap is reached is simply not hedged.
+
+Calls run in a copy of the submitting thread's context, so that context variables
+(e.g. the current invocation's metrics, see metrics) are visible to them.
+
+Gathering can end early: calls still in flight are abandoned once the caller deems the
+results gathered so far sufficient (e.g. a quorum of providers, see city_weather_data),
+or once the current invocation's deadline passes, so that a slow provider never makes
+the invocation itself time out.
+
+Main components:
+    - ProviderTimeoutError: Raised (or returned) when a provider exceeds its timeout.
+    - ProviderSkippedError: Returned for a call abandoned because enough results were gathered.
+    - LatencyTracker: Rolling window of a provider's recent call latencies.
+    - submit_provider_fetch: Schedules a single provider call on the shared pool.
+    - submit_hedged_provider_fetch: Schedules a provider call that is hedged past a latency threshold.
+    - gather_provider_results: Collects the results of several in-flight provider calls.
+    - set_invocation_deadline: Bounds the provider calls gathered by the current invocation.
+"""
+
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from weather_service import WeatherServiceError
+
+# Sized for a full batch request (up to 50 cities) to be fetched in a few concurrent waves
+MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", 16))
+
+# Number of recent latencies kept per provider, and the minimum needed before hedging kicks in
+LATENCY_WINDOW_SIZE = 200
+LATENCY_MIN_SAMPLES = 20
+
+# Hedged calls whose attempts may both be holding a worker at once
+MAX_HEDGES_IN_FLIGHT = int(os.environ.get("FETCH_MAX_HEDGES_IN_FLIGHT", max(MAX_WORKERS // 4, 1)))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="provider-fetch")
+_hedge_slots = threading.BoundedSemaphore(MAX_HEDGES_IN_FLIGHT)
+
+# The time.monotonic() instant by which the current invocation stops waiting for providers, if any
+_invocation_deadline: contextvars.ContextVar[Optional[float]] = \
+    contextvars.ContextVar("invocation_deadline", default=None)
+
+
+class ProviderTimeoutError(WeatherServiceError):
+    """Raised when a service provider did not respond within its allotted timeout.
+
+        Attributes:
+            provider_name: The name of the provider that timed out.
+            timeout_num_seconds: The timeout that was exceeded, in seconds.
+    """
+    def __init__(self, provider_name: str, timeout_num_seconds: float):
+        self.provider_name = provider_name
+        self.timeout_num_seconds = timeout_num_seconds
+
+    def __repr__(self):
+        """Returns a string representation of the ProviderTimeoutError instance."""
+        return f"{self.__class__.__name__}({self.provider_name!r}, {self.timeout_num_seconds!r})"
+
+
+class ProviderSkippedError(WeatherServiceError):
+    """Returned for a provider call abandoned because the results gathered before it completed were sufficient.
+
+        Attributes:
+            provider_name: The name of the provider whose call was abandoned.
+    """
+    def __init__(self, provider_name: str):
+        self.provider_name = provider_name
+
+    def __repr__(self):
+        """Returns a string representation of the ProviderSkippedError instance."""
+        return f"{self.__class__.__name__}({self.provider_name!r})"
+
+
+class LatencyTracker:
+    """A thread-safe rolling window of a provider's most recent successful call latencies.
+
+        Attributes:
+            window_size: The number of most recent latencies kept.
+            min_samples: The number of latencies needed before percentiles are reported.
+    """
+    def __init__(self, window_size: int = LATENCY_WINDOW_SIZE, min_samples: int = LATENCY_MIN_SAMPLES):
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def record(self, latency_num_seconds: float):
+        """Adds a call latency to the window, evicting the oldest one if the window is full."""
+        with self._lock:
+            self._latencies.append(latency_num_seconds)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Returns the given percentile (0-100) of the recorded latencies, or None if too few were recorded."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+
+
+class _HedgeScheduler:
+    """Runs delayed callbacks (the firing of hedged calls) on a single, lazily started daemon thread."""
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Callable[[], None]]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, delay_num_seconds: float, callback: Callable[[], None]):
+        """Runs callback once delay_num_seconds have passed."""
+        with self._condition:
+            heapq.heappush(self._heap, (time.monotonic() + delay_num_seconds, next(self._counter), callback))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="provider-fetch-hedge", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._condition.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, callback = heapq.heappop(self._heap)
+            try:
+                callback()
+            except Exception as e:
+                print(f"Hedged provider call could not be fired: {e!r}")
+
+
+_hedge_scheduler = _HedgeScheduler()
+
+
+def submit_provider_fetch(fetch_function: Callable[..., Any], *args: Any) -> Future:
+    """Schedules a provider fetch function on the shared thread pool.
+
+        Args:
+            fetch_function: The blocking provider call (e.g. fetch_data_open_meteo).
+            *args: Positional arguments passed to fetch_function.
+
+        Returns:
+            A Future that resolves to the provider's response or raises its error.
+    """
+    return _executor.submit(contextvars.copy_context().run, fetch_function, *args)
+
+
+def submit_hedged_provider_fetch(fetch_function: Callable[..., Any], *args: Any,
+                                 hedge_after_num_seconds: Optional[float] = None,
+                                 latency_tracker: Optional[LatencyTracker] = None) -> Future:
+    """Schedules a provider fetch function on the shared thread pool, hedged past a latency threshold.
+
+        If the call has not completed after hedge_after_num_seconds, an identical second call is
+        submitted, unless MAX_HEDGES_IN_FLIGHT hedges are already in flight. The returned Future
+        resolves to the first successful response of either call, or to the error of the last call
+        to fail if both fail. A call that fails before the hedge fires fails the Future right away,
+        as hedging is meant for slow calls, not failing ones.
+
+        Args:
+            fetch_function: The blocking provider call (e.g. fetch_data_open_meteo).
+            *args: Positional arguments passed to fetch_function.
+            hedge_after_num_seconds: The delay after which the hedged call fires. None disables hedging.
+            latency_tracker: Optional tracker recording the latency of the winning call.
+
+        Returns:
+            A Future that resolves to the provider's response or raises its error.
+    """
+    result_future = Future()
+    result_future.set_running_or_notify_cancel()
+    # reentrant, as an attempt that completes before its done callback is added runs the callback right away
+    lock = threading.RLock()
+    attempts: List[Future] = []
+    num_failed_attempts = 0
+    num_done_attempts = 0
+    # the semaphore the hedge's slot was acquired from, None until the call is hedged
+    hedge_slots = None
+    # captured here, as the hedge fires on the scheduler's thread; every attempt runs in its own copy,
+    # since a context cannot be entered by two threads at once
+    context = contextvars.copy_context()
+
+    def on_attempt_done(attempt: Future, start: float):
+        nonlocal num_failed_attempts, num_done_attempts
+        with lock:
+            num_done_attempts += 1
+            if hedge_slots is not None and num_done_attempts == len(attempts):
+                # the last attempt of a hedged call released its worker
+                hedge_slots.release()
+            if attempt.cancelled() or result_future.done():
+                return
+            error = attempt.exception()
+            if error is None:
+                if latency_tracker is not None:
+                    latency_tracker.record(time.monotonic() - start)
+                result_future.set_result(attempt.result())
+                for other_attempt in attempts:
+                    if not other_attempt.done() and not other_attempt.cancel():
+                        print(f"Abandoning a losing provider call still running: {args!r}")
+                return
+            num_failed_attempts += 1
+            if num_failed_attempts == len(attempts):
+                result_future.set_exception(error)
+
+    def submit_attempt():
+        start = time.monotonic()
+        attempt = _executor.submit(context.copy().run, fetch_function, *args)
+        attempts.append(attempt)
+        attempt.add_done_callback(lambda done_attempt: on_attempt_done(done_attempt, start))
+
+    def fire_hedge():
+        nonlocal hedge_slots
+        with lock:
+            if result_future.done():
+                return
+            if not _hedge_slots.acquire(blocking=False):
+                print(f"Not hedging provider call, {MAX_HEDGES_IN_FLIGHT} hedges are already in flight: {args!r}")
+                return
+            print(f"Hedging provider call still in flight after {hedge_after_num_seconds:.3f}s: {args!r}")
+            hedge_slots = _hedge_slots
+            submit_attempt()
+
+    with lock:
+        submit_attempt()
+    if hedge_after_num_seconds is not None:
+        _hedge_scheduler.schedule(hedge_after_num_seconds, fire_hedge)
+
+    return result_future
+
+
+def set_invocation_deadline(remaining_num_seconds: Optional[float]) -> contextvars.Token:
+    """Bounds every provider call gathered in the current context (and its copies) by a deadline.
+
+        Args:
+            remaining_num_seconds: The time left to wait for providers, from now. None removes the deadline.
+
+        Returns:
+            A token restoring the previous deadline, see reset_invocation_deadline.
+    """
+    return _invocation_deadline.set(time.monotonic() + remaining_num_seconds
+                                    if remaining_num_seconds is not None else None)
+
+
+def reset_invocation_deadline(token: contextvars.Token):
+    """Restores the deadline in effect before the set_invocation_deadline call that returned token."""
+    _invocation_deadline.reset(token)
+
+
+def get_invocation_remaining_num_seconds() -> Optional[float]:
+    """Returns the time left until the current invocation's deadline (at least 0), or None if it has none."""
+    deadline = _invocation_deadline.get()
+    return max(deadline - time.monotonic(), 0) if deadline is not None else None
+
+
+def gather_provider_results(provider_futures: Dict[Hashable, Tuple[Future, float]],
+                            is_complete: Optional[Callable[[Hashable, Any], bool]] = None) -> Dict[Hashable, Any]:
+    """Waits for several in-flight provider calls, each bounded by its own timeout.
+
+        Futures are harvested in completion order. A provider that has not completed
+        by its own deadline (measured from the moment gathering starts), or by the
+        invocation's deadline (see set_invocation_deadline), is abandoned and reported
+        as a ProviderTimeoutError, while the remaining providers keep being awaited up
+        to their own deadlines.
+
+        Args:
+            provider_futures: A mapping of provider name (or any other hashable key identifying
+                the call) to a (future, timeout_num_seconds) tuple.
+            is_complete: Optional callback, called with the key and result of every call as it
+                completes, returning whether the results gathered so far are sufficient. Once
+                they are, the calls still pending are abandoned and reported as ProviderSkippedError.
+
+        Returns:
+            A mapping of the same keys to either the provider's response or the
+            exception instance the provider call ended with.
+    """
+    start = time.monotonic()
+    remaining_num_seconds = get_invocation_remaining_num_seconds()
+    timeouts = {name: timeout if remaining_num_seconds is None else min(timeout, remaining_num_seconds)
+                for name, (_, timeout) in provider_futures.items()}
+    deadlines = {name: start + timeout for name, timeout in timeouts.items()}
+    pending = {future: name for name, (future, _) in provider_futures.items()}
+    results = {}
+    complete = False
+
+    while pending:
+        remaining = min(deadlines[name] for name in pending.values()) - time.monotonic()
+        done, _ = wait(pending.keys(), timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            name = pending.pop(future)
+            error = future.exception()
+            results[name] = error if error is not None else future.result()
+            if not complete and is_complete is not None:
+                complete = is_complete(name, results[name])
+
+        if complete:
+            for future, name in pending.items():
+                future.cancel()
+                results[name] = ProviderSkippedError(name)
+            break
+
+        now = time.monotonic()
+        for future, name in list(pending.items()):
+            if now >= deadlines[name]:
+                del pending[future]
+                future.cancel()
+                results[name] = ProviderTimeoutError(name, timeouts[name])
+
+    return results
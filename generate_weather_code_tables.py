@@ -0,0 +1,89 @@
+"""Build-Time Weather Code Table Generator.
+
+This script compiles the provider weather code CSV files into the importable
+weather_code_tables module, so that no CSV file has to be opened or parsed on
+the request path. Each code is classified into a WeatherCondition once, at build
+time, using the same text normalization that is applied to live responses.
+
+Usage:
+    python generate_weather_code_tables.py          # (re)write weather_code_tables.py
+    python generate_weather_code_tables.py --check  # fail if weather_code_tables.py is out of date
+"""
+
+import argparse
+import csv
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+from weather_condition import convert_weather_condition_text_to_weather_condition
+
+ROOT_DIR = Path(__file__).resolve().parent
+OPEN_METEO_WEATHER_CODES_PATH = ROOT_DIR / "open_meteo_weather_codes.csv"
+WEATHER_API_WEATHER_CODES_PATH = ROOT_DIR / "weather_api_weather_codes.csv"
+OUTPUT_PATH = ROOT_DIR / "weather_code_tables.py"
+
+HEADER = '''"""Generated Weather Code Tables Module.
+
+DO NOT EDIT: this file is generated by generate_weather_code_tables.py from the
+provider weather code CSV files. Re-run the generator after changing a CSV file
+or the weather condition text classification rules.
+
+Each table maps a provider's numeric weather code to a tuple of
+(provider description, WeatherCondition member name).
+"""
+'''
+
+
+def read_weather_codes(csv_path: Path) -> Dict[int, Tuple[str, str]]:
+    """Reads a code,description CSV file and classifies every description.
+
+        Args:
+            csv_path: Path to a CSV file with 'code' and 'description' columns.
+
+        Returns:
+            A mapping of weather code to (description, WeatherCondition member name).
+    """
+    with open(csv_path, newline="") as f:
+        return {int(row["code"]): (row["description"],
+                                   convert_weather_condition_text_to_weather_condition(row["description"]).name)
+                for row in csv.DictReader(f)}
+
+
+def render_table(table_name: str, weather_codes: Dict[int, Tuple[str, str]]) -> str:
+    """Renders a weather code mapping as a Python dict literal assignment."""
+    lines = [f"{table_name} = {{"]
+    lines += [f"    {code}: ({description!r}, {condition_name!r}),"
+              for code, (description, condition_name) in sorted(weather_codes.items())]
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def generate() -> str:
+    """Returns the full source code of the weather_code_tables module."""
+    return (HEADER
+            + "\n" + render_table("OPEN_METEO_WEATHER_CODES", read_weather_codes(OPEN_METEO_WEATHER_CODES_PATH))
+            + "\n" + render_table("WEATHER_API_WEATHER_CODES", read_weather_codes(WEATHER_API_WEATHER_CODES_PATH)))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true",
+                        help="exit with a non-zero status if the generated module is out of date")
+    args = parser.parse_args()
+
+    source = generate()
+
+    if args.check:
+        if not OUTPUT_PATH.exists() or OUTPUT_PATH.read_text() != source:
+            print(f"{OUTPUT_PATH.name} is out of date, run {Path(__file__).name}")
+            return 1
+        return 0
+
+    OUTPUT_PATH.write_text(source)
+    print(f"Wrote {OUTPUT_PATH.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
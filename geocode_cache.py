@@ -0,0 +1,228 @@
+"""City Geocode Cache Module.
+
+City coordinates never change, yet every request used to resolve the city name
+through WeatherAPI before any coordinate-based provider could be queried. This
+module caches the resolved location of a city (coordinates, canonical city and
+country names) under a normalized form of the city name, in two tiers:
+    1. An in-memory dict that lives for the lifetime of the (warm) container.
+    2. A local append-only file, to which every new entry is appended as a JSON line
+       and which is read once when a container starts, so that new containers can
+       bootstrap from it. Appending keeps the cost of a new entry constant, however
+       many entries the file already holds.
+
+Lookups are keyed by normalize_city_name, which folds case, accents and
+whitespace, so that 'Zürich', ' zurich ' and 'ZURICH' share a single entry.
+
+Entries are also indexed by location (see spatial_index), so that a coordinate
+query can be answered with a known city nearby (see GeocodeCache.nearest).
+
+Environment Variables:
+    - GEOCODE_CACHE_PATH: Writable on-disk tier (defaults to /tmp/geocode_cache.json).
+    - GEOCODE_CACHE_SEED_PATH: Optional read-only file bundled with the deployment
+      to seed the cache from (defaults to geocode_cache_seed.json next to this module).
+"""
+
+import json
+import os
+import threading
+import unicodedata
+from typing import Dict, Optional, Tuple
+from spatial_index import SpatialIndex
+from weather_api import WeatherApiResponse
+
+DEFAULT_GEOCODE_CACHE_PATH = "/tmp/geocode_cache.json"
+DEFAULT_GEOCODE_CACHE_SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocode_cache_seed.json")
+
+
+class GeocodeEntry:
+    """The resolved location of a city.
+
+        Attributes:
+            city_name: The provider's canonical city name (e.g. 'New York').
+            country_name: The name of the city's country.
+            latitude: Geographic latitude coordinate.
+            longitude: Geographic longitude coordinate.
+    """
+    def __init__(self, city_name: str, country_name: str, latitude: float, longitude: float):
+        self.city_name = city_name
+        self.country_name = country_name
+        self.latitude = latitude
+        self.longitude = longitude
+
+    def __repr__(self):
+        """Returns a string representation of the GeocodeEntry instance."""
+        return (
+            f"{self.__class__.__name__}("
+            f"city_name={self.city_name!r}, "
+            f"country_name={self.country_name!r}, "
+            f"latitude={self.latitude!r}, "
+            f"longitude={self.longitude!r})"
+        )
+
+    @property
+    def coordinates(self) -> tuple:
+        """The (latitude, longitude) tuple of the city."""
+        return self.latitude, self.longitude
+
+    def to_dict(self) -> dict:
+        """Returns the entry as a JSON-serializable dict."""
+        return {"city_name": self.city_name, "country_name": self.country_name,
+                "latitude": self.latitude, "longitude": self.longitude}
+
+    @classmethod
+    def from_dict(cls, entry_dict: dict) -> "GeocodeEntry":
+        """Creates a GeocodeEntry from a dict produced by to_dict."""
+        return cls(entry_dict["city_name"], entry_dict["country_name"], entry_dict["latitude"], entry_dict["longitude"])
+
+
+def normalize_city_name(city_name: str) -> str:
+    """Normalizes a city name into a cache key that is insensitive to case, accents and whitespace.
+
+        Args:
+            city_name: The city name as requested by the client (e.g. ' São  Paulo').
+
+        Returns:
+            The normalized key (e.g. 'sao paulo').
+    """
+    decomposed = unicodedata.normalize("NFKD", city_name)
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(without_accents.casefold().split())
+
+
+class GeocodeCache:
+    """A two-tier (memory and local file) cache of city name to GeocodeEntry.
+
+        The on-disk tier is loaded lazily on the first lookup, so containers that never
+        need a geocode do not pay for reading it.
+
+        Attributes:
+            path: The writable JSON lines file backing the cache, or None for a memory-only cache.
+            seed_path: An optional read-only JSON file to bootstrap the cache from.
+    """
+    def __init__(self, path: Optional[str], seed_path: Optional[str] = None):
+        self.path = path
+        self.seed_path = seed_path
+        self._entries: Dict[str, GeocodeEntry] = {}
+        self._index = SpatialIndex()
+        self._ends_with_partial_line = False
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Reads the seed file and then the on-disk tier (which takes precedence) into memory."""
+        if self.seed_path and os.path.exists(self.seed_path):
+            try:
+                with open(self.seed_path) as f:
+                    self._load_entries(json.load(f))
+            except (IOError, ValueError, KeyError) as e:
+                print(f"Could not read geocode cache file {self.seed_path}: {e}")
+
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    # later lines take precedence; a line cut short by a crashed writer is skipped
+                    for line_number, line in enumerate(f, 1):
+                        self._ends_with_partial_line = not line.endswith("\n")
+                        if not line.strip():
+                            continue
+                        try:
+                            self._load_entries(json.loads(line))
+                        except (ValueError, KeyError, AttributeError) as e:
+                            print(f"Skipping line {line_number} of geocode cache file {self.path}: {e}")
+            except IOError as e:
+                print(f"Could not read geocode cache file {self.path}: {e}")
+
+        for entry in self._entries.values():
+            self._index.insert(entry.latitude, entry.longitude, entry)
+        self._loaded = True
+
+    def _load_entries(self, entry_dicts: dict):
+        self._entries.update({key: GeocodeEntry.from_dict(entry_dict) for key, entry_dict in entry_dicts.items()})
+
+    def _append(self, entries: Dict[str, GeocodeEntry]):
+        """Appends entries to the on-disk tier as a single JSON line.
+
+            The line is written with a single append, so that concurrent writers (threads, or
+            processes sharing the file) never interleave their lines.
+        """
+        if not self.path:
+            return
+        line = json.dumps({key: entry.to_dict() for key, entry in entries.items()}) + "\n"
+        if self._ends_with_partial_line:
+            # terminates the partial line, instead of appending to it
+            line, self._ends_with_partial_line = "\n" + line, False
+        try:
+            with open(self.path, "a") as f:
+                f.write(line)
+        except IOError as e:
+            print(f"Could not write geocode cache file {self.path}: {e}")
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+
+    def get(self, city_name: str) -> Optional[GeocodeEntry]:
+        """Returns the cached location of a city, or None if it has not been resolved before."""
+        self._ensure_loaded()
+        return self._entries.get(normalize_city_name(city_name))
+
+    def nearest(self, latitude: float, longitude: float, max_distance_km: float) -> Optional[Tuple[GeocodeEntry, float]]:
+        """Returns the cached city nearest to a location, within max_distance_km.
+
+            Returns:
+                A (GeocodeEntry, distance_km) tuple, or None if no cached city lies within max_distance_km.
+        """
+        self._ensure_loaded()
+        return self._index.nearest(latitude, longitude, max_distance_km)
+
+    def put(self, city_name: str, weather_api_response: WeatherApiResponse) -> Optional[GeocodeEntry]:
+        """Caches the location resolved by WeatherAPI for a city.
+
+            The entry is stored under both the requested name and the canonical name
+            returned by WeatherAPI, so that e.g. 'NYC' and 'New York' share a location.
+            The canonical name is only added if it is not cached yet, or cached at the same
+            coordinates: canonical names are ambiguous ('Paris, TX' resolves to 'Paris'), so a
+            request for one city never repoints the name of another.
+
+            Args:
+                city_name: The city name as requested by the client.
+                weather_api_response: The WeatherAPI response the city name was resolved to.
+
+            Returns:
+                The cached GeocodeEntry, or None if the response carries no coordinates.
+        """
+        if weather_api_response.latitude is None or weather_api_response.longitude is None:
+            return None
+
+        entry = GeocodeEntry(weather_api_response.city_name, weather_api_response.country_name,
+                             weather_api_response.latitude, weather_api_response.longitude)
+        keys = {normalize_city_name(city_name)}
+
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if weather_api_response.city_name:
+                canonical_key = normalize_city_name(weather_api_response.city_name)
+                canonical_entry = self._entries.get(canonical_key)
+                if canonical_entry is None or canonical_entry.coordinates == entry.coordinates:
+                    keys.add(canonical_key)
+            self._entries.update({key: entry for key in keys})
+            self._index.insert(entry.latitude, entry.longitude, entry)
+
+        # the file is written outside the lock, so that it never delays other threads' new entries
+        self._append({key: entry for key in keys})
+
+        return entry
+
+    def clear(self):
+        """Forgets all in-memory entries. The file tiers are left untouched and read again on the next lookup."""
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self._loaded = False
+
+
+geocode_cache = GeocodeCache(os.environ.get("GEOCODE_CACHE_PATH", DEFAULT_GEOCODE_CACHE_PATH),
+                             os.environ.get("GEOCODE_CACHE_SEED_PATH", DEFAULT_GEOCODE_CACHE_SEED_PATH))
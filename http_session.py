@@ -0,0 +1,218 @@
+"""Pooled HTTP Session Module.
+
+This module owns the HTTP connection pools used by the service provider clients.
+Every provider gets its own module-level requests.Session, created on first use
+and then reused by all subsequent requests of the (warm) Lambda container, so
+that TCP and TLS handshakes are only paid once per container instead of once
+per request. Every request is bounded by the provider's connect and read timeouts.
+
+Transient failures (connection errors and resets, timeouts, and 429 / 5xx responses) are
+retried with jittered exponential backoff, honoring Retry-After, up to the provider's
+maximum number of attempts. All attempts of a request share a single deadline: the
+provider's total timeout (the time fetch_engine waits for the call), further bounded by
+the invocation's deadline (see fetch_engine.set_invocation_deadline), so that retries
+never outlive the call nor push the invocation past its timeout.
+
+Provider settings default to the values declared by the provider module and can be
+overridden through environment variables prefixed with the provider's name, e.g.:
+    WEATHER_API_CONNECT_TIMEOUT_NUM_SECONDS=1.5
+    OPEN_METEO_POOL_MAXSIZE=20
+    OPEN_METEO_MAX_ATTEMPTS=1
+
+Main components:
+    - HttpSessionConfig: Per-provider timeout and connection pool settings.
+    - get_session: Returns the shared, pooled session of a provider.
+    - session_get: Performs a GET request through a provider's session with its timeouts and retries.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import fetch_engine
+import metrics
+
+# Responses worth another attempt: rate limiting and server-side failures, which are usually transient
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# No retry is attempted with less time left until the request's deadline
+RETRY_MIN_ATTEMPT_NUM_SECONDS = 0.2
+
+
+class HttpSessionConfig:
+    """Connection pool and timeout settings of a single service provider.
+
+        Attributes:
+            name: The provider name, also used as the environment variable prefix (e.g. 'WEATHER_API').
+            connect_timeout_num_seconds: Maximum time to establish a connection.
+            read_timeout_num_seconds: Maximum time to wait between bytes of the response.
+            pool_connections: Number of per-host connection pools to keep.
+            pool_maxsize: Maximum number of keep-alive connections kept per host.
+            max_attempts: Maximum number of attempts of a request, including the first one.
+            retry_base_delay_num_seconds: Upper bound of the (jittered) delay before the first retry,
+                doubled for every further retry.
+            retry_max_delay_num_seconds: Upper bound of the delay before any retry.
+    """
+    def __init__(self, name: str, connect_timeout_num_seconds: float, read_timeout_num_seconds: float,
+                 pool_connections: int = 1, pool_maxsize: int = 10, max_attempts: int = 3,
+                 retry_base_delay_num_seconds: float = 0.1, retry_max_delay_num_seconds: float = 1.0):
+        """Initializes the config, letting '<name>_<SETTING>' environment variables override the defaults."""
+        self.name = name
+        self.connect_timeout_num_seconds = float(os.environ.get(f"{name}_CONNECT_TIMEOUT_NUM_SECONDS",
+                                                                connect_timeout_num_seconds))
+        self.read_timeout_num_seconds = float(os.environ.get(f"{name}_READ_TIMEOUT_NUM_SECONDS",
+                                                             read_timeout_num_seconds))
+        self.pool_connections = int(os.environ.get(f"{name}_POOL_CONNECTIONS", pool_connections))
+        self.pool_maxsize = int(os.environ.get(f"{name}_POOL_MAXSIZE", pool_maxsize))
+        self.max_attempts = int(os.environ.get(f"{name}_MAX_ATTEMPTS", max_attempts))
+        self.retry_base_delay_num_seconds = float(os.environ.get(f"{name}_RETRY_BASE_DELAY_NUM_SECONDS",
+                                                                 retry_base_delay_num_seconds))
+        self.retry_max_delay_num_seconds = float(os.environ.get(f"{name}_RETRY_MAX_DELAY_NUM_SECONDS",
+                                                                retry_max_delay_num_seconds))
+
+    @property
+    def timeout(self) -> tuple:
+        """The (connect, read) timeout tuple in the format expected by requests."""
+        return self.connect_timeout_num_seconds, self.read_timeout_num_seconds
+
+    @property
+    def total_timeout_num_seconds(self) -> float:
+        """An upper bound for a full request: connecting plus reading the response."""
+        return self.connect_timeout_num_seconds + self.read_timeout_num_seconds
+
+    def __repr__(self):
+        """Returns a string representation of the HttpSessionConfig instance."""
+        return (
+            f"{self.__class__.__name__}("
+            f"name={self.name!r}, "
+            f"connect_timeout_num_seconds={self.connect_timeout_num_seconds!r}, "
+            f"read_timeout_num_seconds={self.read_timeout_num_seconds!r}, "
+            f"pool_connections={self.pool_connections!r}, "
+            f"pool_maxsize={self.pool_maxsize!r}, "
+            f"max_attempts={self.max_attempts!r})"
+        )
+
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(config: HttpSessionConfig) -> requests.Session:
+    """Returns the shared keep-alive session of a provider, creating it on first use.
+
+        Args:
+            config: The provider's HttpSessionConfig.
+
+        Returns:
+            A requests.Session whose HTTP and HTTPS adapters pool connections
+            according to the config.
+    """
+    session = _sessions.get(config.name)
+
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(config.name)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=config.pool_connections, pool_maxsize=config.pool_maxsize)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sessions[config.name] = session
+
+    return session
+
+
+def is_retryable_error(error: requests.exceptions.RequestException) -> bool:
+    """Returns whether a failed request may succeed if repeated: connection errors (resets included) and timeouts.
+
+        GET requests are idempotent, so a request that timed out while reading is safe to repeat too.
+    """
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def get_retry_delay_num_seconds(config: HttpSessionConfig, attempt: int,
+                                response: Optional[requests.Response] = None) -> float:
+    """Returns how long to wait before retrying a failed attempt (numbered from 1).
+
+        The delay is drawn uniformly up to an exponentially growing bound ("full jitter"), so that
+        clients failing together do not retry together. A Retry-After header (in seconds) is honored.
+    """
+    delay_num_seconds = random.uniform(0, min(config.retry_max_delay_num_seconds,
+                                              config.retry_base_delay_num_seconds * 2 ** (attempt - 1)))
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after is not None and retry_after.strip().isdigit():
+        delay_num_seconds = max(delay_num_seconds, float(retry_after))
+    return delay_num_seconds
+
+
+def session_get(config: HttpSessionConfig, url: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+    """Performs a GET request over the provider's pooled session, bounded by its timeouts and retried if transient.
+
+        Failed attempts (see is_retryable_error and RETRYABLE_STATUS_CODES) are retried after a
+        backoff delay (see get_retry_delay_num_seconds), as long as the delay leaves at least
+        RETRY_MIN_ATTEMPT_NUM_SECONDS before the request's deadline. Every attempt's timeouts are
+        capped by the time left until the deadline.
+
+        Args:
+            config: The provider's HttpSessionConfig.
+            url: The URL to request.
+            params: Optional query string parameters, URL-encoded by requests.
+
+        Returns:
+            The requests.Response object of the last attempt, whatever its status code.
+
+        Raises:
+            requests.exceptions.RequestException: On connection errors and timeouts of the last attempt.
+    """
+    session = get_session(config)
+    start = time.monotonic()
+    remaining_num_seconds = config.total_timeout_num_seconds
+    invocation_remaining_num_seconds = fetch_engine.get_invocation_remaining_num_seconds()
+    if invocation_remaining_num_seconds is not None:
+        remaining_num_seconds = min(remaining_num_seconds, invocation_remaining_num_seconds)
+    deadline = start + remaining_num_seconds
+
+    attempt = 1
+    while True:
+        remaining_num_seconds = max(deadline - time.monotonic(), 0.001)
+        timeout = (min(config.connect_timeout_num_seconds, remaining_num_seconds),
+                   min(config.read_timeout_num_seconds, remaining_num_seconds))
+        response, error = None, None
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= config.max_attempts:
+                return response
+            failure = f"HTTP {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            if not is_retryable_error(e) or attempt >= config.max_attempts:
+                raise
+            error, failure = e, repr(e)
+
+        delay_num_seconds = get_retry_delay_num_seconds(config, attempt, response)
+        if time.monotonic() + delay_num_seconds + RETRY_MIN_ATTEMPT_NUM_SECONDS > deadline:
+            print(f"Not retrying {config.name} request after {failure}: its deadline is too close")
+            if error is not None:
+                raise error
+            return response
+
+        if response is not None:
+            # releases the connection back to the pool, as the body of a failed attempt is never read
+            response.close()
+        print(f"Retrying {config.name} request in {delay_num_seconds:.3f}s after {failure} "
+              f"(attempt {attempt + 1} of {config.max_attempts})")
+        metrics.increment("ProviderRetry")
+        time.sleep(delay_num_seconds)
+        attempt += 1
+
+
+def close_sessions():
+    """Closes all pooled sessions, e.g. when benchmarking cold connections or shutting down."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
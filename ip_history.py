@@ -0,0 +1,330 @@
+"""Per-IP Request History Module.
+
+This module maintains the audit trail of every client IP in the 'RequestIPLogs'
+DynamoDB table: the timestamp of its last request and the cities it recently
+requested. Every update returns the previous values of both fields in the same
+round trip, so they can be reported back to the client.
+
+The update does not affect the weather data of the response, so it is taken off
+the request's critical path by the IpHistoryWriter: updates are submitted as soon
+as a request is validated, run concurrently with the weather fetch on a small
+dedicated thread pool, are retried on failure, and are flushed before the
+invocation ends. Only the updates submitted by the invocation itself are flushed, so
+that invocations served concurrently (see server) never wait for each other's writes.
+A write that still fails is logged instead of failing the request.
+
+A warm container often serves the same IP several times a minute, so the record of
+every IP it updated (its last access and recent cities) is kept in a bounded LRU, the
+ip_record_cache. A request from a cached IP is answered with the previous values of
+the cached record right away, and its update is not flushed: the response never waits
+for DynamoDB. The update completes in the background, in Lambda possibly only once the
+container is thawed for a later invocation (and it is lost if the container is reclaimed
+while frozen). The record is kept consistent from the values every update returns.
+Records expire after IP_RECORD_CACHE_TTL_NUM_SECONDS, which bounds how long requests of
+the same IP served by other containers may be missing from the history.
+
+Environment Requirements:
+    - DynamoDB Table: 'RequestIPLogs' must exist with 'ip' as the Partition Key.
+    - IP_RECORD_CACHE_MAX_ENTRIES: Number of IP records kept per container (default 1024, 0 disables it).
+    - IP_RECORD_CACHE_TTL_NUM_SECONDS: For how long a record is served without DynamoDB (default 60).
+"""
+
+import contextvars
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+import metrics
+from ttl_cache import TTLCache
+
+IP_TABLE_NAME = "RequestIPLogs"
+
+# Number of recent cities returned to the client, and the number kept in DynamoDB before truncating
+RECENT_CITIES_MAX_LEN = 10
+RECENT_CITIES_CAPACITY = 2 * RECENT_CITIES_MAX_LEN
+
+IP_HISTORY_WRITE_MAX_ATTEMPTS = 2
+IP_HISTORY_WRITE_RETRY_DELAY_NUM_SECONDS = 0.05
+IP_HISTORY_FLUSH_TIMEOUT_NUM_SECONDS = 2.0
+
+IP_RECORD_CACHE_MAX_ENTRIES = int(os.environ.get("IP_RECORD_CACHE_MAX_ENTRIES", 1024))
+IP_RECORD_CACHE_TTL_NUM_SECONDS = int(os.environ.get("IP_RECORD_CACHE_TTL_NUM_SECONDS", 60))
+
+# ip -> (LastAccessTimestamp, recent_cities up to RECENT_CITIES_MAX_LEN, sequence), as stored by the last update
+ip_record_cache = TTLCache(IP_RECORD_CACHE_MAX_ENTRIES)
+_ip_record_cache_lock = threading.Lock()
+# orders the updates submitted by this process, as several requests of an IP may share a (second) timestamp
+_ip_record_sequence = itertools.count()
+
+_ip_table = None
+_ip_table_lock = threading.Lock()
+
+
+def get_ip_table():
+    """Returns the 'RequestIPLogs' DynamoDB Table resource, creating it on first use.
+
+        boto3 is imported here rather than at module level: the first call happens on the
+        IpHistoryWriter's thread, so the import and client construction of a cold container
+        overlap with the weather fetch instead of delaying the whole invocation.
+    """
+    global _ip_table
+    if _ip_table is None:
+        with _ip_table_lock:
+            if _ip_table is None:
+                import boto3
+                _ip_table = boto3.resource('dynamodb').Table(IP_TABLE_NAME)
+    return _ip_table
+
+
+def set_ip_table(table):
+    """Replaces the DynamoDB Table resource, e.g. with a local_dynamodb stand-in in tests and benchmarks.
+
+        The cached IP records, read from the replaced table, are dropped.
+    """
+    global _ip_table
+    _ip_table = table
+    ip_record_cache.clear()
+
+
+def deserialize_item(item: dict) -> dict:
+    """Converts an item in the low-level AttributeValue format into Python values.
+
+        The Table resource deserializes the items of successful calls, but not the item
+        returned in the error response of a failed condition (ReturnValuesOnConditionCheckFailure).
+    """
+    from boto3.dynamodb.types import TypeDeserializer
+
+    deserializer = TypeDeserializer()
+    return {name: deserializer.deserialize(value) for name, value in item.items()}
+
+
+@metrics.timed("IpHistoryUpdate")
+def update_ip_fields_in_db(ip, last_access_timestamp: int, new_city: str | List[str]) \
+        -> Tuple[Optional[int], Optional[List[str]], bool]:
+    """Updates the user's audit trail (last_access_timestamp and recent_cities) in DynamoDB.
+
+        Atomically updates the 'LastAccessTimestamp' and prepends the requested
+        city (or cities, for batch requests) to the IP's 'recent_cities' list, and
+        returns the previous values of both fields from the same round trip (ALL_OLD).
+
+        'recent_cities' is bounded: the update is conditioned on the list having room
+        for the new cities within RECENT_CITIES_CAPACITY. When it is full, DynamoDB
+        returns the old item with the failed condition, and the list is rewritten
+        truncated to RECENT_CITIES_MAX_LEN. Since DynamoDB cannot append to and
+        truncate a list in the same expression, this second round trip is made only
+        once every RECENT_CITIES_CAPACITY - RECENT_CITIES_MAX_LEN cities, keeping
+        both the item size and the per-request cost constant. A batch of more than
+        RECENT_CITIES_CAPACITY cities only records the first RECENT_CITIES_CAPACITY of them.
+
+        Returns:
+            A tuple containing (previous_timestamp, previous_recent_city_list, success_flag).
+    """
+    new_cities = (new_city if type(new_city) is list else [new_city])[:RECENT_CITIES_CAPACITY]
+
+    try:
+        response = get_ip_table().update_item(
+            Key={
+                'ip': ip
+            },
+            UpdateExpression="SET LastAccessTimestamp = :t,"
+                             " recent_cities = list_append(:c, if_not_exists(recent_cities, :empty))",
+            ConditionExpression="attribute_not_exists(recent_cities) OR size(recent_cities) <= :max_size",
+            ExpressionAttributeValues={
+                ':t': last_access_timestamp,
+                ':c': new_cities,
+                ':empty': [],
+                ':max_size': RECENT_CITIES_CAPACITY - len(new_cities)
+            },
+            ReturnValues="ALL_OLD",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD"
+        )
+        old_item = response.get('Attributes', {})
+
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            print(f"LastAccessTimestamp Update failed: {str(e)}")
+            return None, None, False
+
+        old_item = deserialize_item(e.response.get('Item', {}))
+        if not truncate_ip_recent_cities_in_db(ip, last_access_timestamp, new_cities, old_item):
+            return None, None, False
+
+    print(f"IP fields Update successful, previous values: {old_item}")
+    previous_last_access_timestamp = old_item.get('LastAccessTimestamp', None)
+    previous_recent_cities = old_item.get('recent_cities', [])
+
+    return (int(previous_last_access_timestamp) if previous_last_access_timestamp else None,
+            previous_recent_cities[:RECENT_CITIES_MAX_LEN], True)
+
+
+@metrics.timed("IpHistoryTruncate")
+def truncate_ip_recent_cities_in_db(ip, last_access_timestamp: int, new_cities: List[str], old_item: dict) -> bool:
+    """Rewrites a full 'recent_cities' list with the new cities prepended, truncated to RECENT_CITIES_MAX_LEN.
+
+        The write is conditioned on the item not having been updated since old_item was read.
+
+        Returns:
+            True if the update succeeded, False otherwise.
+    """
+    condition_expression = "LastAccessTimestamp = :old_t" if 'LastAccessTimestamp' in old_item \
+        else "attribute_not_exists(LastAccessTimestamp)"
+    expression_attribute_values = {
+        ':t': last_access_timestamp,
+        ':c': (new_cities + old_item.get('recent_cities', []))[:RECENT_CITIES_MAX_LEN]
+    }
+    if 'LastAccessTimestamp' in old_item:
+        expression_attribute_values[':old_t'] = old_item['LastAccessTimestamp']
+
+    try:
+        get_ip_table().update_item(
+            Key={
+                'ip': ip
+            },
+            UpdateExpression="SET LastAccessTimestamp = :t, recent_cities = :c",
+            ConditionExpression=condition_expression,
+            ExpressionAttributeValues=expression_attribute_values
+        )
+        return True
+    except ClientError as e:
+        print(f"recent_cities truncation failed: {str(e)}")
+        return False
+
+
+def get_updated_ip_record(last_access_timestamp: int, new_cities: List[str], previous_recent_cities: List[str],
+                          sequence: int) -> Tuple[int, List[str], int]:
+    """Returns the record of an IP after the update submitted with the given sequence number."""
+    return last_access_timestamp, (new_cities + previous_recent_cities)[:RECENT_CITIES_MAX_LEN], sequence
+
+
+def put_ip_record(ip, record: Tuple[int, List[str], int]):
+    """Caches the record of an IP, unless the record of a later submitted update is already cached.
+
+        The record of an update replaces the one cached for the same update when it was
+        submitted, as the values returned by DynamoDB also reflect other containers' updates.
+    """
+    if IP_RECORD_CACHE_MAX_ENTRIES <= 0:
+        return
+    with _ip_record_cache_lock:
+        cached_record = ip_record_cache.get(ip)
+        if cached_record is None or cached_record[2] <= record[2]:
+            ip_record_cache.put(ip, record, time.time() + IP_RECORD_CACHE_TTL_NUM_SECONDS)
+
+
+class IpHistoryWriter:
+    """Runs IP history updates concurrently with request processing (write-behind).
+
+        Submitted updates start immediately on a dedicated thread pool. A failed update is
+        retried up to IP_HISTORY_WRITE_MAX_ATTEMPTS times and then logged. The updates an
+        invocation submitted between start_invocation() and end_invocation() are awaited by
+        flush(), which is called before the invocation ends.
+
+        The previous values of IPs found in the ip_record_cache are returned without awaiting
+        their update, which is not flushed either.
+    """
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ip-history")
+        self._pending: set = set()
+        self._lock = threading.Lock()
+        # the updates submitted by the current invocation, None outside of one
+        self._invocation_writes: contextvars.ContextVar[Optional[list]] = \
+            contextvars.ContextVar("ip_history_invocation_writes", default=None)
+
+    def _write(self, ip, last_access_timestamp: int, new_city: str | List[str], sequence: int) \
+            -> Tuple[Optional[int], Optional[List[str]], bool]:
+        new_cities = new_city if type(new_city) is list else [new_city]
+        for attempt in range(1, IP_HISTORY_WRITE_MAX_ATTEMPTS + 1):
+            try:
+                result = update_ip_fields_in_db(ip, last_access_timestamp, new_city)
+            except Exception as e:
+                print(f"IP history write attempt {attempt} raised an error: {e!r}")
+                result = None, None, False
+
+            if result[2]:
+                put_ip_record(ip, get_updated_ip_record(last_access_timestamp, new_cities, result[1], sequence))
+                return result
+            if attempt < IP_HISTORY_WRITE_MAX_ATTEMPTS:
+                time.sleep(IP_HISTORY_WRITE_RETRY_DELAY_NUM_SECONDS * attempt)
+
+        print(f"IP history write for {ip} failed after {IP_HISTORY_WRITE_MAX_ATTEMPTS} attempts")
+        metrics.increment("IpHistoryWriteFailure")
+        # the cached record may hold the values of this update, which the table does not
+        ip_record_cache.invalidate(ip)
+        return None, None, False
+
+    def submit(self, ip, last_access_timestamp: int, new_city: str | List[str]) -> Future:
+        """Starts an IP history update in the background.
+
+            Returns:
+                A Future resolving to the (previous_timestamp, previous_recent_city_list, success_flag)
+                tuple of update_ip_fields_in_db. The future never raises. For an IP found in the
+                ip_record_cache, the future is already resolved with the cached record, and the
+                update is left out of the invocation's flush.
+        """
+        sequence = next(_ip_record_sequence)
+        cached_record = ip_record_cache.get(ip) if IP_RECORD_CACHE_MAX_ENTRIES > 0 else None
+        metrics.increment("IpRecordCacheHit" if cached_record is not None else "IpRecordCacheMiss")
+        if cached_record is not None:
+            # later requests on this container see this access before the update completes
+            new_cities = new_city if type(new_city) is list else [new_city]
+            put_ip_record(ip, get_updated_ip_record(last_access_timestamp, new_cities, cached_record[1], sequence))
+
+        # runs in a copy of the submitting context, so that the update is attributed to the invocation's metrics
+        future = self._executor.submit(contextvars.copy_context().run, self._write, ip, last_access_timestamp,
+                                       new_city, sequence)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        invocation_writes = self._invocation_writes.get()
+        if cached_record is None:
+            if invocation_writes is not None:
+                invocation_writes.append(future)
+            return future
+        cached_future = Future()
+        cached_future.set_result((cached_record[0], cached_record[1], True))
+        return cached_future
+
+    def _discard(self, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def start_invocation(self) -> contextvars.Token:
+        """Starts collecting the updates submitted in the current context (and its copies) for flush.
+
+            Returns:
+                A token ending the invocation, see end_invocation.
+        """
+        return self._invocation_writes.set([])
+
+    def end_invocation(self, token: contextvars.Token):
+        """Stops collecting the updates of the invocation started by the start_invocation call that returned token."""
+        self._invocation_writes.reset(token)
+
+    def flush(self, timeout_num_seconds: float = IP_HISTORY_FLUSH_TIMEOUT_NUM_SECONDS) -> bool:
+        """Waits for the updates submitted by the current invocation to finish.
+
+            Outside of an invocation, every update still in flight is awaited.
+
+            Returns:
+                True if every update finished within the timeout, False otherwise.
+        """
+        invocation_writes = self._invocation_writes.get()
+        if invocation_writes is not None:
+            pending = [future for future in invocation_writes if not future.done()]
+        else:
+            with self._lock:
+                pending = list(self._pending)
+        if len(pending) == 0:
+            return True
+
+        _, not_done = wait(pending, timeout=timeout_num_seconds)
+        if not_done:
+            print(f"{len(not_done)} IP history writes did not finish within {timeout_num_seconds}s")
+        return len(not_done) == 0
+
+
+ip_history_writer = IpHistoryWriter()
@@ -0,0 +1,28 @@
+"""JSON Encoding Backend Module.
+
+This module provides the JSON encoder used for HTTP response bodies. If the
+optional orjson package is installed, it is used as a (several times) faster
+drop-in backend; otherwise the standard library json module is used. Both
+backends produce equivalent JSON documents, so clients cannot tell them apart
+beyond orjson emitting non-ASCII characters as UTF-8 instead of escaping them.
+
+Usage:
+    body = json_codec.dumps({"city": "London", "weather": weather_data.to_dict()})
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional dependency, not bundled with the deployment package
+    orjson = None
+
+BACKEND_NAME = "orjson" if orjson is not None else "json"
+
+
+def dumps(obj: Any) -> str:
+    """Serializes obj (built from dicts, lists, strings, numbers, booleans and None) into a JSON string."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj)
@@ -3,31 +3,67 @@
 This module acts as the entry point for the Weather Aggregator service. It
 manages the end-to-end lifecycle of an HTTP request, including:
     1. Extracting parameters and client metadata (IP).
-    2. Interacting with DynamoDB to track user access patterns and history.
+    2. Tracking user access patterns and history in DynamoDB (see ip_history).
     3. Coordinating with the business logic layer to fetch city weather data.
     4. Mapping internal outcomes to standard HTTP status codes and responses.
+    5. Emitting the invocation's per-stage timings as a structured metrics record (see metrics).
+
+Scheduled invocations refresh the popular cities in the shared weather cache instead
+(see popular_cities_refresh).
+
+Requests either ask for a single city (?city=CityName) or, in batch mode, for up to
+MAX_BATCH_CITIES cities at once (?cities=a,b,c or a POST body of {"cities": [...]}),
+in which case the response carries a result or an error for every city. A location
+may be asked for by its coordinates instead (?lat=..&lon=..): it is served with the
+data of the nearest known city (see city_weather_data.fetch_location_weather_data).
+
+Weather responses are cacheable by clients and CDNs unless they carry the per-IP history:
+requests opting out of it (?history=false) get an ETag and a Cache-Control max-age lasting
+until the aggregated data is expected to change, and a 304 Not Modified without a body when
+their If-None-Match header matches.
 
 Environment Requirements:
     - DynamoDB Table: 'RequestIPLogs' must exist with 'ip' as the Partition Key.
 """
+from __future__ import annotations
+
+import base64
+import hashlib
 import json
-import boto3
+import math
 import time
 from typing import Optional, List, Tuple, TYPE_CHECKING
 
 # makes AWS specific type hinting available in IDE, without bundling the library when deploying to the cloud
 if TYPE_CHECKING:
     from aws_lambda_typing.context import Context
+    from concurrent.futures import Future
+    from city_weather_data import CityWeatherData, CityWeatherDataFetchError
 
-from botocore.exceptions import ClientError
-
-import city_weather_data
+# city_weather_data (requests) and ip_history (boto3) are imported inside the functions that need them,
+# so that cold starts and requests failing validation do not pay for importing them
+import json_codec
+import metrics
 import utils
-from city_weather_data import CityWeatherDataCityNotFoundError
-from city_weather_data import CityWeatherDataRequestError
 
-dynamodb = boto3.resource('dynamodb')
-ip_table = dynamodb.Table("RequestIPLogs")
+MAX_BATCH_CITIES = 50
+
+# Time kept for building the response and flushing the IP history once providers stop being awaited
+RESPONSE_TIME_MARGIN_NUM_SECONDS = 0.5
+
+# Responses carrying the per-IP history are never stored, so that no cache serves an IP's history to another
+HISTORY_RESPONSE_CACHE_CONTROL = "private, no-store"
+
+
+def is_scheduled_event(event: dict) -> bool:
+    """Returns whether the invocation was triggered by a schedule (EventBridge) rather than an HTTP request."""
+    return event.get('source') == 'aws.events' or event.get('detail-type') == 'Scheduled Event'
+
+
+def get_remaining_time_num_seconds(context: Context) -> Optional[float]:
+    """Returns the time left until the invocation times out, or None if the context does not report it."""
+    get_remaining_time_in_millis = getattr(context, 'get_remaining_time_in_millis', None)
+    return get_remaining_time_in_millis() / 1000 if get_remaining_time_in_millis is not None else None
 
 
 def get_request_ip(event: dict) -> Optional[str]:
@@ -37,93 +73,202 @@ def get_request_ip(event: dict) -> Optional[str]:
 
 def get_request_city_param(event: dict) -> Optional[str]:
     """Retrieves the 'city' query string parameter from the incoming request."""
-    return event.get('queryStringParameters', {}).get('city', None)
+    return (event.get('queryStringParameters') or {}).get('city', None)
+
+
+def get_request_coordinates_param(event: dict) -> Optional[Tuple[float, float]]:
+    """Retrieves the 'lat' and 'lon' query string parameters of a coordinate query.
+
+        Returns:
+            The requested (latitude, longitude), or None if the request is not a coordinate query.
+
+        Raises:
+            ValueError: If only one of the parameters is given, or they are not valid coordinates.
+    """
+    params = event.get('queryStringParameters') or {}
+    latitude_param, longitude_param = params.get('lat', None), params.get('lon', None)
+    if latitude_param is None and longitude_param is None:
+        return None
+    if latitude_param is None or longitude_param is None:
+        raise ValueError("both 'lat' and 'lon' are required")
+
+    latitude, longitude = float(latitude_param), float(longitude_param)
+    if not (math.isfinite(latitude) and math.isfinite(longitude)) \
+            or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("'lat' must be within [-90, 90] and 'lon' within [-180, 180]")
+    return latitude, longitude
+
+
+def get_request_history_param(event: dict) -> bool:
+    """Retrieves the 'history' query string parameter: whether the IP history is included (the default)."""
+    return (event.get('queryStringParameters') or {}).get('history', 'true').lower() not in ('false', '0', 'no')
+
+
+def get_request_if_none_match(event: dict) -> Optional[str]:
+    """Retrieves the If-None-Match header of the request (header names are lower-cased by the HTTP API)."""
+    return (event.get('headers') or {}).get('if-none-match', None)
+
+
+def get_request_cities_param(event: dict) -> Optional[List[str]]:
+    """Retrieves the cities of a batch request.
 
+        Cities are read from the comma-separated 'cities' query string parameter or,
+        for POST requests, from the 'cities' list of the JSON request body.
 
-def get_response(status_code: int, context: Context, content_type: str = "application/json", **kwargs) -> dict:
+        Returns:
+            The list of requested city names, or None if the request is not a batch request.
+
+        Raises:
+            ValueError: If the POST body is not a JSON object or 'cities' is not a list of strings.
+    """
+    cities_param = (event.get('queryStringParameters') or {}).get('cities', None)
+    if cities_param is not None:
+        return [city.strip() for city in cities_param.split(',') if city.strip()]
+
+    body = event.get('body')
+    if event.get('requestContext', {}).get('http', {}).get('method') != 'POST' or not body:
+        return None
+
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+
+    parsed_body = json.loads(body)
+    if not isinstance(parsed_body, dict):
+        raise ValueError("the request body must be a JSON object")
+
+    cities = parsed_body.get('cities', None)
+    if cities is None:
+        return None
+    if not isinstance(cities, list) or not all(isinstance(city, str) for city in cities):
+        raise ValueError("'cities' must be a list of city names")
+
+    return [city.strip() for city in cities if city.strip()]
+
+
+def get_response(status_code: int, context: Context, content_type: str = "application/json",
+                 cache_control: Optional[str] = None, etag: Optional[str] = None, **kwargs) -> dict:
     """Constructs a standardized HTTP response for the Lambda Gateway.
 
         Args:
             status_code: HTTP status code to return.
             context: AWS Lambda context object (used for Request ID).
             content_type: MIME type for the response header.
+            cache_control: Optional Cache-Control header value.
+            etag: Optional ETag header value.
             **kwargs: Arbitrary key-value pairs to include in the JSON body.
 
         Returns:
             A dictionary formatted as an AWS Lambda HTTP response.
     """
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': content_type,
-            "X-Request-ID": context.aws_request_id
-        },
-        'body': json.dumps({
+    with metrics.timer("Serialize"):
+        # the whole body, including nested weather data dicts, is encoded in a single pass
+        body = json_codec.dumps({
             "requestId": context.aws_request_id,
         } | kwargs)  # add kwargs to body dict
+
+    headers = {
+        'Content-Type': content_type,
+        "X-Request-ID": context.aws_request_id
     }
+    if cache_control is not None:
+        headers['Cache-Control'] = cache_control
+    if etag is not None:
+        headers['ETag'] = etag
 
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': body
+    }
 
-def get_ip_last_accessed_timestamp_from_db(ip) -> Tuple[Optional[int], bool]:
-    """Retrieves the most recent access timestamp for a specific IP from DynamoDB.
 
-        Args:
-            ip: The client's IP address.
+def get_etag(content: dict) -> str:
+    """Returns a weak entity tag of a response's cacheable content (weather results, without any per-IP data).
 
-        Returns:
-            A tuple containing (timestamp_epoch, success_flag).
+        The tag is weak as the body also carries the request id, which differs between equivalent responses.
     """
-    try:
-        # Only retrieve the 'LastAccessTimestamp' attribute
-        response = ip_table.get_item(Key={'ip': ip},
-                                     ProjectionExpression='LastAccessTimestamp')
-        last_access_timestamp = response.get('Item', {}).get('LastAccessTimestamp', None)
+    return 'W/"' + hashlib.sha256(json_codec.dumps(content).encode('utf-8')).hexdigest()[:32] + '"'
 
-        return (int(last_access_timestamp) if last_access_timestamp else None), True
-    except ClientError as e:
-        print(f"Error retrieving LastAccessTimestamp: {e}")
-        return None, False
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Returns whether an If-None-Match header value matches etag, using the weak comparison of RFC 9110."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return etag.removeprefix('W/') in (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
 
-def update_ip_fields_in_db(ip, last_access_timestamp: int, new_city: str) \
-        -> Tuple[Optional[int], Optional[List[str]], bool]:
-    """Updates the user's audit trail (last_access_timestamp and recent_cities) in DynamoDB.
 
-        Atomically updates the 'LastAccessTimestamp' and appends the requested
-        city to the IP's aggregated 'recent_cities' list.
+def get_cacheable_response(context: Context, content: dict, max_age_num_seconds: int,
+                           if_none_match: Optional[str]) -> dict:
+    """Returns a cacheable HTTP 200 response of content, or an HTTP 304 Not Modified if the client's copy matches it.
 
-        Returns:
-            A tuple containing (updated_timestamp, recent_city_list, success_flag).
+        Args:
+            context: AWS Lambda context object (used for Request ID).
+            content: The body fields, free of any per-IP data.
+            max_age_num_seconds: For how long caches may serve the response without revalidating it.
+            if_none_match: The request's If-None-Match header value, if any.
     """
-    try:
-        # 4. Perform the Update
-        response = ip_table.update_item(
-            Key={
-                'ip': ip
-            },
-            UpdateExpression="SET LastAccessTimestamp = :t,"
-                             " recent_cities = list_append(:c, if_not_exists(recent_cities, :empty))",
-            ExpressionAttributeValues={
-                ':t': last_access_timestamp,
-                ':c': [new_city],
-                ':empty': []
+    etag = get_etag(content)
+    cache_control = f"public, max-age={max_age_num_seconds}"
+
+    if etag_matches(if_none_match, etag):
+        metrics.increment("NotModified")
+        return {
+            'statusCode': 304,
+            'headers': {
+                'Cache-Control': cache_control,
+                'ETag': etag,
+                "X-Request-ID": context.aws_request_id
             },
-            ReturnValues="UPDATED_NEW"
-        )
-        response_attributes = response['Attributes']
-        print(f"IP fields Update successful: {response_attributes}")
-        return int(response_attributes['LastAccessTimestamp']), response_attributes['recent_cities'], True
+            'body': ''
+        }
 
-    except ClientError as e:
-        print(f"LastAccessTimestamp Update failed: {str(e)}")
-        return None, None, False
+    return get_response(200, context, cache_control=cache_control, etag=etag, **content)
+
+
+def get_ip_history_fields(ip_history_future: Future) -> Tuple[str, List[str]]:
+    """Waits for a submitted IP history update and formats its previous values for the response.
+
+        A failed update does not fail the request: the history fields are reported as unavailable.
+
+        Returns:
+            A tuple containing (previous_last_access_message, previous_recent_city_list).
+    """
+    prev_last_access_timestamp, recent_cities, success = ip_history_future.result()
+
+    if not success:
+        print("IP history is unavailable for this request")
+        return "N / A", []
+
+    prev_last_access_timestamp_message = utils.epoch_timestamp_to_iso_format(prev_last_access_timestamp) \
+        if prev_last_access_timestamp else "N / A"
+
+    print(f"Previous last access: {prev_last_access_timestamp_message}")
+    print(f"Recent cities: {recent_cities}")
+
+    return prev_last_access_timestamp_message, recent_cities
 
 
 def handle_missing_parameter_city(context: Context) -> dict:
     """Returns a formatted HTTP 400 Bad Request response for missing query parameters."""
     return get_response(400, context, error="Bad Request",
                         message="The required query parameter 'city' is missing.",
-                        details="Please include ?city=CityName in the request URL.")
+                        details="Please include ?city=CityName (or ?lat=..&lon=..) in the request URL.")
+
+
+def handle_invalid_parameter_coordinates(context: Context, details: str) -> dict:
+    """Returns a formatted HTTP 400 Bad Request response for invalid coordinate parameters."""
+    return get_response(400, context, error="Bad Request",
+                        message="The 'lat' and 'lon' parameters are invalid.",
+                        details=details)
+
+
+def handle_invalid_parameter_cities(context: Context, details: str) -> dict:
+    """Returns a formatted HTTP 400 Bad Request response for an invalid batch request."""
+    return get_response(400, context, error="Bad Request",
+                        message="The 'cities' parameter is invalid.",
+                        details=details)
 
 
 def handle_city_not_found(context: Context, city: str, last_access_timestamp_message: str, recent_cities: List[str]) \
@@ -134,41 +279,112 @@ def handle_city_not_found(context: Context, city: str, last_access_timestamp_mes
     return get_response(404, context, error="Not found", message="No data available for the specified city.",
                         details=f"No matching city was found with the name '{city}'.",
                         last_access=last_access_timestamp_message,
-                        recent_cities=recent_cities[1:])
+                        recent_cities=recent_cities)
 
 
 def handle_internal_server_error(context: Context):
-    """Returns a formatted HTTP 500 Internal Server Error response for DB access failures."""
+    """Returns a formatted HTTP 500 Internal Server Error response for unexpected failures."""
     return get_response(500, context, error="Internal Server Error",
                         message="An unexpected error occurred.",
                         details="Please try again later.")
 
 
-def handle_service_unavailable_error(context: Context, last_access_timestamp_message: str) -> dict:
+def handle_service_unavailable_error(context: Context, last_access_timestamp_message: str, recent_cities: List[str]) \
+        -> dict:
     """Returns a formatted HTTP 503 Service Unavailable response for service provider timeouts/failures."""
     return get_response(503, context, error="Service Unavailable",
                         message="Service is currently unavailable.",
                         details="Please try again later.",
-                        last_access=last_access_timestamp_message)
+                        last_access=last_access_timestamp_message,
+                        recent_cities=recent_cities)
+
 
+def get_batch_city_result(city: str, result: CityWeatherData | CityWeatherDataFetchError) -> dict:
+    """Formats the outcome of a single city of a batch request, with the status code it would have on its own."""
+    from city_weather_data import (CityWeatherDataCityNotFoundError, CityWeatherDataFetchError,
+                                   CityWeatherDataRequestError)
 
+    if isinstance(result, CityWeatherDataCityNotFoundError):
+        return {"city": city, "status": 404, "error": "Not found",
+                "details": f"No matching city was found with the name '{city}'."}
+    elif isinstance(result, CityWeatherDataRequestError):
+        return {"city": city, "status": 503, "error": "Service Unavailable",
+                "details": "Service is currently unavailable."}
+    elif isinstance(result, CityWeatherDataFetchError):
+        return {"city": city, "status": 500, "error": "Internal Server Error",
+                "details": "No up-to-date weather data is available."}
+    return {"city": city, "status": 200, "weather": result.to_dict()}
+
+
+def handle_batch_request(context: Context, cities: List[str], ip_history_future: Future, include_history: bool,
+                         if_none_match: Optional[str]) -> dict:
+    """Fetches all cities of a batch request together and returns a result or an error per city.
+
+        Without the IP history, the response is cacheable until the first of its cities is expected to change.
+    """
+    import city_weather_data
+
+    results = city_weather_data.fetch_cities_weather_data(cities)
+    city_results = [get_batch_city_result(city, results[city]) for city in cities]
+
+    if not include_history:
+        return get_cacheable_response(
+            context, {"cities": city_results},
+            min(result.get_max_age_num_seconds() if isinstance(result, city_weather_data.CityWeatherData) else 0
+                for result in results.values()),
+            if_none_match)
+
+    last_access_timestamp_message, recent_cities = get_ip_history_fields(ip_history_future)
+
+    return get_response(200, context, cache_control=HISTORY_RESPONSE_CACHE_CONTROL, cities=city_results,
+                        last_access=last_access_timestamp_message,
+                        recent_cities=recent_cities)
+
+
+@metrics.instrument_handler
 def lambda_handler(event, context: Context) -> dict:
     """The primary execution entry point for the AWS Lambda function.
 
         Execution Flow:
-            1. Parse and validate query parameters.
-            2. Identify client IP and retrieve/update audit trail in DynamoDB.
-            3. Invoke business logic to fetch and aggregate city weather data.
+            1. Parse and validate query parameters (the city, the coordinates or the batch request body).
+            2. Identify client IP and start updating its audit trail in DynamoDB in the background,
+               retrieving the previous values in the same round trip.
+            3. Invoke business logic to fetch and aggregate city weather data, concurrently
+               with the audit trail update. Providers are only awaited until shortly before the
+               invocation times out (see context.get_remaining_time_in_millis).
             4. Return a JSON structured HTTP response with city weather results and user history,
-            or an appropriate error status.
+            or an appropriate error status. Without the user history (?history=false), weather
+            results are cacheable, and answered with a 304 if the client's copy is still current.
+
+        Scheduled invocations are handed over to popular_cities_refresh.refresh_handler instead.
     """
 
+    if is_scheduled_event(event):
+        import popular_cities_refresh
+        return popular_cities_refresh.refresh_handler(event, context)
+
     # update for yml deploy test
     city = get_request_city_param(event)
+    coordinates = None
 
-    if not city:
-        print("Request missing 'city' parameter")
-        return handle_missing_parameter_city(context)
+    try:
+        cities = get_request_cities_param(event)
+    except ValueError as e:
+        return handle_invalid_parameter_cities(context, f"Could not parse the request body: {e}")
+
+    if cities is not None:
+        if len(cities) == 0 or len(cities) > MAX_BATCH_CITIES:
+            return handle_invalid_parameter_cities(
+                context, f"Please request between 1 and {MAX_BATCH_CITIES} comma-separated cities.")
+        cities = list(dict.fromkeys(cities))
+    elif not city:
+        try:
+            coordinates = get_request_coordinates_param(event)
+        except ValueError as e:
+            return handle_invalid_parameter_coordinates(context, f"Could not parse the coordinates: {e}")
+        if coordinates is None:
+            print("Request missing 'city' parameter")
+            return handle_missing_parameter_city(context)
 
     request_ip = get_request_ip(event)
 
@@ -177,33 +393,56 @@ def lambda_handler(event, context: Context) -> dict:
 
     print(f"Received request from IP: {request_ip}")
 
-    prev_last_access_timestamp, success = get_ip_last_accessed_timestamp_from_db(request_ip)
-
-    if not success:
-        return handle_internal_server_error(context)
-
-    timestamp_seconds = int(time.time())
+    import city_weather_data
+    import fetch_engine
+    import ip_history
 
-    cur_last_access_timestamp, recent_cities, success = update_ip_fields_in_db(request_ip, timestamp_seconds, city)
+    if coordinates is not None:
+        # recorded in the IP history, and reported if no place is found there
+        city = city_weather_data.format_location_query(*coordinates)
 
-    if not success:
-        return handle_internal_server_error(context)
+    # the audit trail update runs concurrently with the weather fetch, and is only awaited for the response
+    ip_history_token = ip_history.ip_history_writer.start_invocation()
+    ip_history_future = ip_history.ip_history_writer.submit(request_ip, int(time.time()),
+                                                            cities if cities is not None else city)
 
-    prev_last_access_timestamp_message = utils.epoch_timestamp_to_iso_format(prev_last_access_timestamp) \
-        if prev_last_access_timestamp else "N / A"
+    # providers still in flight are abandoned in time for the response to be sent before the invocation times out
+    remaining_time_num_seconds = get_remaining_time_num_seconds(context)
+    deadline_token = fetch_engine.set_invocation_deadline(
+        max(remaining_time_num_seconds - RESPONSE_TIME_MARGIN_NUM_SECONDS, 0)
+        if remaining_time_num_seconds is not None else None)
 
-    print(f"Previous last access: {prev_last_access_timestamp_message}")
-    print(f"Recent cities: {recent_cities}")
+    include_history = get_request_history_param(event)
 
     try:
-        weather_data = city_weather_data.fetch_city_weather_data(city)
-
-        return get_response(200, context, city=city, weather=weather_data.to_json(),
-                            last_access=prev_last_access_timestamp_message,
-                            recent_cities=recent_cities[1:])
-    except CityWeatherDataCityNotFoundError as e:
-        print(f'City Weather data fetching failed as city was not found: {e}')
-        return handle_city_not_found(context, city, prev_last_access_timestamp_message, recent_cities)
-    except CityWeatherDataRequestError as e:
-        print(f'City Weather data fetching failed due to a request error: {e}')
-        return handle_service_unavailable_error(context, prev_last_access_timestamp_message, recent_cities)
+        if cities is not None:
+            return handle_batch_request(context, cities, ip_history_future, include_history,
+                                        get_request_if_none_match(event))
+
+        try:
+            if coordinates is not None:
+                geocode_entry, weather_data = city_weather_data.fetch_location_weather_data(*coordinates)
+                city = geocode_entry.city_name if geocode_entry is not None else city
+            else:
+                weather_data = city_weather_data.fetch_city_weather_data(city)
+
+            if not include_history:
+                return get_cacheable_response(context, {"city": city, "weather": weather_data.to_dict()},
+                                              weather_data.get_max_age_num_seconds(), get_request_if_none_match(event))
+
+            prev_last_access_timestamp_message, recent_cities = get_ip_history_fields(ip_history_future)
+
+            return get_response(200, context, cache_control=HISTORY_RESPONSE_CACHE_CONTROL,
+                                city=city, weather=weather_data.to_dict(),
+                                last_access=prev_last_access_timestamp_message,
+                                recent_cities=recent_cities)
+        except city_weather_data.CityWeatherDataCityNotFoundError as e:
+            print(f'City Weather data fetching failed as city was not found: {e}')
+            return handle_city_not_found(context, city, *get_ip_history_fields(ip_history_future))
+        except city_weather_data.CityWeatherDataRequestError as e:
+            print(f'City Weather data fetching failed due to a request error: {e}')
+            return handle_service_unavailable_error(context, *get_ip_history_fields(ip_history_future))
+    finally:
+        fetch_engine.reset_invocation_deadline(deadline_token)
+        ip_history.ip_history_writer.flush()
+        ip_history.ip_history_writer.end_invocation(ip_history_token)
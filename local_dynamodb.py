@@ -0,0 +1,212 @@
+"""Local DynamoDB Stand-In Module.
+
+This module provides an in-memory stand-in for a boto3 DynamoDB Table resource,
+used by tests and benchmarks to exercise the DynamoDB access code without AWS.
+It implements the subset of the Table API and expression syntax used by this
+application:
+    - get_item, put_item, scan and update_item.
+    - batch_get_item of the Table's client (Table.meta.client), for the table itself only.
+    - Update expressions: SET with ':value', 'path', list_append(...) and if_not_exists(...) operands.
+    - Condition expressions: AND/OR of attribute_exists, attribute_not_exists,
+      size(path) and path comparisons against ':value' placeholders.
+    - ReturnValues (NONE, ALL_OLD, ALL_NEW, UPDATED_NEW) and ReturnValuesOnConditionCheckFailure.
+
+Failed conditions raise botocore's ClientError with the 'ConditionalCheckFailedException'
+code, like the real service: the Table resource does not deserialize error responses, so
+an item returned with ReturnValuesOnConditionCheckFailure is in the low-level AttributeValue
+format ({'N': '1'}, {'L': [...]}), unlike the items of successful calls. An optional per-call latency simulates network round trips.
+"""
+
+import copy
+import operator
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+COMPARISON_OPERATORS = {"<=": operator.le, ">=": operator.ge, "<>": operator.ne,
+                        "=": operator.eq, "<": operator.lt, ">": operator.gt}
+
+# Number of keys a single BatchGetItem call accepts
+BATCH_GET_ITEM_MAX_KEYS = 100
+
+
+def split_top_level(expression: str, separator: str) -> List[str]:
+    """Splits an expression on a separator, ignoring separators nested inside parentheses."""
+    parts, depth, start, i = [], 0, 0, 0
+    while i < len(expression):
+        if expression[i] == "(":
+            depth += 1
+        elif expression[i] == ")":
+            depth -= 1
+        elif depth == 0 and expression.startswith(separator, i):
+            parts.append(expression[start:i])
+            start = i + len(separator)
+            i = start
+            continue
+        i += 1
+    parts.append(expression[start:])
+    return [part.strip() for part in parts]
+
+
+class LocalDynamoDBTable:
+    """An in-memory, thread-safe stand-in for a boto3 DynamoDB Table with a single partition key.
+
+        Attributes:
+            key_name: The name of the partition key attribute (e.g. 'ip').
+            latency_num_seconds: Simulated round trip latency added to every call.
+            name: The table name, which low-level client calls address the table by.
+            call_counts: Number of calls made per Table method.
+            meta: Holds the low-level client of the table (meta.client), like a Table resource.
+    """
+    def __init__(self, key_name: str, latency_num_seconds: float = 0.0, name: str = "LocalTable"):
+        self.key_name = key_name
+        self.latency_num_seconds = latency_num_seconds
+        self.name = name
+        self.call_counts = Counter()
+        self.meta = SimpleNamespace(client=LocalDynamoDBClient(self))
+        self._items: Dict[Any, dict] = {}
+        self._lock = threading.Lock()
+
+    def _record_call(self, method_name: str):
+        self.call_counts[method_name] += 1
+        if self.latency_num_seconds > 0:
+            time.sleep(self.latency_num_seconds)
+
+    def _resolve_path(self, path: str, names: Dict[str, str]) -> str:
+        return names.get(path, path)
+
+    def _evaluate_operand(self, operand: str, item: dict, names: Dict[str, str], values: Dict[str, Any]) -> Any:
+        operand = operand.strip()
+        if operand.startswith(":"):
+            return values[operand]
+        if operand.startswith("list_append(") and operand.endswith(")"):
+            first, second = split_top_level(operand[len("list_append("):-1], ",")
+            return (self._evaluate_operand(first, item, names, values)
+                    + self._evaluate_operand(second, item, names, values))
+        if operand.startswith("if_not_exists(") and operand.endswith(")"):
+            path, default = split_top_level(operand[len("if_not_exists("):-1], ",")
+            path = self._resolve_path(path, names)
+            return item[path] if path in item else self._evaluate_operand(default, item, names, values)
+        if operand.startswith("size(") and operand.endswith(")"):
+            return len(item[self._resolve_path(operand[len("size("):-1].strip(), names)])
+        return item.get(self._resolve_path(operand, names))
+
+    def _evaluate_condition(self, condition: str, item: dict, names: Dict[str, str], values: Dict[str, Any]) -> bool:
+        or_parts = split_top_level(condition, " OR ")
+        if len(or_parts) > 1:
+            return any(self._evaluate_condition(part, item, names, values) for part in or_parts)
+        and_parts = split_top_level(condition, " AND ")
+        if len(and_parts) > 1:
+            return all(self._evaluate_condition(part, item, names, values) for part in and_parts)
+
+        condition = condition.strip()
+        if condition.startswith("attribute_not_exists(") and condition.endswith(")"):
+            return self._resolve_path(condition[len("attribute_not_exists("):-1].strip(), names) not in item
+        if condition.startswith("attribute_exists(") and condition.endswith(")"):
+            return self._resolve_path(condition[len("attribute_exists("):-1].strip(), names) in item
+
+        for symbol, compare in COMPARISON_OPERATORS.items():
+            sides = split_top_level(condition, f" {symbol} ")
+            if len(sides) == 2:
+                try:
+                    return compare(self._evaluate_operand(sides[0], item, names, values),
+                                   self._evaluate_operand(sides[1], item, names, values))
+                except (KeyError, TypeError):
+                    return False
+
+        raise ValueError(f"Unsupported condition expression: {condition!r}")
+
+    def _conditional_check_failed(self, operation_name: str, old_item: Optional[dict], return_old: bool):
+        error_response = {"Error": {"Code": "ConditionalCheckFailedException",
+                                    "Message": "The conditional request failed"}}
+        if return_old and old_item is not None:
+            serializer = TypeSerializer()
+            error_response["Item"] = {name: serializer.serialize(value) for name, value in old_item.items()}
+        raise ClientError(error_response, operation_name)
+
+    def get_item(self, Key: dict, ProjectionExpression: Optional[str] = None, **kwargs) -> dict:
+        self._record_call("get_item")
+        with self._lock:
+            item = self._items.get(Key[self.key_name])
+            if item is None:
+                return {}
+            if ProjectionExpression:
+                item = {name: item[name] for name in split_top_level(ProjectionExpression, ",") if name in item}
+            return {"Item": copy.deepcopy(item)}
+
+    def put_item(self, Item: dict, **kwargs) -> dict:
+        self._record_call("put_item")
+        with self._lock:
+            self._items[Item[self.key_name]] = copy.deepcopy(Item)
+        return {}
+
+    def scan(self, ProjectionExpression: Optional[str] = None, **kwargs) -> dict:
+        self._record_call("scan")
+        with self._lock:
+            items = [copy.deepcopy(item) for item in self._items.values()]
+        if ProjectionExpression:
+            names = split_top_level(ProjectionExpression, ",")
+            items = [{name: item[name] for name in names if name in item} for item in items]
+        return {"Items": items, "Count": len(items)}
+
+    def update_item(self, Key: dict, UpdateExpression: str, ExpressionAttributeValues: Optional[dict] = None,
+                    ExpressionAttributeNames: Optional[dict] = None, ConditionExpression: Optional[str] = None,
+                    ReturnValues: str = "NONE", ReturnValuesOnConditionCheckFailure: str = "NONE", **kwargs) -> dict:
+        self._record_call("update_item")
+        values = ExpressionAttributeValues or {}
+        names = ExpressionAttributeNames or {}
+        key_value = Key[self.key_name]
+
+        if not UpdateExpression.strip().upper().startswith("SET "):
+            raise ValueError(f"Unsupported update expression: {UpdateExpression!r}")
+
+        with self._lock:
+            old_item = self._items.get(key_value)
+            item = copy.deepcopy(old_item) if old_item is not None else {self.key_name: key_value}
+
+            if ConditionExpression and not self._evaluate_condition(ConditionExpression, item, names, values):
+                self._conditional_check_failed("UpdateItem", old_item, ReturnValuesOnConditionCheckFailure == "ALL_OLD")
+
+            updated_names = []
+            for assignment in split_top_level(UpdateExpression.strip()[4:], ","):
+                path, operand = (part.strip() for part in assignment.split("=", 1))
+                path = self._resolve_path(path, names)
+                item[path] = copy.deepcopy(self._evaluate_operand(operand, item, names, values))
+                updated_names.append(path)
+
+            self._items[key_value] = item
+
+        if ReturnValues == "ALL_OLD":
+            return {"Attributes": copy.deepcopy(old_item)} if old_item is not None else {}
+        if ReturnValues == "ALL_NEW":
+            return {"Attributes": copy.deepcopy(item)}
+        if ReturnValues == "UPDATED_NEW":
+            return {"Attributes": {name: copy.deepcopy(item[name]) for name in updated_names}}
+        return {}
+
+
+class LocalDynamoDBClient:
+    """The client of a LocalDynamoDBTable (Table.meta.client), serving batch_get_item for that table.
+
+        Like the client of a Table resource, which boto3 sets up to convert from and to the
+        AttributeValue format, it takes keys and returns items as Python values.
+    """
+    def __init__(self, table: LocalDynamoDBTable):
+        self._table = table
+
+    def batch_get_item(self, RequestItems: dict, **kwargs) -> dict:
+        table = self._table
+        table._record_call("batch_get_item")
+        keys = RequestItems[table.name]["Keys"]
+        if len(keys) > BATCH_GET_ITEM_MAX_KEYS or len({repr(key) for key in keys}) != len(keys):
+            raise ClientError({"Error": {"Code": "ValidationException",
+                                         "Message": "Too many or duplicate keys in the request"}}, "BatchGetItem")
+
+        with table._lock:
+            items = [copy.deepcopy(table._items.get(key[table.key_name])) for key in keys]
+        return {"Responses": {table.name: [item for item in items if item is not None]}, "UnprocessedKeys": {}}
@@ -0,0 +1,200 @@
+"""Per-Invocation Metrics Module.
+
+This module collects per-stage timings and counters for a single Lambda invocation
+and emits them as one structured log record in the CloudWatch Embedded Metric Format
+(EMF), from which CloudWatch extracts metrics without any API call.
+
+Stages are timed with the timed decorator or the timer context manager, and events
+(e.g. cache hits) are counted with increment. Both record into the metrics of the
+current invocation, which is held in a context variable: work submitted to the thread
+pools of fetch_engine and ip_history runs in a copy of the submitting context, so that
+the stages it runs are attributed to the invocation that submitted them. Outside of an
+invocation (or when metrics are disabled) recording is a single context variable lookup.
+
+A timing is the total time spent in a stage during the invocation, so stages that run
+concurrently (e.g. the calls of several providers) may add up to more than the total.
+
+Environment Variables:
+    - METRICS_ENABLED: Whether invocations emit a metrics record (defaults to true).
+    - SERVER_TIMING_ENABLED: Whether responses carry a Server-Timing header with the
+      stage timings (defaults to false, as it exposes internals to clients).
+    - METRICS_NAMESPACE: The CloudWatch namespace of the metrics (defaults to WeatherAggregator).
+
+Main components:
+    - InvocationMetrics: The timings and counters of a single invocation.
+    - timed / timer / increment: Record into the current invocation's metrics.
+    - instrument_handler: Wraps a Lambda handler to collect and emit its invocation's metrics.
+"""
+
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+import json_codec
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING_ENABLED", "false").lower() == "true"
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "WeatherAggregator")
+
+# name of the timing covering the whole invocation
+TOTAL_TIMING_NAME = "Total"
+
+
+class InvocationMetrics:
+    """The stage timings and event counters of a single invocation.
+
+        Attributes:
+            timings_ms: Total time spent per stage, in milliseconds.
+            counters: Number of occurrences per counted event.
+    """
+    __slots__ = ("timings_ms", "counters", "_lock")
+
+    def __init__(self):
+        self.timings_ms: Dict[str, float] = {}
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Returns a string representation of the InvocationMetrics instance."""
+        return f"{self.__class__.__name__}(timings_ms={self.timings_ms!r}, counters={dict(self.counters)!r})"
+
+    def add_timing(self, name: str, duration_num_seconds: float):
+        """Adds the duration of one run of a stage to the stage's total."""
+        with self._lock:
+            self.timings_ms[name] = self.timings_ms.get(name, 0.0) + duration_num_seconds * 1000
+
+    def increment(self, name: str, count: int = 1):
+        """Counts occurrences of an event."""
+        with self._lock:
+            self.counters[name] += count
+
+    def get_hit_rates(self) -> Dict[str, float]:
+        """Returns the hit rate (in percent) of every '<Name>Hit' / '<Name>Miss' counter pair, e.g. 'CacheHitRate'."""
+        with self._lock:
+            counters = dict(self.counters)
+        prefixes = {name[:-len(suffix)] for name in counters for suffix in ("Hit", "Miss") if name.endswith(suffix)}
+        hit_rates = {}
+        for prefix in prefixes:
+            hits, misses = counters.get(f"{prefix}Hit", 0), counters.get(f"{prefix}Miss", 0)
+            hit_rates[f"{prefix}HitRate"] = 100.0 * hits / (hits + misses)
+        return hit_rates
+
+    def to_emf_record(self, **properties: Any) -> dict:
+        """Formats the metrics as a CloudWatch Embedded Metric Format record.
+
+            Args:
+                **properties: Additional (non-metric) fields of the record, e.g. the request id.
+
+            Returns:
+                A dictionary to be logged as a single JSON line.
+        """
+        with self._lock:
+            values = {f"{name}Time": round(duration_ms, 3) for name, duration_ms in self.timings_ms.items()}
+            units = {name: "Milliseconds" for name in values}
+            values |= self.counters
+            units |= {name: "Count" for name in self.counters}
+        hit_rates = self.get_hit_rates()
+        values |= hit_rates
+        units |= {name: "Percent" for name in hit_rates}
+
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [[]],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, unit in units.items()],
+                }],
+            },
+        } | properties | values
+
+    def get_server_timing_header(self) -> str:
+        """Formats the stage timings as a Server-Timing header value, e.g. 'Total;dur=12.3, Serialize;dur=0.1'."""
+        with self._lock:
+            return ", ".join(f"{name};dur={duration_ms:.1f}" for name, duration_ms in self.timings_ms.items())
+
+
+_current_metrics: contextvars.ContextVar[Optional[InvocationMetrics]] = \
+    contextvars.ContextVar("current_metrics", default=None)
+
+
+def get_current_metrics() -> Optional[InvocationMetrics]:
+    """Returns the metrics of the current invocation, or None outside of an instrumented invocation."""
+    return _current_metrics.get()
+
+
+def increment(name: str, count: int = 1):
+    """Counts occurrences of an event in the current invocation's metrics, if any."""
+    invocation_metrics = _current_metrics.get()
+    if invocation_metrics is not None:
+        invocation_metrics.increment(name, count)
+
+
+class timer:
+    """Context manager timing its block as a stage of the current invocation, if any."""
+    __slots__ = ("name", "_invocation_metrics", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._invocation_metrics = _current_metrics.get()
+
+    def __enter__(self):
+        if self._invocation_metrics is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._invocation_metrics is not None:
+            self._invocation_metrics.add_timing(self.name, time.perf_counter() - self._start)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """Decorator timing every call of a function as a stage of the calling invocation, if any."""
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            invocation_metrics = _current_metrics.get()
+            if invocation_metrics is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                invocation_metrics.add_timing(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def instrument_handler(handler: Callable[[dict, Any], dict]) -> Callable[[dict, Any], dict]:
+    """Decorator collecting the metrics of every invocation of a Lambda handler.
+
+        Once the handler returns, its invocation's metrics are logged as an EMF record
+        (with the request id and status code as properties) and, with SERVER_TIMING_ENABLED,
+        added to the response as a Server-Timing header.
+    """
+    @functools.wraps(handler)
+    def wrapper(event: dict, context: Any) -> dict:
+        if not METRICS_ENABLED:
+            return handler(event, context)
+
+        invocation_metrics = InvocationMetrics()
+        token = _current_metrics.set(invocation_metrics)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = handler(event, context)
+            return response
+        finally:
+            invocation_metrics.add_timing(TOTAL_TIMING_NAME, time.perf_counter() - start)
+            _current_metrics.reset(token)
+
+            status_code = response.get("statusCode") if response is not None else 500
+            if SERVER_TIMING_ENABLED and response is not None:
+                response.setdefault("headers", {})["Server-Timing"] = invocation_metrics.get_server_timing_header()
+            print(json_codec.dumps(invocation_metrics.to_emf_record(requestId=getattr(context, "aws_request_id", None),
+                                                                    statusCode=status_code)))
+    return wrapper
@@ -8,12 +8,30 @@ exception hierarchy to handle API-specific failure modes.
 The module follows a clean separation of concerns:
     1. Exception handling for network and logic errors.
     2. Data modeling via the OpenMeteoResponse class.
-    3. API interaction through the fetch_data_open_meteo function.
+    3. API interaction through the fetch_data_open_meteo and fetch_data_open_meteo_batch functions.
 """
 
+import os
 import requests
+from typing import List, Tuple
+import http_session
 from weather_service import WeatherServiceError
 
+# overridable to point the client at a local stand-in (see benchmarks/stub_providers.py)
+OPEN_METEO_ENDPOINT = os.environ.get("OPEN_METEO_ENDPOINT", "https://api.open-meteo.com/v1/forecast")
+
+SESSION_CONFIG = http_session.HttpSessionConfig("OPEN_METEO", connect_timeout_num_seconds=2.0,
+                                                read_timeout_num_seconds=3.0, pool_maxsize=10)
+
+# Upper bound on how long a single OpenMeteo request may take before it is abandoned
+FETCH_TIMEOUT_NUM_SECONDS = SESSION_CONFIG.total_timeout_num_seconds
+
+# Upper bound on the number of locations requested from OpenMeteo in a single HTTP request
+MAX_LOCATIONS_PER_REQUEST = 100
+
+# How often OpenMeteo publishes new current weather data for a location
+UPDATE_INTERVAL_NUM_SECONDS = 15 * 60
+
 
 class OpenMeteoRequestError(WeatherServiceError):
     """Raised when a network or protocol-level error occurs during an API request.
@@ -46,6 +64,8 @@ class OpenMeteoResponse:
             temp_c: Current temperature in degrees Celsius.
             weather_code: OpenMeteo's Unique numeric code for the current weather condition.
     """
+    __slots__ = ("latitude", "longitude", "time", "temp_c", "weather_code")
+
     def __init__(self, latitude: float, longitude: float, time: str, temp_c: float, weather_code: int):
         """Initializes an OpenMeteoResponse instance with data from OpenMeteo.
 
@@ -74,44 +94,84 @@ class OpenMeteoResponse:
         )
 
 
-def fetch_data_open_meteo(latitude: float, longitude: float):
-    """Fetches real-time weather data from the OpenMeteo service.
-
-        Connects to the OpenMeteo external endpoint using the specified location
-        metadata (latitude, longitude) to retrieve current weather conditions
-        (such as temperature in Celsius and a weather code) for that location.
+def parse_open_meteo_response(data: dict) -> OpenMeteoResponse:
+    """Parses a single location's OpenMeteo JSON payload into an OpenMeteoResponse.
 
         Args:
-l           latitude: The North-South geographic coordinate.
-            longitude: The East-West geographic coordinate.
+            data: The decoded JSON object of one location, as returned by the forecast endpoint.
 
         Returns:
             An OpenMeteoResponse object populated with location metadata and current weather conditions.
+    """
+    latitude = data.get("latitude", None)
+    longitude = data.get("longitude", None)
+
+    current_weather_dict = data.get("current_weather", {})
+    time = current_weather_dict.get("time", None)
+    temperature_c = current_weather_dict.get("temperature", None)
+    weather_code = current_weather_dict.get("weathercode", None)
+
+    return OpenMeteoResponse(latitude, longitude, time, temperature_c, weather_code)
+
+
+def fetch_data_open_meteo_batch(coordinates_list: List[Tuple[float, float]]) -> List[OpenMeteoResponse]:
+    """Fetches real-time weather data for several locations with a single OpenMeteo request.
+
+        OpenMeteo accepts comma-separated latitude and longitude lists and answers with
+        one JSON object per location, in request order. Lists longer than
+        MAX_LOCATIONS_PER_REQUEST are split into several requests.
+
+        Args:
+            coordinates_list: A list of (latitude, longitude) tuples.
+
+        Returns:
+            A list of OpenMeteoResponse objects, aligned with coordinates_list.
 
         Raises:
-            OpenMeteoRequestError: If a network error occurs or the API
+            OpenMeteoRequestError: If a network error or timeout occurs or the API
                 returns a non-success status code.
     """
-    OPEAN_METEO_ENDPOINT = (f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}"
-                            f"&current_weather=true")
-    try:
-        response = requests.get(OPEAN_METEO_ENDPOINT)
+    open_meteo_responses = []
+
+    for chunk_start in range(0, len(coordinates_list), MAX_LOCATIONS_PER_REQUEST):
+        chunk = coordinates_list[chunk_start:chunk_start + MAX_LOCATIONS_PER_REQUEST]
+        try:
+            # reuses a pooled keep-alive connection of a warm container and is bounded by SESSION_CONFIG timeouts
+            response = http_session.session_get(SESSION_CONFIG, OPEN_METEO_ENDPOINT,
+                                                params={"latitude": ",".join(str(lat) for lat, _ in chunk),
+                                                        "longitude": ",".join(str(lon) for _, lon in chunk),
+                                                        "current_weather": "true"})
+
+            # Raise an exception for bad status codes (4xx or 5xx)
+            response.raise_for_status()
 
-        # Raise an exception for bad status codes (4xx or 5xx)
-        response.raise_for_status()
+            # a single location is answered with an object, several locations with a list of objects
+            data = response.json()
+            open_meteo_responses += [parse_open_meteo_response(location_data)
+                                     for location_data in (data if isinstance(data, list) else [data])]
 
-        # The response body from Lambda is a JSON string, which we load into a Python dict
-        data = response.json()
+        except (requests.exceptions.HTTPError, requests.exceptions.RequestException) as err:
+            raise OpenMeteoRequestError(err)
 
-        latitude = data.get("latitude", None)
-        longitude = data.get("longitude", None)
+    return open_meteo_responses
 
-        current_weather_dict = data.get("current_weather", {})
-        time = current_weather_dict.get("time", None)
-        temperature_c = current_weather_dict.get("temperature", None)
-        weather_code = current_weather_dict.get("weathercode", None)
 
-        return OpenMeteoResponse(latitude, longitude, time, temperature_c, weather_code)
+def fetch_data_open_meteo(latitude: float, longitude: float) -> OpenMeteoResponse:
+    """Fetches real-time weather data from the OpenMeteo service.
+
+        Connects to the OpenMeteo external endpoint using the specified location
+        metadata (latitude, longitude) to retrieve current weather conditions
+        (such as temperature in Celsius and a weather code) for that location.
 
-    except (requests.exceptions.HTTPError, requests.exceptions.RequestException) as err:
-        raise OpenMeteoRequestError(err)
+        Args:
+            latitude: The North-South geographic coordinate.
+            longitude: The East-West geographic coordinate.
+
+        Returns:
+            An OpenMeteoResponse object populated with location metadata and current weather conditions.
+
+        Raises:
+            OpenMeteoRequestError: If a network error or timeout occurs or the API
+                returns a non-success status code.
+    """
+    return fetch_data_open_meteo_batch([(latitude, longitude)])[0]
@@ -0,0 +1,138 @@
+"""Scheduled Refresh of Popular Cities Module.
+
+This module is the entry point of a scheduled invocation (e.g. an EventBridge rule every
+5 minutes) that keeps the aggregates of the most requested cities fresh in the shared
+weather cache (see shared_weather_cache), so that requests for them are served without
+any provider call, by whichever container handles them.
+
+Each run:
+    1. Selects the popular cities: the configured POPULAR_CITIES, then the cities most
+       often found in the 'recent_cities' lists of RequestIPLogs, up to POPULAR_CITIES_TOP_N.
+    2. Skips cities whose shared cache entry stays fresh until the next run. Entries expire
+       when the providers publish new data, so the refresh cadence follows the providers'
+       update intervals rather than the schedule.
+    3. Fetches the remaining cities from the providers in batches of REFRESH_BATCH_SIZE,
+       publishing every aggregate, until the invocation runs out of time.
+
+Environment Requirements:
+    - SHARED_WEATHER_CACHE_TABLE_NAME: The shared cache table, see shared_weather_cache.
+    - POPULAR_CITIES: Optional comma-separated list of cities that are always refreshed.
+    - POPULAR_CITIES_TOP_N: Number of cities refreshed per run (default 20).
+    - REFRESH_SCHEDULE_PERIOD_NUM_SECONDS: The period of the schedule (default 300).
+"""
+from __future__ import annotations
+
+import os
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from aws_lambda_typing.context import Context
+
+import shared_weather_cache
+from geocode_cache import normalize_city_name
+
+POPULAR_CITIES = [city.strip() for city in os.environ.get("POPULAR_CITIES", "").split(",") if city.strip()]
+POPULAR_CITIES_TOP_N = int(os.environ.get("POPULAR_CITIES_TOP_N", "20"))
+
+# entries expiring before the next scheduled run are refreshed by this one
+REFRESH_SCHEDULE_PERIOD_NUM_SECONDS = int(os.environ.get("REFRESH_SCHEDULE_PERIOD_NUM_SECONDS", "300"))
+
+# cities fetched together: the providers are called concurrently for a whole batch (see fetch_engine)
+REFRESH_BATCH_SIZE = int(os.environ.get("REFRESH_BATCH_SIZE", "10"))
+
+# no new batch is started with less time left in the invocation
+REFRESH_BATCH_MIN_REMAINING_NUM_SECONDS = 15
+
+# bounds the RequestIPLogs scan, which reads every item of the table
+POPULAR_CITIES_SCAN_MAX_PAGES = 10
+
+
+def get_most_requested_cities(top_n: int) -> List[str]:
+    """Returns the top_n cities most often found in the 'recent_cities' lists of RequestIPLogs.
+
+        Spellings of the same city are counted together (see geocode_cache.normalize_city_name),
+        and every city is returned with its most common spelling. Scan errors are logged and
+        yield no cities.
+    """
+    import ip_history
+
+    counts = Counter()
+    spellings = defaultdict(Counter)
+    scan_kwargs = {"ProjectionExpression": "recent_cities"}
+    try:
+        for _ in range(POPULAR_CITIES_SCAN_MAX_PAGES):
+            response = ip_history.get_ip_table().scan(**scan_kwargs)
+            for item in response.get("Items", []):
+                for city_name in item.get("recent_cities", []):
+                    counts[normalize_city_name(city_name)] += 1
+                    spellings[normalize_city_name(city_name)][city_name] += 1
+            if "LastEvaluatedKey" not in response:
+                break
+            scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    except Exception as e:
+        print(f"Scanning recent cities failed: {e!r}")
+
+    return [spellings[key].most_common(1)[0][0] for key, _ in counts.most_common(top_n)]
+
+
+def get_popular_cities(top_n: int, configured_cities: List[str]) -> List[str]:
+    """Returns the configured cities followed by the most requested ones, top_n (distinct) cities at most."""
+    popular_cities = {}
+    for city_name in configured_cities + get_most_requested_cities(top_n):
+        popular_cities.setdefault(normalize_city_name(city_name), city_name)
+    return list(popular_cities.values())[:top_n]
+
+
+def get_cities_due_for_refresh(city_names: List[str]) -> List[str]:
+    """Returns the cities whose shared cache entry is missing or expires before the next scheduled run."""
+    next_run_epoch = time.time() + REFRESH_SCHEDULE_PERIOD_NUM_SECONDS
+    entries = shared_weather_cache.get_entries(city_names)
+    return [city_name for city_name in city_names
+            if city_name not in entries or entries[city_name][1] <= next_run_epoch]
+
+
+def refresh_handler(event: dict, context: Context) -> Dict[str, object]:
+    """The entry point of scheduled invocations.
+
+        The event may override the refreshed cities ('cities') or their number ('top_n'),
+        e.g. for a manual invocation.
+
+        Returns:
+            A summary of the run: the popular cities, and which of them were refreshed,
+            skipped (still fresh), failed or deferred (out of time).
+    """
+    import city_weather_data
+
+    summary = {"cities": [], "refreshed": [], "skipped": [], "failed": [], "deferred": []}
+    if not shared_weather_cache.is_enabled():
+        print("Shared weather cache is not configured, nothing to refresh")
+        return summary
+
+    top_n = int(event.get("top_n", POPULAR_CITIES_TOP_N))
+    city_names = event.get("cities") or get_popular_cities(top_n, POPULAR_CITIES)
+    due_city_names = get_cities_due_for_refresh(city_names)
+    summary["cities"] = city_names
+    summary["skipped"] = [city_name for city_name in city_names if city_name not in due_city_names]
+    print(f"Refreshing {len(due_city_names)} of {len(city_names)} popular cities")
+
+    for i in range(0, len(due_city_names), REFRESH_BATCH_SIZE):
+        batch = due_city_names[i:i + REFRESH_BATCH_SIZE]
+        remaining_time_num_seconds = context.get_remaining_time_in_millis() / 1000
+        if remaining_time_num_seconds < REFRESH_BATCH_MIN_REMAINING_NUM_SECONDS:
+            summary["deferred"] = due_city_names[i:]
+            print(f"Deferring {len(summary['deferred'])} cities to the next run: "
+                  f"{remaining_time_num_seconds:.1f}s left")
+            break
+
+        results = city_weather_data.refresh_cities_weather_data(batch)
+        for city_name in batch:
+            if isinstance(results.get(city_name), city_weather_data.CityWeatherData):
+                summary["refreshed"].append(city_name)
+            else:
+                summary["failed"].append(city_name)
+
+    print(f"Refreshed {len(summary['refreshed'])} cities, {len(summary['failed'])} failed, "
+          f"{len(summary['skipped'])} still fresh, {len(summary['deferred'])} deferred")
+    return summary
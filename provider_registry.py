@@ -0,0 +1,197 @@
+"""Weather Service Provider Registry Module.
+
+This module keeps the registry of weather service providers queried for every city.
+Each provider declares how it is fetched (by city name and/or by a batch of coordinates),
+how its responses are normalized, its deadline and how often it publishes new data.
+The orchestrator in city_weather_data fans out to every registered provider
+concurrently, so adding a provider adds one more call to the wave instead of one
+more round trip to the request.
+
+Providers signal failures with weather_service.WeatherServiceError subclasses:
+    - The primary provider (the one resolving city names into coordinates) fails the
+      city on any WeatherServiceError, and reports unknown cities with a
+      WeatherServiceCityNotFoundError.
+    - Any other provider that fails with a WeatherServiceError, or misses its deadline,
+      is left out of the aggregate.
+
+Every provider tracks its recent latencies, and its calls are hedged once they exceed
+the provider's p95 latency (see fetch_engine.submit_hedged_provider_fetch). Every provider
+is also guarded by a circuit breaker: once it keeps failing, its calls fail fast with a
+CircuitOpenError instead of waiting for its deadline (see circuit_breaker).
+
+Main components:
+    - WeatherProvider: The declaration of a provider.
+    - register_provider / unregister_provider: Add or remove a provider.
+    - get_providers / get_primary_provider / get_provider_for_response: Registry lookups.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import fetch_engine
+import metrics
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from weather_service import WeatherServiceCityNotFoundError
+
+# Latency percentile past which an in-flight provider call is hedged
+HEDGE_LATENCY_PERCENTILE = 95
+# Lower bound on the hedge delay, so that a provider with very fast responses is not hedged on every jitter
+MIN_HEDGE_DELAY_NUM_SECONDS = 0.05
+
+# Consecutive provider failures that open its circuit, and how long it then stays open
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_RESET_TIMEOUT_NUM_SECONDS = 30.0
+
+
+class WeatherProvider:
+    """The declaration of a weather service provider.
+
+        A provider is fetched either per city name (fetch_by_city_name), or per batch
+        of coordinates (fetch_by_coordinates_batch) once a city's location is known.
+        The primary provider must be fetchable by city name, as its responses are used
+        to locate cities.
+
+        Attributes:
+            name: The provider's unique name (e.g. "WeatherAPI").
+            response_type: The class of the provider's responses, used to pick its normalizer.
+            normalize: Converts one of the provider's responses into a CityWeatherData.
+            timeout_num_seconds: The deadline of a single provider call.
+            update_interval_num_seconds: How often the provider publishes new data for a location.
+            fetch_by_city_name: Optional callable taking a city name and returning a response.
+            fetch_by_coordinates_batch: Optional callable taking a list of (latitude, longitude)
+                tuples and returning a list of responses aligned with it.
+            primary: Whether this is the primary provider.
+            latency_tracker: The provider's recent call latencies.
+            circuit_breaker: The circuit breaker guarding the provider's calls.
+    """
+    def __init__(self, name: str, response_type: type, normalize: Callable[[Any], Any],
+                 timeout_num_seconds: float, update_interval_num_seconds: float,
+                 fetch_by_city_name: Optional[Callable[[str], Any]] = None,
+                 fetch_by_coordinates_batch: Optional[Callable[[List[Tuple[float, float]]], List[Any]]] = None,
+                 primary: bool = False):
+        if fetch_by_city_name is None and fetch_by_coordinates_batch is None:
+            raise ValueError(f"Provider {name} must declare at least one fetch function")
+        if primary and fetch_by_city_name is None:
+            raise ValueError(f"Primary provider {name} must be fetchable by city name")
+
+        self.name = name
+        self.response_type = response_type
+        self.normalize = normalize
+        self.timeout_num_seconds = timeout_num_seconds
+        self.update_interval_num_seconds = update_interval_num_seconds
+        self.fetch_by_city_name = fetch_by_city_name
+        self.fetch_by_coordinates_batch = fetch_by_coordinates_batch
+        self.primary = primary
+        self.latency_tracker = fetch_engine.LatencyTracker()
+        self.circuit_breaker = CircuitBreaker(name, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT_NUM_SECONDS)
+
+    def __repr__(self):
+        """Returns a string representation of the WeatherProvider instance."""
+        return f"{self.__class__.__name__}({self.name!r}, primary={self.primary!r})"
+
+    @property
+    def hedge_after_num_seconds(self) -> Optional[float]:
+        """The delay after which an in-flight call is hedged, or None until enough latencies were recorded."""
+        latency = self.latency_tracker.percentile(HEDGE_LATENCY_PERCENTILE)
+        return max(latency, MIN_HEDGE_DELAY_NUM_SECONDS) if latency is not None else None
+
+    def submit_fetch(self, fetch_function: Callable[..., Any], *args: Any) -> Tuple[Future, float]:
+        """Submits a hedged call of one of the provider's fetch functions, unless its circuit is open.
+
+            Returns:
+                A (future, timeout_num_seconds) tuple, as expected by fetch_engine.gather_provider_results.
+                If the circuit is open, the future has already failed with a CircuitOpenError.
+        """
+        try:
+            self.circuit_breaker.before_call()
+        except CircuitOpenError as e:
+            metrics.increment(f"{self.name}CircuitOpen")
+            future = Future()
+            future.set_exception(e)
+            return future, self.timeout_num_seconds
+
+        future = fetch_engine.submit_hedged_provider_fetch(self._call_and_record_outcome, fetch_function, *args,
+                                                           hedge_after_num_seconds=self.hedge_after_num_seconds,
+                                                           latency_tracker=self.latency_tracker)
+        return future, self.timeout_num_seconds
+
+    def _call_and_record_outcome(self, fetch_function: Callable[..., Any], *args: Any) -> Any:
+        # recorded before the call's future resolves, so that the next request already sees the new circuit state
+        try:
+            with metrics.timer(f"{self.name}Fetch"):
+                result = fetch_function(*args)
+        except WeatherServiceCityNotFoundError:
+            # an unknown city is a valid answer of a healthy provider
+            self.circuit_breaker.record_success()
+            raise
+        except Exception:
+            metrics.increment(f"{self.name}Error")
+            self.circuit_breaker.record_failure()
+            raise
+        self.circuit_breaker.record_success()
+        return result
+
+
+_providers: Dict[str, WeatherProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def register_provider(provider: WeatherProvider) -> WeatherProvider:
+    """Adds a provider to the registry, replacing any provider registered under the same name.
+
+        Raises:
+            ValueError: If the provider is primary and a different primary provider is registered.
+    """
+    with _providers_lock:
+        if provider.primary and any(other.primary and other.name != provider.name for other in _providers.values()):
+            raise ValueError(f"A primary provider is already registered, cannot register {provider.name}")
+        _providers[provider.name] = provider
+    return provider
+
+
+def unregister_provider(name: str) -> Optional[WeatherProvider]:
+    """Removes a provider from the registry, returning it (or None if it was not registered)."""
+    with _providers_lock:
+        return _providers.pop(name, None)
+
+
+def get_providers() -> List[WeatherProvider]:
+    """Returns the registered providers, in registration order."""
+    with _providers_lock:
+        return list(_providers.values())
+
+
+def get_provider(name: str) -> WeatherProvider:
+    """Returns the provider registered under the given name.
+
+        Raises:
+            KeyError: If no such provider is registered.
+    """
+    with _providers_lock:
+        return _providers[name]
+
+
+def get_primary_provider() -> WeatherProvider:
+    """Returns the registered primary provider.
+
+        Raises:
+            LookupError: If no primary provider is registered.
+    """
+    for provider in get_providers():
+        if provider.primary:
+            return provider
+    raise LookupError("No primary weather provider is registered")
+
+
+def get_provider_for_response(weather_service_response: Any) -> WeatherProvider:
+    """Returns the provider whose response type matches the given response.
+
+        Raises:
+            ValueError: If the response type does not belong to any registered provider.
+    """
+    for provider in get_providers():
+        if type(weather_service_response) is provider.response_type:
+            return provider
+    raise ValueError(f"weather_service_response must be an instance of one of "
+                     f"{[provider.response_type.__name__ for provider in get_providers()]}")
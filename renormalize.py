@@ -0,0 +1,257 @@
+"""Offline Bulk Re-Normalization Module.
+
+This module is a command line tool that reprocesses archived raw provider responses
+with the current normalization rules (weather condition mapping, staleness cutoff,
+averaging), e.g. after one of them changed. Every archived record goes through the same
+per-provider normalizers (see convert_weather_service_response_to_weather_data) and the
+same average_city_weather_data as the requests served live.
+
+Archive format (JSON lines, one record per request that was served):
+    {"city": "Paris", "archived_at": 1760694400,
+     "responses": {"WeatherAPI": {...current.json payload...}, "OpenMeteo": {...forecast payload...}}}
+The staleness filter is applied as of 'archived_at', the time the responses were fetched
+(defaults to the newest data point of the record).
+
+The archive is streamed in chunks of CHUNK_NUM_RECORDS lines, which are normalized on a
+pool of worker processes and written in the input order, with at most a few chunks per
+worker in flight, so that memory stays bounded for archives of any size. Every output
+record carries the aggregate of its input record, or the reason it has none.
+
+Usage:
+    python -m renormalize archive.jsonl --output normalized.jsonl --workers 8
+    python -m renormalize archive.jsonl --output normalized.csv --format csv
+
+Main components:
+    - renormalize_record: Normalizes and aggregates a single archived record.
+    - renormalize_chunk: Processes a chunk of archive lines into encoded output rows (run by the workers).
+    - renormalize_archive: Streams an archive through the worker pool into an output file.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+import json_codec
+import open_meteo
+import weather_api
+from city_weather_data import (CityWeatherData, OPEN_METEO_PROVIDER_NAME, WEATHER_API_PROVIDER_NAME,
+                               average_city_weather_data, convert_weather_service_response_to_weather_data)
+
+# Archived payloads are parsed with the providers' own response parsers
+RAW_RESPONSE_PARSERS: Dict[str, Callable[[dict], object]] = {
+    WEATHER_API_PROVIDER_NAME: weather_api.parse_weather_api_response,
+    OPEN_METEO_PROVIDER_NAME: open_meteo.parse_open_meteo_response,
+}
+
+CHUNK_NUM_RECORDS = 5000
+# Chunks submitted ahead per worker, so that workers never wait for the reader while memory stays bounded
+MAX_CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+OUTPUT_FORMATS = ("jsonl", "csv")
+OUTPUT_COLUMNS = ("city", "archived_at", "latitude", "longitude", "last_update_epoch", "temp_c",
+                  "weather_conditions", "providers", "error")
+
+
+class RenormalizedChunk(NamedTuple):
+    """The output of a processed chunk.
+
+        Attributes:
+            text: The encoded output rows of the chunk, in input order.
+            num_records: Number of records in the chunk.
+            num_errors: Number of records without an aggregate.
+            cpu_num_seconds: The CPU time the worker spent on the chunk.
+    """
+    text: str
+    num_records: int
+    num_errors: int
+    cpu_num_seconds: float
+
+
+class RenormalizeStats(NamedTuple):
+    """The summary of a re-normalization run.
+
+        Attributes:
+            num_records: Number of records processed.
+            num_errors: Number of records without an aggregate.
+            elapsed_num_seconds: The wall time of the run.
+            cpu_num_seconds: The CPU time spent by all workers on the records.
+            num_workers: Number of worker processes.
+    """
+    num_records: int
+    num_errors: int
+    elapsed_num_seconds: float
+    cpu_num_seconds: float
+    num_workers: int
+
+    @property
+    def records_per_second(self) -> float:
+        return self.num_records / self.elapsed_num_seconds if self.elapsed_num_seconds > 0 else 0.0
+
+    @property
+    def records_per_second_per_core(self) -> float:
+        return self.num_records / self.cpu_num_seconds if self.cpu_num_seconds > 0 else 0.0
+
+
+def renormalize_record(record: dict) -> Tuple[Optional[CityWeatherData], Optional[str]]:
+    """Normalizes the archived provider responses of a record and aggregates them.
+
+        Responses of unknown providers are ignored.
+
+        Returns:
+            A tuple containing the aggregated CityWeatherData (None if no data point passes
+            the filters) and the reason there is none.
+    """
+    weather_data_list = [convert_weather_service_response_to_weather_data(RAW_RESPONSE_PARSERS[provider_name](payload))
+                         for provider_name, payload in (record.get("responses") or {}).items()
+                         if provider_name in RAW_RESPONSE_PARSERS]
+    if len(weather_data_list) == 0:
+        return None, "no provider responses"
+
+    archived_at = record.get("archived_at")
+    if archived_at is None:
+        archived_at = max((data.last_update_epoch for data in weather_data_list
+                           if data.last_update_epoch is not None), default=None)
+
+    weather_data = average_city_weather_data(weather_data_list, now=archived_at) if archived_at is not None else None
+    return weather_data, None if weather_data is not None else "all data points were filtered out"
+
+
+def get_output_row(city_name: Optional[str], archived_at: Optional[float], weather_data: Optional[CityWeatherData],
+                   error: Optional[str]) -> tuple:
+    """Returns the OUTPUT_COLUMNS values of an output record."""
+    if weather_data is None:
+        return city_name, archived_at, None, None, None, None, [], [], error
+    return (city_name, archived_at, weather_data.latitude, weather_data.longitude, weather_data.last_update_epoch,
+            weather_data.temp_c, sorted(weather_condition.name for weather_condition in weather_data.weather_condition),
+            weather_data.providers, None)
+
+
+def renormalize_chunk(lines: List[str], output_format: str = "jsonl") -> RenormalizedChunk:
+    """Processes a chunk of archive lines into encoded output rows, one per non-empty line.
+
+        Lines that cannot be parsed or normalized yield an output row carrying the error.
+    """
+    start_cpu_time = time.process_time()
+    rows = []
+    for line in lines:
+        if not line.strip():
+            continue
+        record = {}
+        try:
+            record = json.loads(line)
+            weather_data, error = renormalize_record(record)
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            weather_data, error = None, f"invalid record: {e!r}"
+        if not isinstance(record, dict):
+            record = {}
+        rows.append(get_output_row(record.get("city"), record.get("archived_at"), weather_data, error))
+
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerows(row[:6] + ("|".join(row[6]), "|".join(row[7]), row[8]) for row in rows)
+        text = buffer.getvalue()
+    else:
+        text = "".join(json_codec.dumps(dict(zip(OUTPUT_COLUMNS, row))) + "\n" for row in rows)
+
+    num_errors = sum(1 for row in rows if row[-1] is not None)
+    return RenormalizedChunk(text, len(rows), num_errors, time.process_time() - start_cpu_time)
+
+
+def read_chunks(lines: Iterable[str], chunk_num_records: int) -> Iterator[List[str]]:
+    """Groups lines into lists of chunk_num_records lines (the last one may be shorter)."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == chunk_num_records:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def renormalize_archive(input_file: TextIO, output_file: TextIO, num_workers: int = 1,
+                        chunk_num_records: int = CHUNK_NUM_RECORDS, output_format: str = "jsonl") -> RenormalizeStats:
+    """Streams an archive through a pool of worker processes into an output file, in input order.
+
+        Args:
+            input_file: The archive, as JSON lines.
+            output_file: Where the output rows are written.
+            num_workers: Number of worker processes. With a single worker, chunks are processed in-process.
+            chunk_num_records: Number of archive lines per chunk.
+            output_format: One of OUTPUT_FORMATS.
+
+        Returns:
+            The RenormalizeStats of the run.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {OUTPUT_FORMATS}")
+
+    start_time = time.perf_counter()
+    num_records = num_errors = 0
+    cpu_num_seconds = 0.0
+
+    if output_format == "csv":
+        csv.writer(output_file, lineterminator="\n").writerow(OUTPUT_COLUMNS)
+
+    def write(chunk: RenormalizedChunk):
+        nonlocal num_records, num_errors, cpu_num_seconds
+        output_file.write(chunk.text)
+        num_records += chunk.num_records
+        num_errors += chunk.num_errors
+        cpu_num_seconds += chunk.cpu_num_seconds
+
+    chunks = read_chunks(input_file, chunk_num_records)
+    if num_workers <= 1:
+        for lines in chunks:
+            write(renormalize_chunk(lines, output_format))
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            in_flight = deque()
+            for lines in chunks:
+                in_flight.append(executor.submit(renormalize_chunk, lines, output_format))
+                # results are written in submission order, so the output follows the input order
+                while len(in_flight) >= num_workers * MAX_CHUNKS_IN_FLIGHT_PER_WORKER:
+                    write(in_flight.popleft().result())
+            while in_flight:
+                write(in_flight.popleft().result())
+
+    return RenormalizeStats(num_records, num_errors, time.perf_counter() - start_time, cpu_num_seconds,
+                            max(num_workers, 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="archive of raw provider responses, as JSON lines ('-' for stdin)")
+    parser.add_argument("--output", default="-", help="output file ('-' for stdout)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_NUM_RECORDS, help="archive lines per chunk")
+    args = parser.parse_args()
+
+    input_file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        stats = renormalize_archive(input_file, output_file, args.workers, args.chunk_size, args.format)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    # reported on stderr, so that the output can be piped
+    print(f"Renormalized {stats.num_records} records ({stats.num_errors} without an aggregate) "
+          f"in {stats.elapsed_num_seconds:.2f}s with {stats.num_workers} workers: "
+          f"{stats.records_per_second:.0f} records/s, {stats.records_per_second_per_core:.0f} records/s per core",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Standalone HTTP Server Module.
+
+This module serves the Weather Aggregator over plain HTTP, for running it in a
+container behind a load balancer instead of (or next to) AWS Lambda. Every HTTP
+request is translated into the Lambda Function URL / HTTP API (payload v2.0) event
+that lambda_function.lambda_handler expects, so both deployments share all of the
+business logic.
+
+Concurrency model:
+    - Connections are accepted and parsed by an asyncio event loop, so thousands of
+      open (keep-alive) connections cost one coroutine each, not one thread each.
+    - lambda_handler is blocking, so invocations run on a bounded thread pool
+      (--threads) while the event loop keeps serving other connections. Inside an
+      invocation, provider calls run concurrently on fetch_engine's pool over pooled
+      keep-alive sessions, both sized up for the server's concurrency.
+    - Several worker processes (--workers) accept connections from one shared
+      listening socket, to use every CPU core. Caches (weather data, geocodes) and
+      connection pools are per process.
+
+Usage:
+    python server.py --port 8080 --workers 4 --threads 64
+
+Environment Variables:
+    - TRUST_FORWARDED_FOR: Whether the client IP is taken from the X-Forwarded-For header
+      set by the load balancer (defaults to false, using the connection's peer address).
+"""
+
+import argparse
+import asyncio
+import base64
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+TRUST_FORWARDED_FOR = os.environ.get("TRUST_FORWARDED_FOR", "false").lower() == "true"
+
+DEFAULT_WORKER_THREADS = 64
+# Upper bound on a whole invocation, reported to the handler like Lambda's remaining time
+REQUEST_TIMEOUT_NUM_SECONDS = 10.0
+# Time a kept-alive connection may stay idle before it is closed
+KEEP_ALIVE_TIMEOUT_NUM_SECONDS = 60.0
+
+MAX_HEADER_NUM_BYTES = 64 * 1024
+MAX_BODY_NUM_BYTES = 1024 * 1024
+
+HEALTH_CHECK_PATH = "/health"
+
+
+class BadRequestError(Exception):
+    """Raised when an HTTP request cannot be parsed.
+
+        Attributes:
+            status_code: The HTTP status code to answer with.
+    """
+    def __init__(self, status_code: int = 400):
+        self.status_code = status_code
+
+
+class ServerContext:
+    """The subset of the Lambda context object used by the handler, for a single HTTP request.
+
+        Attributes:
+            aws_request_id: A unique id of the request.
+            function_name: The name reported in place of the Lambda function's name.
+    """
+    function_name = "weatherAggregator-server"
+
+    def __init__(self, timeout_num_seconds: float = REQUEST_TIMEOUT_NUM_SECONDS):
+        self.aws_request_id = str(uuid.uuid4())
+        self._deadline = time.monotonic() + timeout_num_seconds
+
+    def get_remaining_time_in_millis(self) -> int:
+        """Returns the time left until the request's deadline, like the Lambda context method."""
+        return max(int((self._deadline - time.monotonic()) * 1000), 0)
+
+
+def build_event(method: str, target: str, headers: Dict[str, str], body: bytes, peer_ip: Optional[str],
+                trust_forwarded_for: bool = TRUST_FORWARDED_FOR) -> dict:
+    """Translates an HTTP request into a Lambda HTTP API (payload v2.0) event.
+
+        Args:
+            method: The request method (e.g. 'GET').
+            target: The request target, i.e. the path and query string.
+            headers: The request headers, with lower-cased names.
+            body: The raw request body.
+            peer_ip: The IP address of the connection's peer.
+            trust_forwarded_for: Whether the client IP is taken from the X-Forwarded-For header.
+
+        Returns:
+            An event in the shape lambda_function.lambda_handler expects.
+    """
+    url = urlsplit(target)
+
+    # like API Gateway, repeated query parameters are joined with commas
+    query_string_parameters = {}
+    for key, value in parse_qsl(url.query, keep_blank_values=True):
+        query_string_parameters[key] = f"{query_string_parameters[key]},{value}" \
+            if key in query_string_parameters else value
+
+    source_ip = peer_ip
+    if trust_forwarded_for and headers.get("x-forwarded-for"):
+        source_ip = headers["x-forwarded-for"].split(",")[0].strip()
+
+    event = {
+        "version": "2.0",
+        "rawPath": url.path,
+        "rawQueryString": url.query,
+        "headers": headers,
+        "queryStringParameters": query_string_parameters or None,
+        "requestContext": {
+            "http": {"method": method, "path": url.path, "protocol": "HTTP/1.1", "sourceIp": source_ip,
+                     "userAgent": headers.get("user-agent")},
+        },
+        "isBase64Encoded": False,
+    }
+    if body:
+        try:
+            event["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            event["body"] = base64.b64encode(body).decode("ascii")
+            event["isBase64Encoded"] = True
+    return event
+
+
+def format_response(response: dict, keep_alive: bool) -> bytes:
+    """Serializes a Lambda proxy response dictionary into an HTTP/1.1 response."""
+    status_code = response.get("statusCode", 200)
+    body = response.get("body") or ""
+    body = base64.b64decode(body) if response.get("isBase64Encoded") else body.encode("utf-8")
+
+    try:
+        reason = HTTPStatus(status_code).phrase
+    except ValueError:
+        reason = ""
+    lines = [f"HTTP/1.1 {status_code} {reason}"]
+    lines += [f"{name}: {value}" for name, value in (response.get("headers") or {}).items()
+              if name.lower() not in ("content-length", "connection")]
+    lines.append(f"Content-Length: {len(body)}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, str, Dict[str, str], bytes]]:
+    """Reads a single HTTP/1.1 request from a connection.
+
+        Returns:
+            A (method, target, version, headers, body) tuple, or None if the connection was closed.
+
+        Raises:
+            BadRequestError: If the request is malformed or too large.
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise BadRequestError()
+        return None
+    except asyncio.LimitOverrunError:
+        raise BadRequestError(431)
+
+    try:
+        request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+        method, target, version = request_line.split(" ")
+        headers = {}
+        for line in header_lines:
+            name, value = line.split(":", 1)
+            name = name.strip().lower()
+            headers[name] = f"{headers[name]},{value.strip()}" if name in headers else value.strip()
+        content_length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise BadRequestError()
+
+    if "chunked" in headers.get("transfer-encoding", ""):
+        raise BadRequestError(411)
+    if content_length < 0 or content_length > MAX_BODY_NUM_BYTES:
+        raise BadRequestError(413)
+
+    body = await reader.readexactly(content_length) if content_length else b""
+    return method, target, version, headers, body
+
+
+class LambdaHttpServer:
+    """An asyncio HTTP/1.1 server invoking a Lambda handler for every request.
+
+        Attributes:
+            handler: The Lambda handler, called with an event and a ServerContext.
+            trust_forwarded_for: Whether the client IP is taken from the X-Forwarded-For header.
+    """
+    def __init__(self, handler: Optional[Callable[[dict, Any], dict]] = None,
+                 num_worker_threads: int = DEFAULT_WORKER_THREADS, trust_forwarded_for: bool = TRUST_FORWARDED_FOR):
+        if handler is None:
+            import lambda_function
+            handler = lambda_function.lambda_handler
+        self.handler = handler
+        self.trust_forwarded_for = trust_forwarded_for
+        self._executor = ThreadPoolExecutor(max_workers=num_worker_threads, thread_name_prefix="invocation")
+
+    async def invoke(self, event: dict) -> dict:
+        """Runs the handler on the worker thread pool, answering 504 past REQUEST_TIMEOUT_NUM_SECONDS."""
+        context = ServerContext()
+        invocation = asyncio.get_running_loop().run_in_executor(self._executor, self.handler, event, context)
+        try:
+            return await asyncio.wait_for(invocation, REQUEST_TIMEOUT_NUM_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"Request {context.aws_request_id} did not complete within {REQUEST_TIMEOUT_NUM_SECONDS}s")
+            return {"statusCode": 504, "headers": {"X-Request-ID": context.aws_request_id}}
+        except Exception as e:
+            print(f"Request {context.aws_request_id} failed with an unexpected error: {e!r}")
+            return {"statusCode": 500, "headers": {"X-Request-ID": context.aws_request_id}}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves the requests of a connection until it is closed or idles out."""
+        peer = writer.get_extra_info("peername")
+        peer_ip = peer[0] if peer else None
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_TIMEOUT_NUM_SECONDS)
+                except BadRequestError as e:
+                    writer.write(format_response({"statusCode": e.status_code}, keep_alive=False))
+                    await writer.drain()
+                    return
+                if request is None:
+                    return
+
+                method, target, version, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close" if version == "HTTP/1.1" \
+                    else headers.get("connection", "").lower() == "keep-alive"
+
+                if urlsplit(target).path == HEALTH_CHECK_PATH:
+                    response = {"statusCode": 200, "headers": {"Content-Type": "application/json"},
+                                "body": '{"status": "ok"}'}
+                else:
+                    response = await self.invoke(build_event(method, target, headers, body, peer_ip,
+                                                             self.trust_forwarded_for))
+
+                writer.write(format_response(response, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, sock: socket.socket):
+        """Accepts and serves connections on a listening socket until cancelled."""
+        server = await asyncio.start_server(self.handle_connection, sock=sock, limit=MAX_HEADER_NUM_BYTES,
+                                            backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+
+def create_listening_socket(host: str, port: int) -> socket.socket:
+    """Binds the listening socket shared by all worker processes."""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+
+def run_worker(sock: socket.socket, num_worker_threads: int):
+    """Runs a worker process: a LambdaHttpServer on the shared listening socket."""
+    # every invocation thread may fan out to the providers, so size their pools for the server's concurrency
+    os.environ.setdefault("FETCH_MAX_WORKERS", str(num_worker_threads))
+    os.environ.setdefault("WEATHER_API_POOL_MAXSIZE", str(num_worker_threads))
+    os.environ.setdefault("OPEN_METEO_POOL_MAXSIZE", str(num_worker_threads))
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server = LambdaHttpServer(num_worker_threads=num_worker_threads)
+    try:
+        asyncio.run(server.serve(sock))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves the Weather Aggregator over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--threads", type=int, default=DEFAULT_WORKER_THREADS,
+                        help="concurrent invocations per worker process")
+    args = parser.parse_args()
+
+    sock = create_listening_socket(args.host, args.port)
+    print(f"Serving on {args.host}:{sock.getsockname()[1]} with {args.workers} worker processes")
+
+    # workers inherit the listening socket, so the kernel spreads accepted connections between them
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=run_worker, args=(sock, args.threads), daemon=True)
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+
+    def stop(signum, frame):
+        for worker in workers:
+            worker.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    main()
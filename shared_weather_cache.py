@@ -0,0 +1,194 @@
+"""Shared City Weather Data Cache Module.
+
+This module provides a weather data cache shared by every Lambda container (and server
+process), backed by a DynamoDB table. The in-process cache of city_weather_data only
+helps the container that populated it, so aggregates of popular cities are published
+here by the scheduled refresh (see popular_cities_refresh) and read by request handling
+before falling back to the providers.
+
+Entries are keyed by normalized city name (see geocode_cache.normalize_city_name) and
+carry the aggregate, its expiry (derived from the providers' update intervals, like the
+in-process cache) and the end of its stale window, which is also the item's DynamoDB TTL.
+
+Lookups read all of their cities with BatchGetItem, one call per BATCH_GET_ITEM_MAX_KEYS
+cities, on a small pool of their own: a 50-city batch request costs a single round trip,
+and never occupies the provider workers of fetch_engine that its fan-out needs next.
+
+The cache is disabled unless SHARED_WEATHER_CACHE_TABLE_NAME is set. Read and write
+errors are logged and treated as misses: the shared cache never fails a request.
+
+Environment Requirements:
+    - SHARED_WEATHER_CACHE_TABLE_NAME: The DynamoDB table, with 'city' as the Partition Key
+      and, optionally, TTL enabled on the 'ttl' attribute.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+import fetch_engine
+import metrics
+from geocode_cache import normalize_city_name
+
+if TYPE_CHECKING:
+    from city_weather_data import CityWeatherData
+
+SHARED_WEATHER_CACHE_TABLE_NAME = os.environ.get("SHARED_WEATHER_CACHE_TABLE_NAME") or None
+
+# Upper bound on a shared cache read, so that a slow table does not delay a request more than a provider call would
+SHARED_CACHE_READ_TIMEOUT_NUM_SECONDS = 0.5
+
+# Number of keys a single BatchGetItem call accepts
+BATCH_GET_ITEM_MAX_KEYS = 100
+# Calls made for the keys DynamoDB leaves unprocessed (e.g. when throttled), before treating them as misses
+BATCH_GET_ITEM_MAX_ATTEMPTS = 3
+BATCH_GET_ITEM_RETRY_DELAY_NUM_SECONDS = 0.05
+
+_shared_cache_table = None
+_shared_cache_table_lock = threading.Lock()
+
+# Reads run here rather than on fetch_engine's pool, which the provider fan-out following a lookup needs
+_read_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="shared-cache-read")
+
+
+def is_enabled() -> bool:
+    """Returns whether a shared cache table is configured."""
+    return _shared_cache_table is not None or SHARED_WEATHER_CACHE_TABLE_NAME is not None
+
+
+def get_shared_cache_table():
+    """Returns the shared cache DynamoDB Table resource, creating it on first use (see ip_history.get_ip_table)."""
+    global _shared_cache_table
+    if _shared_cache_table is None:
+        with _shared_cache_table_lock:
+            if _shared_cache_table is None:
+                import boto3
+                _shared_cache_table = boto3.resource('dynamodb').Table(SHARED_WEATHER_CACHE_TABLE_NAME)
+    return _shared_cache_table
+
+
+def set_shared_cache_table(table):
+    """Replaces the DynamoDB Table resource, e.g. with a local_dynamodb stand-in in tests and benchmarks.
+
+        Setting a table enables the shared cache, setting None restores the configured table (if any).
+    """
+    global _shared_cache_table
+    _shared_cache_table = table
+
+
+def to_item(city_name: str, weather_data: CityWeatherData, expires_at_epoch: float, stale_until_epoch: float) -> dict:
+    """Converts a CityWeatherData and its expiry into a DynamoDB item (numbers as Decimals, conditions by name)."""
+    def as_decimal(value: Optional[float]) -> Optional[Decimal]:
+        return Decimal(str(value)) if value is not None else None
+
+    return {
+        "city": normalize_city_name(city_name),
+        "latitude": as_decimal(weather_data.latitude),
+        "longitude": as_decimal(weather_data.longitude),
+        "last_update_epoch": int(weather_data.last_update_epoch),
+        "temp_c": as_decimal(weather_data.temp_c),
+        "weather_conditions": [weather_condition.name for weather_condition in weather_data.weather_condition],
+        "providers": list(weather_data.providers),
+        "expires_at_epoch": int(expires_at_epoch),
+        "ttl": int(stale_until_epoch),
+    }
+
+
+def from_item(item: dict) -> Tuple[CityWeatherData, float, float]:
+    """Converts a DynamoDB item back into a (CityWeatherData, expires_at_epoch, stale_until_epoch) tuple."""
+    from city_weather_data import CityWeatherData, WeatherCondition
+
+    def as_float(value: Optional[Decimal]) -> Optional[float]:
+        return float(value) if value is not None else None
+
+    weather_data = CityWeatherData(as_float(item["latitude"]), as_float(item["longitude"]),
+                                   int(item["last_update_epoch"]), as_float(item.get("temp_c")),
+                                   [WeatherCondition[name] for name in item.get("weather_conditions", [])
+                                    if name in WeatherCondition.__members__],
+                                   list(item.get("providers", [])))
+    return weather_data, float(item["expires_at_epoch"]), float(item["ttl"])
+
+
+@metrics.timed("SharedCacheRead")
+def get_items(keys: List[str]) -> Dict[str, dict]:
+    """Reads the items of up to BATCH_GET_ITEM_MAX_KEYS distinct keys in a single BatchGetItem call.
+
+        Keys left unprocessed by DynamoDB are requested again, up to BATCH_GET_ITEM_MAX_ATTEMPTS
+        calls in all, and then treated as misses.
+
+        Returns:
+            A mapping of every cached key to its item.
+    """
+    # the client of a Table resource converts keys and items from and to Python values, like the Table does
+    table = get_shared_cache_table()
+    request_keys = [{"city": key} for key in keys]
+    items = {}
+    for attempt in range(1, BATCH_GET_ITEM_MAX_ATTEMPTS + 1):
+        response = table.meta.client.batch_get_item(RequestItems={table.name: {"Keys": request_keys}})
+        for item in response.get("Responses", {}).get(table.name, []):
+            items[item["city"]] = item
+        request_keys = response.get("UnprocessedKeys", {}).get(table.name, {}).get("Keys", [])
+        if not request_keys:
+            break
+        if attempt < BATCH_GET_ITEM_MAX_ATTEMPTS:
+            time.sleep(BATCH_GET_ITEM_RETRY_DELAY_NUM_SECONDS * attempt)
+
+    if request_keys:
+        print(f"Shared weather cache read left {len(request_keys)} keys unprocessed")
+    return items
+
+
+def get_entries(city_names: Iterable[str]) -> Dict[str, Tuple[CityWeatherData, float, float]]:
+    """Reads the shared cache entries of several cities, with one BatchGetItem call per BATCH_GET_ITEM_MAX_KEYS cities.
+
+        Calls exceeding SHARED_CACHE_READ_TIMEOUT_NUM_SECONDS are treated as misses.
+
+        Returns:
+            A mapping of every cached city name to its (CityWeatherData, expires_at_epoch,
+            stale_until_epoch) tuple. Expired entries are returned too.
+    """
+    keys_by_city = {city_name: normalize_city_name(city_name) for city_name in city_names}
+    # BatchGetItem rejects duplicate keys, e.g. of 'Paris' and 'paris'
+    keys = list(dict.fromkeys(keys_by_city.values()))
+    # runs in a copy of the submitting context, so that the reads are attributed to the invocation's metrics
+    gathered = fetch_engine.gather_provider_results(
+        {i: (_read_executor.submit(contextvars.copy_context().run, get_items, keys[i:i + BATCH_GET_ITEM_MAX_KEYS]),
+             SHARED_CACHE_READ_TIMEOUT_NUM_SECONDS)
+         for i in range(0, len(keys), BATCH_GET_ITEM_MAX_KEYS)})
+
+    items = {}
+    for items_or_error in gathered.values():
+        if isinstance(items_or_error, Exception):
+            print(f"Shared weather cache read failed: {items_or_error!r}")
+        else:
+            items.update(items_or_error)
+
+    entries = {}
+    for city_name, key in keys_by_city.items():
+        if key in items:
+            try:
+                entries[city_name] = from_item(items[key])
+            except (KeyError, ValueError, TypeError) as e:
+                print(f"Shared weather cache entry of {city_name} could not be read: {e!r}")
+    return entries
+
+
+@metrics.timed("SharedCacheWrite")
+def put_entry(city_name: str, weather_data: CityWeatherData, expires_at_epoch: float, stale_until_epoch: float) -> bool:
+    """Publishes the aggregate of a city to the shared cache.
+
+        Returns:
+            True if the write succeeded, False otherwise.
+    """
+    try:
+        get_shared_cache_table().put_item(Item=to_item(city_name, weather_data, expires_at_epoch, stale_until_epoch))
+        return True
+    except Exception as e:
+        print(f"Shared weather cache write for {city_name} failed: {e!r}")
+        return False
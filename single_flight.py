@@ -0,0 +1,109 @@
+"""Request Coalescing (Single-Flight) Module.
+
+This module ensures that, among concurrent callers, only one computation is in flight
+per key: the first caller claiming a key leads its flight and computes the result,
+while every caller claiming the same key before the flight lands joins it and awaits
+the leader's result, or its error, instead of repeating the work.
+
+It is used to coalesce concurrent upstream fetches of the same city, so that a
+trending city costs one provider fan-out however many requests ask for it at once.
+Flights are forgotten as soon as they land: later callers are expected to be served
+by a cache instead.
+
+Main components:
+    - Flight: A claimed key, led or joined by the claiming caller.
+    - SingleFlight: The registry of in-flight keys.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterable
+
+
+class Flight:
+    """A caller's claim on an in-flight key.
+
+        Attributes:
+            key: The claimed key.
+            future: Resolves to the result (or error) of the flight.
+            is_leader: Whether the claiming caller leads the flight, and must land it.
+    """
+    __slots__ = ("key", "future", "is_leader")
+
+    def __init__(self, key: Hashable, future: Future, is_leader: bool):
+        self.key = key
+        self.future = future
+        self.is_leader = is_leader
+
+    def __repr__(self):
+        """Returns a string representation of the Flight instance."""
+        return f"{self.__class__.__name__}({self.key!r}, is_leader={self.is_leader!r})"
+
+
+class SingleFlight:
+    """A thread-safe registry of in-flight keys.
+
+        Attributes:
+            num_led: Number of flights led (i.e. computations performed).
+            num_joined: Number of claims that joined a flight in progress (i.e. computations saved).
+    """
+    def __init__(self):
+        self._flights: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.num_led = 0
+        self.num_joined = 0
+
+    def claim(self, keys: Iterable[Hashable]) -> Dict[Hashable, Flight]:
+        """Claims several keys at once, leading the flights of keys not in flight yet and joining the others.
+
+            A key listed more than once is claimed once. The caller must land every flight it leads
+            (see land and land_with_error), even if its computation fails.
+
+            Returns:
+                A mapping of every distinct key to its Flight.
+        """
+        flights = {}
+        with self._lock:
+            for key in keys:
+                if key in flights:
+                    continue
+                future = self._flights.get(key)
+                if future is None:
+                    future = self._flights[key] = Future()
+                    flights[key] = Flight(key, future, is_leader=True)
+                    self.num_led += 1
+                else:
+                    flights[key] = Flight(key, future, is_leader=False)
+                    self.num_joined += 1
+        return flights
+
+    def land(self, flight: Flight, result: Any):
+        """Ends a led flight, handing its result to every joined caller."""
+        with self._lock:
+            self._flights.pop(flight.key, None)
+        flight.future.set_result(result)
+
+    def land_with_error(self, flight: Flight, error: BaseException):
+        """Ends a led flight, raising its error for every joined caller."""
+        with self._lock:
+            self._flights.pop(flight.key, None)
+        flight.future.set_exception(error)
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """Returns function's result, calling it only if no call for the same key is already in flight.
+
+            Raises:
+                Any error raised by the call (whether made by this caller or by the flight's leader).
+        """
+        flight = self.claim([key])[key]
+        if flight.is_leader:
+            try:
+                self.land(flight, function())
+            except BaseException as e:
+                self.land_with_error(flight, e)
+        return flight.future.result()
+
+    def __len__(self):
+        """Returns the number of keys in flight."""
+        with self._lock:
+            return len(self._flights)
@@ -0,0 +1,107 @@
+"""Geospatial Index Module.
+
+This module provides an in-memory index of geographic points supporting nearest
+neighbour lookups within a radius, used to answer coordinate queries with a city
+whose location was resolved before (see geocode_cache) instead of going upstream.
+
+Points are bucketed into a fixed grid of CELL_SIZE_DEGREES x CELL_SIZE_DEGREES cells
+(a geohash-like grid), so that a lookup only measures the distance to the points of
+the few cells overlapping the search radius: with 100k indexed locations and a radius
+of a few kilometres, a lookup visits a handful of cells and takes microseconds.
+
+Distances are great-circle distances (haversine formula). Searches wrap around the
+antimeridian and widen towards the poles, where longitude degrees shrink.
+
+Main components:
+    - haversine_distance_km: The great-circle distance between two points.
+    - SpatialIndex: A thread-safe grid index of points to values.
+"""
+
+import math
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Roughly 11 km of latitude: a search within a few kilometres spans up to 3 x 3 cells
+CELL_SIZE_DEGREES = 0.1
+
+
+def haversine_distance_km(latitude_a: float, longitude_a: float, latitude_b: float, longitude_b: float) -> float:
+    """Returns the great-circle distance between two points, in kilometres."""
+    phi_a, phi_b = math.radians(latitude_a), math.radians(latitude_b)
+    half_delta_phi = (phi_b - phi_a) / 2
+    half_delta_lambda = math.radians(longitude_b - longitude_a) / 2
+    a = math.sin(half_delta_phi) ** 2 + math.cos(phi_a) * math.cos(phi_b) * math.sin(half_delta_lambda) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    """A thread-safe grid index of (latitude, longitude) points to values.
+
+        A point is stored once: inserting a value at the coordinates of an indexed point replaces it.
+
+        Attributes:
+            cell_size_degrees: The side of a grid cell, in degrees.
+    """
+    def __init__(self, cell_size_degrees: float = CELL_SIZE_DEGREES):
+        self.cell_size_degrees = cell_size_degrees
+        self._num_longitude_cells = math.ceil(360 / cell_size_degrees)
+        self._cells: Dict[Tuple[int, int], Dict[Tuple[float, float], Any]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Returns the number of indexed points."""
+        return self._size
+
+    def _get_cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor(latitude / self.cell_size_degrees),
+                math.floor((longitude + 180) / self.cell_size_degrees) % self._num_longitude_cells)
+
+    def insert(self, latitude: float, longitude: float, value: Any):
+        """Indexes value at the given point, replacing the value of a point already indexed there."""
+        with self._lock:
+            points = self._cells.setdefault(self._get_cell(latitude, longitude), {})
+            if (latitude, longitude) not in points:
+                self._size += 1
+            points[(latitude, longitude)] = value
+
+    def clear(self):
+        """Removes every indexed point."""
+        with self._lock:
+            self._cells.clear()
+            self._size = 0
+
+    def nearest(self, latitude: float, longitude: float, max_distance_km: float) -> Optional[Tuple[Any, float]]:
+        """Returns the value of the indexed point nearest to the given point, within max_distance_km.
+
+            Returns:
+                A (value, distance_km) tuple, or None if no point lies within max_distance_km.
+        """
+        latitude_cell, longitude_cell = self._get_cell(latitude, longitude)
+        num_latitude_cells = math.ceil(max_distance_km / (self.cell_size_degrees * KM_PER_DEGREE))
+
+        # a longitude degree shrinks with the cosine of the latitude, down to nothing at the poles
+        max_abs_latitude = min(abs(latitude) + max_distance_km / KM_PER_DEGREE, 90.0)
+        min_cos_latitude = math.cos(math.radians(max_abs_latitude))
+        num_longitude_cells = self._num_longitude_cells // 2 if min_cos_latitude < 1e-6 else \
+            min(math.ceil(max_distance_km / (self.cell_size_degrees * KM_PER_DEGREE * min_cos_latitude)),
+                self._num_longitude_cells // 2)
+
+        nearest_value, nearest_distance_km = None, None
+        with self._lock:
+            for latitude_offset in range(-num_latitude_cells, num_latitude_cells + 1):
+                for longitude_offset in range(-num_longitude_cells, num_longitude_cells + 1):
+                    points = self._cells.get((latitude_cell + latitude_offset,
+                                              (longitude_cell + longitude_offset) % self._num_longitude_cells))
+                    if not points:
+                        continue
+                    for (point_latitude, point_longitude), value in points.items():
+                        distance_km = haversine_distance_km(latitude, longitude, point_latitude, point_longitude)
+                        if distance_km <= max_distance_km \
+                                and (nearest_distance_km is None or distance_km < nearest_distance_km):
+                            nearest_value, nearest_distance_km = value, distance_km
+
+        return (nearest_value, nearest_distance_km) if nearest_distance_km is not None else None
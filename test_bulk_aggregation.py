@@ -0,0 +1,72 @@
+"""Unit tests for the vectorized bulk aggregation engine.
+
+The bulk aggregation must produce exactly the results of the scalar
+average_city_weather_data for every city, including cities whose data points are
+all stale, incomplete or missing.
+"""
+
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bulk_aggregation import (average_city_weather_data_bulk, city_weather_data_from_bulk_result,  # noqa: E402
+                              weather_data_columns_from_city_weather_data)
+from city_weather_data import (CityWeatherData, STALE_CUTOFF_NUM_SECONDS, WeatherCondition,  # noqa: E402
+                               average_city_weather_data)
+
+NOW = 1_800_000_000
+PROVIDER_NAMES = ["OpenMeteo", "Third", "WeatherAPI"]
+
+
+def random_city_weather_data(rng: random.Random):
+    """Returns a data point with randomly missing fields, timestamps around the stale cutoff, or None."""
+    if rng.random() < 0.1:
+        return None
+
+    def maybe(value):
+        return None if rng.random() < 0.1 else value
+
+    return CityWeatherData(maybe(rng.uniform(-90, 90)), maybe(rng.uniform(-180, 180)),
+                           maybe(NOW - rng.randint(0, 2 * STALE_CUTOFF_NUM_SECONDS)),
+                           maybe(rng.uniform(-30, 45)), rng.choice(list(WeatherCondition)),
+                           rng.sample(PROVIDER_NAMES, rng.randint(0, 2)))
+
+
+def test_bulk_aggregation_matches_scalar_aggregation():
+    """Every city of a randomized batch aggregates to the same data as with the scalar function."""
+    rng = random.Random(7)
+    weather_data_rows = [[random_city_weather_data(rng) for _ in range(rng.randint(0, 3))] for _ in range(2000)]
+
+    bulk_results = city_weather_data_from_bulk_result(
+        average_city_weather_data_bulk(weather_data_columns_from_city_weather_data(weather_data_rows), now=NOW))
+
+    for row, bulk_result in zip(weather_data_rows, bulk_results):
+        scalar_result = average_city_weather_data([data for data in row if data is not None], now=NOW)
+        if scalar_result is None:
+            assert bulk_result is None
+            continue
+        assert (bulk_result.latitude, bulk_result.longitude) == (scalar_result.latitude, scalar_result.longitude)
+        assert bulk_result.last_update_epoch == scalar_result.last_update_epoch
+        assert bulk_result.temp_c == pytest.approx(scalar_result.temp_c)
+        assert set(bulk_result.weather_condition) == set(scalar_result.weather_condition)
+        assert bulk_result.providers == scalar_result.providers
+
+
+def test_bulk_aggregation_filters_stale_data_points():
+    """A stale provider data point is excluded from the mean, the timestamp and the conditions of its city."""
+    stale_time = NOW - (STALE_CUTOFF_NUM_SECONDS + 100)
+    fresh_time = NOW - (STALE_CUTOFF_NUM_SECONDS - 100)
+    columns = weather_data_columns_from_city_weather_data([
+        [CityWeatherData(32.0, 34.0, stale_time, 20.0, WeatherCondition.HEAVY_RAIN),
+         CityWeatherData(32.0, 34.0, fresh_time, 30.0, WeatherCondition.CLEAR)],
+        [CityWeatherData(51.5, -0.1, stale_time, 10.0, WeatherCondition.FOG)],
+    ])
+
+    result = average_city_weather_data_bulk(columns, now=NOW)
+
+    assert result.valid.tolist() == [True, False]
+    assert result.temp_c[0] == 30.0
+    assert result.last_update_epoch[0] == fresh_time
+    assert city_weather_data_from_bulk_result(result)[0].weather_condition == [WeatherCondition.CLEAR]
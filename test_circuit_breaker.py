@@ -0,0 +1,60 @@
+"""Unit tests for the per-provider circuit breaker.
+
+These tests validate that the circuit opens after consecutive failures, rejects
+calls while open, lets a single trial call through once its reset timeout has
+passed, and closes again when the trial call succeeds.
+"""
+
+import pytest
+
+from circuit_breaker import (CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, CircuitBreaker,
+                             CircuitOpenError)
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_opens_after_consecutive_failures_and_fails_fast():
+    """Reaching the failure threshold opens the circuit; a success in between resets the count."""
+    clock = FakeClock(0.0)
+    circuit_breaker = CircuitBreaker("provider", failure_threshold=2, reset_timeout_num_seconds=30.0, clock=clock)
+
+    circuit_breaker.record_failure()
+    circuit_breaker.record_success()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == CIRCUIT_CLOSED
+
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == CIRCUIT_OPEN
+
+    clock.now = 10.0
+    with pytest.raises(CircuitOpenError) as e:
+        circuit_breaker.before_call()
+    assert e.value.retry_after_num_seconds == 20.0
+
+
+def test_half_open_circuit_lets_a_single_trial_call_through():
+    """After the reset timeout one trial call is admitted; its outcome closes or reopens the circuit."""
+    clock = FakeClock(0.0)
+    circuit_breaker = CircuitBreaker("provider", failure_threshold=1, reset_timeout_num_seconds=30.0, clock=clock)
+    circuit_breaker.record_failure()
+
+    clock.now = 30.0
+    circuit_breaker.before_call()
+    assert circuit_breaker.state == CIRCUIT_HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.before_call()
+
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == CIRCUIT_OPEN
+
+    clock.now = 60.0
+    circuit_breaker.before_call()
+    circuit_breaker.record_success()
+    assert circuit_breaker.state == CIRCUIT_CLOSED
+    circuit_breaker.before_call()
@@ -66,3 +66,402 @@ def test_weather_mapping_unrecognized():
     # testing an invalid weather condition text
     result = convert_weather_condition_text_to_weather_condition("Apocalyptic Meteor Shower")
     assert result == WeatherCondition.UNRECOGNIZED
+
+
+def test_fetch_city_weather_data_queries_providers_concurrently_with_known_coordinates(monkeypatch):
+    """When the coordinates are already known, WeatherAPI and OpenMeteo are requested in parallel."""
+    import time
+    import city_weather_data
+    from open_meteo import OpenMeteoResponse
+    from weather_api import WeatherApiResponse
+
+    now = int(time.time())
+
+    def fake_fetch_data_weather_api(city_name):
+        time.sleep(0.2)
+        return WeatherApiResponse(city_name, "Israel", 32.0, 34.0, now, 20.0, "Sunny", 1000)
+
+    def fake_fetch_data_open_meteo_batch(coordinates_list):
+        time.sleep(0.2)
+        return [OpenMeteoResponse(latitude, longitude, None, 30.0, 0) for latitude, longitude in coordinates_list]
+
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api", fake_fetch_data_weather_api)
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch", fake_fetch_data_open_meteo_batch)
+    city_weather_data.city_weather_data_cache.clear()
+
+    start = time.monotonic()
+    result = city_weather_data.fetch_city_weather_data("Tel Aviv", coordinates=(32.0, 34.0))
+
+    assert time.monotonic() - start < 0.35
+    # OpenMeteo data has no timestamp, so only the WeatherAPI data point survives the filters
+    assert result.temp_c == 20.0
+    assert result.weather_condition == [WeatherCondition.CLEAR]
+
+
+def test_quorum_answers_without_waiting_for_slow_secondary_providers(monkeypatch):
+    """With a quorum of one, the primary provider's fresh data is returned right away and only cached briefly."""
+    import time
+    import city_weather_data
+    from open_meteo import OpenMeteoResponse
+    from ttl_cache import TTLCache
+    from weather_api import WeatherApiResponse
+
+    now = int(time.time())
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api",
+                        lambda city_name: WeatherApiResponse(city_name, "Norway", 59.91, 10.75, now, 4.0, "Sunny", 1000))
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch",
+                        lambda coordinates_list: time.sleep(0.3) or [OpenMeteoResponse(lat, lon, None, 6.0, 0)
+                                                                     for lat, lon in coordinates_list])
+    monkeypatch.setattr(city_weather_data, "AGGREGATION_QUORUM", 1)
+    clock = [time.time()]
+    monkeypatch.setattr(city_weather_data, "city_weather_data_cache", TTLCache(16, clock=lambda: clock[0]))
+
+    start = time.monotonic()
+    result = city_weather_data.fetch_city_weather_data("Oslo", coordinates=(59.91, 10.75))
+
+    assert time.monotonic() - start < 0.2
+    assert result.temp_c == 4.0 and result.providers == [city_weather_data.WEATHER_API_PROVIDER_NAME]
+    assert city_weather_data.city_weather_data_cache.get((59.91, 10.75)) is result
+    clock[0] += city_weather_data.QUORUM_AGGREGATE_CACHE_TTL_NUM_SECONDS + 1
+    assert city_weather_data.city_weather_data_cache.get((59.91, 10.75)) is None
+
+
+@pytest.mark.parametrize("weather_code, expected_output", [
+    (0, WeatherCondition.CLEAR),
+    (65, WeatherCondition.HEAVY_RAIN),
+    (1234, WeatherCondition.UNRECOGNIZED),
+])
+def test_open_meteo_weather_code_mapping(weather_code, expected_output):
+    """Verifies that OpenMeteo weather codes resolve through the precomputed code table without reading any file."""
+    from unittest import mock
+    from city_weather_data import convert_weather_service_response_to_weather_data
+    from open_meteo import OpenMeteoResponse
+
+    with mock.patch("builtins.open", side_effect=AssertionError("no file access expected")):
+        result = convert_weather_service_response_to_weather_data(
+            OpenMeteoResponse(32.0, 34.0, "2026-01-01T12:00", 20.0, weather_code))
+
+    assert result.weather_condition == [expected_output]
+
+
+def test_fetch_city_weather_data_serves_nearby_coordinates_from_cache(monkeypatch):
+    """A second request for (almost) the same location is served from the aggregated data cache."""
+    import time
+    import city_weather_data
+    from open_meteo import OpenMeteoResponse
+    from weather_api import WeatherApiResponse
+
+    now = int(time.time())
+    fetched_city_names = []
+
+    def fake_fetch_data_weather_api(city_name):
+        fetched_city_names.append(city_name)
+        return WeatherApiResponse("New York", "United States of America", 40.71, -74.01, now, 20.0, "Sunny", 1000)
+
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api", fake_fetch_data_weather_api)
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch",
+                        lambda coordinates_list: [OpenMeteoResponse(lat, lon, None, 20.0, 0) for lat, lon in coordinates_list])
+    city_weather_data.city_weather_data_cache.clear()
+
+    first = city_weather_data.fetch_city_weather_data("New York", coordinates=(40.7128, -74.0060))
+    second = city_weather_data.fetch_city_weather_data("NYC", coordinates=(40.7131, -74.0059))
+
+    assert second is first
+    assert fetched_city_names == ["New York"]
+
+
+def test_city_weather_data_expiry_follows_provider_update_interval():
+    """Cached aggregates expire when the next provider update is due, capped by the stale cutoff."""
+    import time
+    from city_weather_data import get_city_weather_data_expiry_epoch
+    from weather_api import UPDATE_INTERVAL_NUM_SECONDS
+
+    now = int(time.time())
+    weather_data_by_provider = {
+        "WeatherAPI": CityWeatherData(32.0, 34.0, now - 60, 20.0, WeatherCondition.CLEAR),
+        "OpenMeteo": CityWeatherData(32.0, 34.0, now - (STALE_CUTOFF_NUM_SECONDS + 100), 30.0, WeatherCondition.CLEAR),
+    }
+
+    # the stale OpenMeteo data point does not contribute to the aggregate, so it does not shorten its expiry
+    assert get_city_weather_data_expiry_epoch(weather_data_by_provider) == \
+        now - 60 + UPDATE_INTERVAL_NUM_SECONDS
+    assert get_city_weather_data_expiry_epoch({"OpenMeteo": weather_data_by_provider["OpenMeteo"]}) is None
+
+
+def test_fetch_cities_weather_data_batches_open_meteo_and_reports_errors_per_city(monkeypatch, tmp_path):
+    """A batch makes one OpenMeteo request per coordinate-resolution wave and returns errors per city."""
+    import time
+    import city_weather_data
+    from city_weather_data import CityWeatherDataCityNotFoundError
+    from geocode_cache import GeocodeCache
+    from open_meteo import OpenMeteoResponse
+    from weather_api import WeatherApiCityNotFoundError, WeatherApiResponse
+
+    now = int(time.time())
+    coordinates_by_name = {"Paris": (48.87, 2.33), "Rome": (41.9, 12.48), "Oslo": (59.91, 10.75)}
+    open_meteo_batches = []
+
+    def fake_fetch_data_weather_api(city_name):
+        if city_name not in coordinates_by_name:
+            raise WeatherApiCityNotFoundError()
+        return WeatherApiResponse(city_name, "", *coordinates_by_name[city_name], now, 20.0, "Sunny", 1000)
+
+    def fake_fetch_data_open_meteo_batch(coordinates_list):
+        open_meteo_batches.append(coordinates_list)
+        return [OpenMeteoResponse(lat, lon, None, 30.0, 0) for lat, lon in coordinates_list]
+
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api", fake_fetch_data_weather_api)
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch", fake_fetch_data_open_meteo_batch)
+    monkeypatch.setattr(city_weather_data, "geocode_cache", GeocodeCache(None))
+    city_weather_data.city_weather_data_cache.clear()
+
+    results = city_weather_data.fetch_cities_weather_data(["Paris", "Rome", "Oslo", "Atlantis"],
+                                                          {"Paris": (48.87, 2.33), "Rome": (41.9, 12.48)})
+
+    assert open_meteo_batches == [[(48.87, 2.33), (41.9, 12.48)], [(59.91, 10.75)]]
+    assert all(results[city].temp_c == 20.0 for city in ("Paris", "Rome", "Oslo"))
+    assert isinstance(results["Atlantis"], CityWeatherDataCityNotFoundError)
+
+
+def test_weather_api_condition_resolves_by_code_and_counts_unseen_codes():
+    """WeatherAPI conditions resolve by code regardless of their (localized) text; unknown codes fall back to the text."""
+    from city_weather_data import get_weather_condition, unseen_weather_codes, WEATHER_API_PROVIDER_NAME
+
+    assert get_weather_condition(WEATHER_API_PROVIDER_NAME, 1195, "Pluie forte") == WeatherCondition.HEAVY_RAIN
+
+    unseen_weather_codes.clear()
+    assert get_weather_condition(WEATHER_API_PROVIDER_NAME, 9999, "Light drizzle") == WeatherCondition.DRIZZLE
+    assert get_weather_condition(WEATHER_API_PROVIDER_NAME, 9999, None) == WeatherCondition.UNRECOGNIZED
+    assert unseen_weather_codes[(WEATHER_API_PROVIDER_NAME, 9999)] == 2
+
+
+def test_registered_third_provider_is_queried_concurrently(monkeypatch):
+    """A newly registered coordinate-based provider joins the aggregate without adding a round trip."""
+    import time
+    import city_weather_data
+    import provider_registry
+    from open_meteo import OpenMeteoResponse
+    from weather_api import WeatherApiResponse
+
+    now = int(time.time())
+
+    class ThirdProviderResponse:
+        def __init__(self, latitude, longitude):
+            self.latitude = latitude
+            self.longitude = longitude
+
+    def fake_fetch_data_weather_api(city_name):
+        time.sleep(0.2)
+        return WeatherApiResponse(city_name, "Israel", 32.0, 34.0, now, 20.0, "Sunny", 1000)
+
+    def fake_fetch_data_open_meteo_batch(coordinates_list):
+        time.sleep(0.2)
+        return [OpenMeteoResponse(latitude, longitude, None, 30.0, 0) for latitude, longitude in coordinates_list]
+
+    def fake_fetch_third_provider_batch(coordinates_list):
+        time.sleep(0.2)
+        return [ThirdProviderResponse(latitude, longitude) for latitude, longitude in coordinates_list]
+
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api", fake_fetch_data_weather_api)
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch", fake_fetch_data_open_meteo_batch)
+    city_weather_data.city_weather_data_cache.clear()
+
+    provider_registry.register_provider(provider_registry.WeatherProvider(
+        "ThirdProvider", ThirdProviderResponse,
+        lambda response: CityWeatherData(response.latitude, response.longitude, now, 40.0, WeatherCondition.FOG),
+        timeout_num_seconds=1.0, update_interval_num_seconds=600,
+        fetch_by_coordinates_batch=fake_fetch_third_provider_batch))
+    try:
+        start = time.monotonic()
+        result = city_weather_data.fetch_city_weather_data("Tel Aviv", coordinates=(32.0, 34.0))
+        elapsed = time.monotonic() - start
+    finally:
+        provider_registry.unregister_provider("ThirdProvider")
+
+    assert elapsed < 0.35
+    assert result.temp_c == 30.0
+    assert set(result.weather_condition) == {WeatherCondition.CLEAR, WeatherCondition.FOG}
+
+
+def test_expired_aggregate_is_served_stale_while_revalidating(monkeypatch):
+    """An expired cached aggregate is returned right away, marked as stale, and refreshed in the background."""
+    import time
+    import city_weather_data
+    from open_meteo import OpenMeteoResponse
+    from weather_api import WeatherApiResponse
+
+    now = int(time.time())
+
+    def fake_fetch_data_weather_api(city_name):
+        time.sleep(0.2)
+        return WeatherApiResponse(city_name, "Israel", 32.0, 34.0, now, 25.0, "Sunny", 1000)
+
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api", fake_fetch_data_weather_api)
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch",
+                        lambda coordinates_list: [OpenMeteoResponse(lat, lon, None, 0.0, 0) for lat, lon in coordinates_list])
+    monkeypatch.setattr(city_weather_data, "STALE_WHILE_REVALIDATE", True)
+    city_weather_data.city_weather_data_cache.clear()
+
+    location_key = city_weather_data.get_location_key(32.0, 34.0)
+    city_weather_data.city_weather_data_cache.put(
+        location_key, CityWeatherData(32.0, 34.0, now - 3600, 20.0, WeatherCondition.CLEAR),
+        expires_at_epoch=now - 1, stale_until_epoch=now + 3600)
+
+    start = time.monotonic()
+    result = city_weather_data.fetch_city_weather_data("Tel Aviv", coordinates=(32.0, 34.0))
+
+    assert time.monotonic() - start < 0.1
+    assert result.is_stale and result.temp_c == 20.0
+    assert '"stale": true' in result.to_json()
+
+    deadline = time.monotonic() + 2.0
+    while city_weather_data.city_weather_data_cache.get(location_key) is None and time.monotonic() < deadline:
+        time.sleep(0.02)
+    refreshed = city_weather_data.fetch_city_weather_data("Tel Aviv", coordinates=(32.0, 34.0))
+    assert not refreshed.is_stale and refreshed.temp_c == 25.0
+
+
+def test_open_primary_circuit_fails_fast_without_calling_the_provider(monkeypatch):
+    """Once WeatherAPI's circuit is open, requests fail with a request error without reaching WeatherAPI."""
+    import city_weather_data
+    import provider_registry
+    from city_weather_data import CityWeatherDataRequestError
+    from open_meteo import OpenMeteoResponse
+    from weather_api import WeatherApiRequestError
+
+    calls = []
+
+    def failing_fetch_data_weather_api(city_name):
+        calls.append(city_name)
+        raise WeatherApiRequestError(None)
+
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api", failing_fetch_data_weather_api)
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch",
+                        lambda coordinates_list: [OpenMeteoResponse(lat, lon, None, 0.0, 0) for lat, lon in coordinates_list])
+    city_weather_data.city_weather_data_cache.clear()
+    circuit_breaker = provider_registry.get_primary_provider().circuit_breaker
+    circuit_breaker.reset()
+
+    try:
+        for _ in range(provider_registry.CIRCUIT_FAILURE_THRESHOLD + 2):
+            with pytest.raises(CityWeatherDataRequestError):
+                city_weather_data.fetch_city_weather_data("Nowhere", coordinates=(1.0, 1.0))
+    finally:
+        circuit_breaker.reset()
+
+    assert len(calls) == provider_registry.CIRCUIT_FAILURE_THRESHOLD
+
+
+def test_concurrent_fetches_of_a_city_share_a_single_upstream_fan_out(monkeypatch):
+    """Concurrent requests for the same city, under any spelling, make one provider call and all get its outcome."""
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    import city_weather_data
+    from city_weather_data import CityWeatherDataCityNotFoundError
+    from geocode_cache import GeocodeCache
+    from open_meteo import OpenMeteoResponse
+    from weather_api import WeatherApiCityNotFoundError, WeatherApiResponse
+
+    now = int(time.time())
+    weather_api_calls = []
+    all_requests_started = threading.Barrier(8)
+
+    def slow_fetch_data_weather_api(city_name):
+        weather_api_calls.append(city_name)
+        time.sleep(0.2)
+        if city_name.lower() == "atlantis":
+            raise WeatherApiCityNotFoundError()
+        return WeatherApiResponse("Lisbon", "Portugal", 38.72, -9.14, now, 18.0, "Sunny", 1000)
+
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api", slow_fetch_data_weather_api)
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch",
+                        lambda coordinates_list: [OpenMeteoResponse(lat, lon, None, 20.0, 0) for lat, lon in coordinates_list])
+    monkeypatch.setattr(city_weather_data, "geocode_cache", GeocodeCache(None))
+    monkeypatch.setattr(city_weather_data, "SINGLE_FLIGHT_ENABLED", True)
+    city_weather_data.city_weather_data_cache.clear()
+
+    def fetch(city_name):
+        all_requests_started.wait()
+        return city_weather_data.fetch_cities_weather_data([city_name])[city_name]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(fetch, ["Lisbon", "lisbon ", "LISBON", "Lisbon"] + ["Atlantis", "atlantis"] * 2))
+
+    assert sorted(city_name.strip().lower() for city_name in weather_api_calls) == ["atlantis", "lisbon"]
+    assert all(result.temp_c == 18.0 for result in results[:4])
+    assert all(isinstance(result, CityWeatherDataCityNotFoundError) for result in results[4:])
+    assert len(city_weather_data.city_fetch_flights) == 0
+
+
+def test_location_queries_are_served_by_the_nearest_known_city(monkeypatch):
+    """A location is resolved by WeatherAPI once, after which locations nearby share that city's cached aggregate."""
+    import time
+    import city_weather_data
+    from geocode_cache import GeocodeCache
+    from open_meteo import OpenMeteoResponse
+    from weather_api import WeatherApiResponse
+
+    now = int(time.time())
+    fetched_city_names = []
+
+    def fake_fetch_data_weather_api(city_name):
+        fetched_city_names.append(city_name)
+        return WeatherApiResponse("Haifa", "Israel", 32.82, 34.99, now, 22.0, "Sunny", 1000)
+
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api", fake_fetch_data_weather_api)
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch",
+                        lambda coordinates_list: [OpenMeteoResponse(lat, lon, None, 20.0, 0) for lat, lon in coordinates_list])
+    monkeypatch.setattr(city_weather_data, "geocode_cache", GeocodeCache(None))
+    city_weather_data.city_weather_data_cache.clear()
+
+    first_entry, first = city_weather_data.fetch_location_weather_data(32.8, 35.0)
+    second_entry, second = city_weather_data.fetch_location_weather_data(32.83, 34.97)
+
+    assert fetched_city_names == ["32.8000,35.0000"]
+    assert first_entry.city_name == second_entry.city_name == "Haifa"
+    assert second.to_dict() == first.to_dict() and first.temp_c == 22.0
+
+
+def test_single_flight_waiter_times_out_with_a_request_error(monkeypatch):
+    """A call joining a fetch in flight that outlives its deadline gets a request error caused by the timeout."""
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    import city_weather_data
+    import fetch_engine
+    from city_weather_data import CityWeatherDataRequestError
+    from geocode_cache import GeocodeCache
+    from open_meteo import OpenMeteoResponse
+    from weather_api import WeatherApiResponse
+
+    now = int(time.time())
+    leader_started = threading.Event()
+
+    def slow_fetch_data_weather_api(city_name):
+        leader_started.set()
+        time.sleep(0.5)
+        return WeatherApiResponse("Lisbon", "Portugal", 38.72, -9.14, now, 18.0, "Sunny", 1000)
+
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api", slow_fetch_data_weather_api)
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch",
+                        lambda coordinates_list: [OpenMeteoResponse(lat, lon, None, 20.0, 0) for lat, lon in coordinates_list])
+    monkeypatch.setattr(city_weather_data, "geocode_cache", GeocodeCache(None))
+    monkeypatch.setattr(city_weather_data, "SINGLE_FLIGHT_ENABLED", True)
+    city_weather_data.city_weather_data_cache.clear()
+
+    def fetch_with_short_deadline():
+        token = fetch_engine.set_invocation_deadline(0.1)
+        try:
+            return city_weather_data.fetch_cities_weather_data(["Lisbon"])["Lisbon"]
+        finally:
+            fetch_engine.reset_invocation_deadline(token)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        leader = executor.submit(city_weather_data.fetch_cities_weather_data, ["Lisbon"])
+        assert leader_started.wait(1)
+        result = fetch_with_short_deadline()
+
+        assert isinstance(result, CityWeatherDataRequestError)
+        assert isinstance(result.weather_service_error, fetch_engine.ProviderTimeoutError)
+        assert leader.result()["Lisbon"].temp_c == 18.0
@@ -0,0 +1,138 @@
+"""Unit tests for the concurrent provider fetch engine.
+
+These tests validate that provider calls submitted to the shared pool run in
+parallel, that each provider is bounded by its own timeout, and that a slow
+provider does not prevent the results of faster providers from being returned.
+"""
+
+import time
+from fetch_engine import ProviderTimeoutError, gather_provider_results, submit_provider_fetch
+
+
+def sleep_and_return(num_seconds, value):
+    time.sleep(num_seconds)
+    return value
+
+
+def raise_value_error():
+    raise ValueError("provider failure")
+
+
+def test_provider_fetches_run_concurrently():
+    """Two providers that each take 0.2s should complete in well under 0.4s combined."""
+    start = time.monotonic()
+    results = gather_provider_results({
+        "a": (submit_provider_fetch(sleep_and_return, 0.2, "A"), 1.0),
+        "b": (submit_provider_fetch(sleep_and_return, 0.2, "B"), 1.0),
+    })
+
+    assert results == {"a": "A", "b": "B"}
+    assert time.monotonic() - start < 0.35
+
+
+def test_slow_provider_times_out_without_holding_up_others():
+    """A provider exceeding its own timeout is reported as ProviderTimeoutError while the fast one succeeds."""
+    start = time.monotonic()
+    results = gather_provider_results({
+        "fast": (submit_provider_fetch(sleep_and_return, 0.01, "fast"), 1.0),
+        "slow": (submit_provider_fetch(sleep_and_return, 1.0, "slow"), 0.1),
+    })
+
+    assert results["fast"] == "fast"
+    assert isinstance(results["slow"], ProviderTimeoutError)
+    assert time.monotonic() - start < 0.5
+
+
+def test_provider_errors_are_returned_not_raised():
+    """An exception raised by a provider is returned as that provider's result."""
+    results = gather_provider_results({"broken": (submit_provider_fetch(raise_value_error), 1.0)})
+
+    assert isinstance(results["broken"], ValueError)
+
+
+def test_hedged_fetch_returns_the_first_successful_attempt():
+    """A call still in flight past its hedge delay is duplicated, and the faster duplicate's result wins."""
+    from fetch_engine import LatencyTracker, submit_hedged_provider_fetch
+
+    attempt_delays = iter([1.0, 0.01])
+    latency_tracker = LatencyTracker(min_samples=1)
+
+    start = time.monotonic()
+    future = submit_hedged_provider_fetch(lambda: sleep_and_return(next(attempt_delays), "hedged"),
+                                          hedge_after_num_seconds=0.05, latency_tracker=latency_tracker)
+
+    assert future.result(timeout=0.5) == "hedged"
+    assert time.monotonic() - start < 0.5
+    assert latency_tracker.percentile(95) < 0.5
+
+
+def test_hedges_in_flight_are_capped_until_their_losing_attempts_finish(monkeypatch):
+    """A losing attempt cannot be cancelled once running, so it keeps its hedge slot until it finishes."""
+    import threading
+    import fetch_engine
+
+    hedge_slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(fetch_engine, "_hedge_slots", hedge_slots)
+    num_calls = {"a": 0, "b": 0}
+    first_attempt_delays = {"a": 0.3, "b": 0.2}
+
+    def fetch(name):
+        num_calls[name] += 1
+        return sleep_and_return(first_attempt_delays[name] if num_calls[name] == 1 else 0.01, name)
+
+    first = fetch_engine.submit_hedged_provider_fetch(fetch, "a", hedge_after_num_seconds=0.05)
+    time.sleep(0.02)
+    second = fetch_engine.submit_hedged_provider_fetch(fetch, "b", hedge_after_num_seconds=0.05)
+
+    assert first.result(timeout=0.2) == "a"
+    assert second.result(timeout=0.5) == "b"
+    # only the first call was hedged, and its slot is released once its losing attempt has finished
+    assert num_calls == {"a": 2, "b": 1}
+    assert not hedge_slots.acquire(blocking=False)
+    time.sleep(0.3)
+    assert hedge_slots.acquire(blocking=False)
+
+
+def test_hedged_fetch_fails_fast_before_the_hedge_fires():
+    """A call failing before its hedge delay is not retried by the hedge."""
+    from fetch_engine import submit_hedged_provider_fetch
+
+    future = submit_hedged_provider_fetch(raise_value_error, hedge_after_num_seconds=10.0)
+
+    assert isinstance(future.exception(timeout=0.5), ValueError)
+
+
+def test_latency_tracker_reports_percentiles_once_it_has_enough_samples():
+    """Percentiles are withheld until min_samples latencies were recorded, and only the window is kept."""
+    from fetch_engine import LatencyTracker
+
+    latency_tracker = LatencyTracker(window_size=100, min_samples=10)
+    for latency in range(9):
+        latency_tracker.record(latency)
+    assert latency_tracker.percentile(95) is None
+
+    for latency in range(200):
+        latency_tracker.record(latency)
+    assert latency_tracker.percentile(95) == 195
+
+
+def test_gathering_ends_once_the_results_are_complete_or_the_invocation_deadline_passes():
+    """Calls still pending are skipped once is_complete is satisfied, and time out at the invocation's deadline."""
+    from fetch_engine import ProviderSkippedError, reset_invocation_deadline, set_invocation_deadline
+
+    start = time.monotonic()
+    results = gather_provider_results({
+        "fast": (submit_provider_fetch(sleep_and_return, 0.01, "fast"), 1.0),
+        "slow": (submit_provider_fetch(sleep_and_return, 0.3, "slow"), 1.0),
+    }, is_complete=lambda name, result: name == "fast")
+
+    assert results["fast"] == "fast" and isinstance(results["slow"], ProviderSkippedError)
+    assert time.monotonic() - start < 0.2
+
+    token = set_invocation_deadline(0.1)
+    try:
+        results = gather_provider_results({"slow": (submit_provider_fetch(sleep_and_return, 0.3, "slow"), 1.0)})
+    finally:
+        reset_invocation_deadline(token)
+
+    assert isinstance(results["slow"], ProviderTimeoutError) and results["slow"].timeout_num_seconds <= 0.1
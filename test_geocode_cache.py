@@ -0,0 +1,91 @@
+"""Unit tests for the city geocode cache.
+
+These tests validate city name normalization, that entries are shared between
+the requested and canonical city names, and that a new cache instance (as in a
+cold container) bootstraps its entries from the on-disk tier.
+"""
+
+import pytest
+from geocode_cache import GeocodeCache, normalize_city_name
+from weather_api import WeatherApiResponse
+
+
+@pytest.mark.parametrize("city_name, expected_output", [
+    ("New York", "new york"),
+    ("  new   YORK ", "new york"),
+    ("Zürich", "zurich"),
+    ("São Paulo", "sao paulo"),
+])
+def test_normalize_city_name(city_name, expected_output):
+    """Verifies that case, accents and whitespace differences normalize to the same key."""
+    assert normalize_city_name(city_name) == expected_output
+
+
+def test_entry_is_shared_by_requested_and_canonical_names(tmp_path):
+    """A city resolved through an alias is also found under WeatherAPI's canonical name."""
+    cache = GeocodeCache(str(tmp_path / "geocode_cache.json"))
+    cache.put("NYC", WeatherApiResponse("New York", "United States of America", 40.71, -74.01, 0, 20.0, "Sunny", 1000))
+
+    assert cache.get("nyc").coordinates == (40.71, -74.01)
+    assert cache.get("NEW YORK").country_name == "United States of America"
+    assert cache.get("Boston") is None
+
+
+def test_new_cache_instance_bootstraps_from_disk(tmp_path):
+    """Entries written by one container are read by a new cache instance backed by the same file."""
+    path = str(tmp_path / "geocode_cache.json")
+    GeocodeCache(path).put("Tel Aviv", WeatherApiResponse("Tel Aviv-Yafo", "Israel", 32.07, 34.76, 0, 25.0, "Sunny", 1000))
+
+    cold_cache = GeocodeCache(path)
+
+    assert cold_cache.get("tel aviv").coordinates == (32.07, 34.76)
+    assert cold_cache.get("Tel Aviv-Yafo").city_name == "Tel Aviv-Yafo"
+
+
+def test_nearest_city_is_found_by_location(tmp_path):
+    """Resolved cities are indexed by location, also when bootstrapped from disk by a new cache instance."""
+    path = str(tmp_path / "geocode_cache.json")
+    GeocodeCache(path).put("Tel Aviv", WeatherApiResponse("Tel Aviv-Yafo", "Israel", 32.07, 34.76, 0, 25.0, "Sunny", 1000))
+
+    cold_cache = GeocodeCache(path)
+    entry, distance_km = cold_cache.nearest(32.08, 34.78, 5.0)
+
+    assert entry.city_name == "Tel Aviv-Yafo" and distance_km < 5.0
+    assert cold_cache.nearest(31.77, 35.21, 5.0) is None
+
+
+def test_new_entries_are_appended_to_the_on_disk_tier(tmp_path):
+    """Each new entry appends one line, and a line cut short by a crashed writer does not lose the others."""
+    path = tmp_path / "geocode_cache.json"
+    # a file written as a single JSON object reads as a one-line log
+    path.write_text('{"rome": {"city_name": "Rome", "country_name": "Italy", "latitude": 41.9, "longitude": 12.48}}\n')
+    cache = GeocodeCache(str(path))
+    cache.put("Paris", WeatherApiResponse("Paris", "France", 48.87, 2.33, 0, 20.0, "Sunny", 1000))
+    cache.put("Oslo", WeatherApiResponse("Oslo", "Norway", 59.91, 10.75, 0, 5.0, "Sunny", 1000))
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 3 and lines[0].startswith('{"rome"')
+
+    with open(path, "a") as f:
+        f.write('{"lima": {"city_name": "Li')
+    cold_cache = GeocodeCache(str(path))
+
+    assert [cold_cache.get(city).city_name for city in ("rome", "paris", "oslo")] == ["Rome", "Paris", "Oslo"]
+    assert cold_cache.get("lima") is None
+
+    cold_cache.put("Lima", WeatherApiResponse("Lima", "Peru", -12.04, -77.03, 0, 18.0, "Sunny", 1000))
+    assert GeocodeCache(str(path)).get("lima").country_name == "Peru"
+
+
+def test_canonical_name_of_another_city_is_not_repointed(tmp_path):
+    """Resolving 'Paris, TX' to the canonical name 'Paris' keeps 'Paris' pointing at the city cached first."""
+    cache = GeocodeCache(str(tmp_path / "geocode_cache.json"))
+    cache.put("Paris", WeatherApiResponse("Paris", "France", 48.87, 2.33, 0, 20.0, "Sunny", 1000))
+    cache.put("Paris, TX", WeatherApiResponse("Paris", "United States of America", 33.66, -95.56, 0, 25.0, "Sunny", 1000))
+
+    assert cache.get("paris").country_name == "France"
+    assert cache.get("paris, tx").country_name == "United States of America"
+    assert GeocodeCache(cache.path).get("paris").country_name == "France"
+    # the same city resolved through another alias still shares the canonical name
+    cache.put("Paname", WeatherApiResponse("Paris", "France", 48.87, 2.33, 0, 20.0, "Sunny", 1000))
+    assert cache.get("paname") is cache.get("paris")
@@ -0,0 +1,114 @@
+"""Unit tests for the pooled HTTP session module.
+
+These tests validate that provider settings can be overridden from the
+environment, that a provider's session is shared across calls, that
+requests made through it are bounded by the configured read timeout, and
+that transient failures of a flaky upstream (benchmarks.stub_providers) are
+retried within the request's deadline.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import fetch_engine
+import http_session
+import open_meteo
+import weather_api
+from benchmarks.stub_providers import RESET_CONNECTION, StubProviderServer
+from http_session import HttpSessionConfig
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(0.5)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_config_environment_overrides(monkeypatch):
+    """'<NAME>_<SETTING>' environment variables take precedence over the declared defaults."""
+    monkeypatch.setenv("TEST_PROVIDER_READ_TIMEOUT_NUM_SECONDS", "7.5")
+    monkeypatch.setenv("TEST_PROVIDER_POOL_MAXSIZE", "32")
+
+    config = HttpSessionConfig("TEST_PROVIDER", connect_timeout_num_seconds=1.0, read_timeout_num_seconds=2.0)
+
+    assert config.timeout == (1.0, 7.5)
+    assert config.pool_maxsize == 32
+    assert config.total_timeout_num_seconds == 8.5
+
+
+def test_session_is_shared_per_provider():
+    """The same pooled session is returned on every call for a provider, and a distinct one per provider."""
+    config_a = HttpSessionConfig("TEST_A", 1.0, 1.0)
+    config_b = HttpSessionConfig("TEST_B", 1.0, 1.0)
+
+    assert http_session.get_session(config_a) is http_session.get_session(config_a)
+    assert http_session.get_session(config_a) is not http_session.get_session(config_b)
+
+
+def test_session_get_enforces_read_timeout():
+    """A hung upstream raises a requests timeout instead of blocking for the whole invocation."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config = HttpSessionConfig("TEST_SLOW", connect_timeout_num_seconds=1.0, read_timeout_num_seconds=0.1,
+                               max_attempts=1)
+
+    try:
+        with pytest.raises(requests.exceptions.Timeout):
+            http_session.session_get(config, f"http://127.0.0.1:{server.server_address[1]}/")
+    finally:
+        server.shutdown()
+
+
+@pytest.fixture
+def flaky_stub_server(monkeypatch):
+    """A local provider stand-in with a small latency, into which tests inject failures."""
+    with StubProviderServer(open_meteo_latency_num_seconds=0.15) as server:
+        monkeypatch.setattr(weather_api, "WEATHER_API_ENDPOINT", server.weather_api_endpoint)
+        monkeypatch.setattr(open_meteo, "OPEN_METEO_ENDPOINT", server.open_meteo_endpoint)
+        yield server
+
+
+def test_transient_failures_are_retried(flaky_stub_server):
+    """A 503 and a connection reset are retried, and the third attempt's response is returned."""
+    flaky_stub_server.fail_next_requests("WeatherAPI", 503, RESET_CONNECTION)
+
+    response = weather_api.fetch_data_weather_api("Tel Aviv")
+
+    assert response.city_name == "Tel Aviv-Yafo"
+    assert flaky_stub_server.request_counts["WeatherAPI"] == 3
+
+
+def test_permanent_failures_are_not_retried(flaky_stub_server):
+    """An unknown city (HTTP 400) is not retried, and a provider failing every attempt gives up after max_attempts."""
+    with pytest.raises(weather_api.WeatherApiCityNotFoundError):
+        weather_api.fetch_data_weather_api("Atlantis")
+    assert flaky_stub_server.request_counts["WeatherAPI"] == 1
+
+    flaky_stub_server.fail_next_requests("WeatherAPI", *[502] * 10)
+    with pytest.raises(weather_api.WeatherApiRequestError):
+        weather_api.fetch_data_weather_api("Tel Aviv")
+    assert flaky_stub_server.request_counts["WeatherAPI"] == 1 + weather_api.SESSION_CONFIG.max_attempts
+
+
+def test_retries_never_outlive_the_invocation_deadline(flaky_stub_server):
+    """No retry is attempted when the invocation's deadline leaves no time for it."""
+    flaky_stub_server.fail_next_requests("OpenMeteo", 503, 503)
+
+    token = fetch_engine.set_invocation_deadline(0.3)
+    start = time.monotonic()
+    try:
+        with pytest.raises(open_meteo.OpenMeteoRequestError):
+            open_meteo.fetch_data_open_meteo_batch([(51.52, -0.11)])
+    finally:
+        fetch_engine.reset_invocation_deadline(token)
+
+    assert time.monotonic() - start < 0.3
+    assert flaky_stub_server.request_counts["OpenMeteo"] == 1
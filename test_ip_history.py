@@ -0,0 +1,193 @@
+"""Unit tests for the per-IP request history, run against the local DynamoDB stand-in.
+
+These tests validate that a single update returns the previous history, that
+the recent cities list stays bounded, and that the write-behind writer runs
+updates in the background and retries failed writes.
+"""
+
+import contextvars
+import time
+
+import pytest
+
+pytest.importorskip("botocore")
+
+import ip_history  # noqa: E402
+from local_dynamodb import LocalDynamoDBTable  # noqa: E402
+
+
+@pytest.fixture
+def ip_table():
+    table = LocalDynamoDBTable("ip")
+    ip_history.set_ip_table(table)
+    yield table
+    ip_history.set_ip_table(None)
+
+
+def test_update_returns_previous_values_in_a_single_round_trip(ip_table):
+    """The second update reports the timestamp and cities written by the first one."""
+    assert ip_history.update_ip_fields_in_db("1.2.3.4", 1000, "London") == (None, [], True)
+    assert ip_history.update_ip_fields_in_db("1.2.3.4", 2000, ["Paris", "Rome"]) == (1000, ["London"], True)
+    assert ip_table.call_counts == {"update_item": 2}
+
+
+def test_recent_cities_stay_bounded(ip_table):
+    """The stored list never exceeds RECENT_CITIES_CAPACITY and responses never exceed RECENT_CITIES_MAX_LEN."""
+    num_requests = 3 * ip_history.RECENT_CITIES_CAPACITY
+    for i in range(num_requests):
+        _, recent_cities, success = ip_history.update_ip_fields_in_db("1.2.3.4", i, f"city-{i}")
+        assert success
+        assert len(recent_cities) <= ip_history.RECENT_CITIES_MAX_LEN
+
+    stored_cities = ip_table.get_item(Key={"ip": "1.2.3.4"})["Item"]["recent_cities"]
+    assert len(stored_cities) <= ip_history.RECENT_CITIES_CAPACITY
+    assert stored_cities[0] == f"city-{num_requests - 1}"
+    assert recent_cities[0] == f"city-{num_requests - 2}"
+    # one truncating write per RECENT_CITIES_CAPACITY - RECENT_CITIES_MAX_LEN requests
+    assert ip_table.call_counts["update_item"] < num_requests * 1.2
+
+
+def test_writer_runs_updates_in_the_background(ip_table):
+    """Submitting an update returns immediately, and flush waits for it to complete."""
+    ip_table.latency_num_seconds = 0.2
+    writer = ip_history.IpHistoryWriter()
+
+    start = time.monotonic()
+    future = writer.submit("1.2.3.4", 1000, "London")
+    assert time.monotonic() - start < 0.1
+
+    assert writer.flush()
+    assert future.done()
+    assert future.result() == (None, [], True)
+
+
+def test_flush_only_waits_for_the_current_invocations_writes(ip_table, monkeypatch):
+    """An invocation served concurrently with another one does not wait for the other's slow write."""
+    original_update_item = ip_table.update_item
+
+    def update_item(**kwargs):
+        if kwargs["Key"]["ip"] == "5.6.7.8":
+            time.sleep(0.5)
+        return original_update_item(**kwargs)
+
+    monkeypatch.setattr(ip_table, "update_item", update_item)
+    writer = ip_history.IpHistoryWriter()
+
+    def invocation(ip):
+        token = writer.start_invocation()
+        writer.submit(ip, 1000, "London")
+        start = time.monotonic()
+        assert writer.flush()
+        writer.end_invocation(token)
+        return time.monotonic() - start
+
+    slow_invocation = contextvars.copy_context()
+    slow_token = slow_invocation.run(writer.start_invocation)
+    slow_invocation.run(writer.submit, "5.6.7.8", 1000, "Paris")
+
+    assert contextvars.copy_context().run(invocation, "1.2.3.4") < 0.3
+    assert slow_invocation.run(writer.flush)
+    slow_invocation.run(writer.end_invocation, slow_token)
+
+
+def test_writer_retries_failed_writes(ip_table, monkeypatch):
+    """A write that fails once is retried and succeeds."""
+    original_update_item = ip_table.update_item
+    calls = []
+
+    def flaky_update_item(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise ConnectionError("connection reset")
+        return original_update_item(**kwargs)
+
+    monkeypatch.setattr(ip_table, "update_item", flaky_update_item)
+
+    assert ip_history.IpHistoryWriter().submit("1.2.3.4", 1000, "London").result() == (None, [], True)
+    assert len(calls) == 2
+
+
+def test_repeat_ips_are_answered_from_the_ip_record_cache(ip_table):
+    """Once an IP's update completed, its next requests get their history without awaiting DynamoDB."""
+    writer = ip_history.IpHistoryWriter()
+    assert writer.submit("1.2.3.4", 1000, "London").result() == (None, [], True)
+
+    ip_table.latency_num_seconds = 0.2
+    # as in consecutive invocations, each of which flushes its update before ending
+    second = writer.submit("1.2.3.4", 2000, "Paris")
+    assert second.done() and second.result() == (1000, ["London"], True)
+    assert writer.flush()
+    third = writer.submit("1.2.3.4", 3000, ["Rome", "Oslo"])
+    assert third.done() and third.result() == (2000, ["Paris", "London"], True)
+    assert writer.flush()
+    assert ip_history.ip_record_cache.get("1.2.3.4")[:2] == (3000, ["Rome", "Oslo", "Paris", "London"])
+    # the cached record agrees with the table the writes went to
+    assert ip_history.update_ip_fields_in_db("1.2.3.4", 4000, "Lima") == (3000, ["Rome", "Oslo", "Paris", "London"], True)
+
+
+def test_invocations_of_cached_ips_do_not_wait_for_their_update(ip_table):
+    """Only an invocation whose IP missed the ip_record_cache waits for its update when flushing."""
+    writer = ip_history.IpHistoryWriter()
+    ip_table.latency_num_seconds = 0.3
+
+    def invocation(last_access_timestamp, city):
+        token = writer.start_invocation()
+        start = time.monotonic()
+        result = writer.submit("1.2.3.4", last_access_timestamp, city).result()
+        assert writer.flush()
+        writer.end_invocation(token)
+        return result, time.monotonic() - start
+
+    result, duration = invocation(1000, "London")
+    assert result == (None, [], True) and duration >= 0.3
+    result, duration = invocation(2000, "Paris")
+    assert result == (1000, ["London"], True) and duration < 0.1
+
+    assert writer.flush()
+    assert ip_table.get_item(Key={"ip": "1.2.3.4"})["Item"]["recent_cities"] == ["Paris", "London"]
+
+
+def test_full_recent_cities_are_truncated_from_the_raw_error_item(monkeypatch):
+    """The item of a failed condition arrives in AttributeValue format from a real Table resource, and is deserialized."""
+    import boto3
+    from botocore.stub import ANY, Stubber
+
+    table = boto3.resource("dynamodb", region_name="us-east-1", aws_access_key_id="test",
+                           aws_secret_access_key="test").Table(ip_history.IP_TABLE_NAME)
+    full_cities = [f"city-{i}" for i in range(ip_history.RECENT_CITIES_CAPACITY)]
+    with Stubber(table.meta.client) as stubber:
+        stubber.add_client_error(
+            "update_item", service_error_code="ConditionalCheckFailedException", http_status_code=400,
+            modeled_fields={"Item": {"ip": {"S": "1.2.3.4"}, "LastAccessTimestamp": {"N": "1000"},
+                                     "recent_cities": {"L": [{"S": city} for city in full_cities]}}})
+        stubber.add_response("update_item", {}, {
+            "TableName": ip_history.IP_TABLE_NAME, "Key": {"ip": "1.2.3.4"},
+            "UpdateExpression": ANY, "ConditionExpression": "LastAccessTimestamp = :old_t",
+            "ExpressionAttributeValues": {":t": 2000, ":old_t": 1000,
+                                          ":c": ["London"] + full_cities[:ip_history.RECENT_CITIES_MAX_LEN - 1]}})
+        monkeypatch.setattr(ip_history, "_ip_table", table)
+
+        assert ip_history.update_ip_fields_in_db("1.2.3.4", 2000, "London") == \
+            (1000, full_cities[:ip_history.RECENT_CITIES_MAX_LEN], True)
+        stubber.assert_no_pending_responses()
+
+
+def test_first_batch_is_capped(ip_table):
+    """A batch larger than RECENT_CITIES_CAPACITY written to an IP without history is capped too."""
+    cities = [f"city-{i}" for i in range(2 * ip_history.RECENT_CITIES_CAPACITY)]
+
+    assert ip_history.update_ip_fields_in_db("1.2.3.4", 1000, cities) == (None, [], True)
+    assert ip_table.get_item(Key={"ip": "1.2.3.4"})["Item"]["recent_cities"] == \
+        cities[:ip_history.RECENT_CITIES_CAPACITY]
+
+
+def test_earlier_update_never_replaces_the_record_of_a_later_one_in_the_same_second(ip_table):
+    """The write of an earlier request completing late keeps the cities of a later request with the same timestamp."""
+    later_record = ip_history.get_updated_ip_record(2000, ["Rome"], ["Paris", "London"], sequence=2)
+    ip_history.put_ip_record("1.2.3.4", later_record)
+
+    ip_history.put_ip_record("1.2.3.4", ip_history.get_updated_ip_record(2000, ["Paris"], ["London"], sequence=1))
+    assert ip_history.ip_record_cache.get("1.2.3.4") == later_record
+
+    ip_history.put_ip_record("1.2.3.4", ip_history.get_updated_ip_record(2000, ["Rome"], ["Paris", "Lima"], sequence=2))
+    assert ip_history.ip_record_cache.get("1.2.3.4")[1] == ["Rome", "Paris", "Lima"]
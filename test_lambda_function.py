@@ -0,0 +1,120 @@
+"""Unit tests for the Lambda handler's request validation.
+
+These tests validate that requests failing validation are answered with a
+400 response without importing the heavy provider and AWS modules, that
+batch requests and coordinates are bounded, and that responses without the per-IP history
+are cacheable.
+"""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+import lambda_function
+
+
+class FakeContext:
+    aws_request_id = "test-request-id"
+
+
+def test_invalid_requests_do_not_import_heavy_modules():
+    """A request without a city is rejected in a fresh interpreter without importing requests or boto3."""
+    script = (
+        "import sys, lambda_function\n"
+        "class Context:\n"
+        "    aws_request_id = 'id'\n"
+        "response = lambda_function.lambda_handler({}, Context())\n"
+        "assert response['statusCode'] == 400, response\n"
+        "heavy_modules = [m for m in ('requests', 'boto3', 'botocore', 'city_weather_data') if m in sys.modules]\n"
+        "assert not heavy_modules, heavy_modules\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_batch_request_with_too_many_cities_is_rejected():
+    """Batch requests above MAX_BATCH_CITIES are answered with a 400 response."""
+    cities = ",".join(f"city-{i}" for i in range(lambda_function.MAX_BATCH_CITIES + 1))
+
+    response = lambda_function.lambda_handler({"queryStringParameters": {"cities": cities}}, FakeContext())
+
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["error"] == "Bad Request"
+
+
+@pytest.mark.parametrize("body", ["[]", '"abc"', "42", "{not json"])
+def test_batch_request_body_that_is_not_a_json_object_is_rejected(body):
+    """POST bodies that are not JSON objects are answered with a 400 response instead of raising."""
+    event = {"body": body, "requestContext": {"http": {"method": "POST", "sourceIp": "10.0.0.1"}}}
+
+    response = lambda_function.lambda_handler(event, FakeContext())
+
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["message"] == "The 'cities' parameter is invalid."
+
+
+@pytest.mark.parametrize("query", [{"lat": "32.1"}, {"lat": "north", "lon": "34.8"}, {"lat": "91", "lon": "0"},
+                                   {"lat": "nan", "lon": "0"}])
+def test_invalid_coordinates_are_rejected(query):
+    """Coordinate queries missing a coordinate or out of range are answered with a 400 response."""
+    response = lambda_function.lambda_handler({"queryStringParameters": query}, FakeContext())
+
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["message"] == "The 'lat' and 'lon' parameters are invalid."
+
+
+def test_weather_data_is_embedded_in_the_response_body_as_an_object():
+    """Weather data is serialized once with the rest of the body, so clients parse the response a single time."""
+    from city_weather_data import CityWeatherData, WeatherCondition
+
+    weather_data = CityWeatherData(51.5, -0.13, 1_700_000_000, 12.345, [WeatherCondition.CLEAR, WeatherCondition.MIST])
+
+    response = lambda_function.get_response(200, FakeContext(), city="London", weather=weather_data.to_dict())
+
+    assert json.loads(response["body"])["weather"] == {
+        "latitude": 51.5, "longitude": -0.13, "last_update": "2023-11-14T22:13:20+00:00",
+        "temp_c": "12.35", "weather_condition": "Clear or Mist", "providers": [], "stale": False,
+    }
+
+
+def test_responses_without_history_are_cacheable_and_revalidated_with_etags(monkeypatch):
+    """Without the IP history, a response carries an ETag and a max-age, and a matching If-None-Match gets a 304."""
+    pytest.importorskip("botocore")
+    import time
+    import city_weather_data
+    import ip_history
+    from local_dynamodb import LocalDynamoDBTable
+    from open_meteo import OpenMeteoResponse
+    from weather_api import WeatherApiResponse
+
+    now = int(time.time())
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api",
+                        lambda city_name: WeatherApiResponse(city_name, "", 52.52, 13.4, now, 9.0, "Sunny", 1000))
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch",
+                        lambda coordinates: [OpenMeteoResponse(lat, lon, None, 11.0, 0) for lat, lon in coordinates])
+    ip_history.set_ip_table(LocalDynamoDBTable("ip"))
+    city_weather_data.city_weather_data_cache.clear()
+
+    def get(query, headers=None):
+        return lambda_function.lambda_handler({"queryStringParameters": query, "headers": headers or {},
+                                               "requestContext": {"http": {"sourceIp": "10.9.8.7"}}}, FakeContext())
+
+    try:
+        response = get({"city": "Berlin", "history": "false"})
+        etag = response["headers"]["ETag"]
+        assert response["statusCode"] == 200 and "recent_cities" not in json.loads(response["body"])
+        assert 0 < int(response["headers"]["Cache-Control"].removeprefix("public, max-age=")) \
+            <= city_weather_data.weather_api.UPDATE_INTERVAL_NUM_SECONDS
+
+        not_modified = get({"city": "Berlin", "history": "false"}, {"if-none-match": f'"x", {etag}'})
+        assert not_modified["statusCode"] == 304 and not_modified["body"] == ""
+        assert not_modified["headers"]["ETag"] == etag
+
+        with_history = get({"city": "Berlin"}, {"if-none-match": etag})
+        assert with_history["statusCode"] == 200 and "ETag" not in with_history["headers"]
+        assert with_history["headers"]["Cache-Control"] == "private, no-store"
+    finally:
+        ip_history.set_ip_table(None)
@@ -0,0 +1,96 @@
+"""Unit tests for the per-invocation metrics.
+
+These tests validate that stage timings and counters recorded on any thread of an
+invocation end up in its single embedded metric format record, that the optional
+Server-Timing header reflects them, and that nothing is recorded outside of an
+instrumented invocation.
+"""
+
+import json
+import time
+
+import pytest
+
+import fetch_engine
+import metrics
+
+
+class FakeContext:
+    aws_request_id = "test-request-id"
+
+
+def get_emf_records(output: str) -> list:
+    return [record for record in (json.loads(line) for line in output.splitlines() if line.startswith('{"_aws"'))]
+
+
+def test_stages_run_on_the_fetch_pool_are_recorded_in_the_invocation_record(capsys):
+    """Work submitted to fetch_engine is attributed to the submitting invocation, and one record is emitted."""
+    @metrics.timed("Work")
+    def work():
+        metrics.increment("CacheHit")
+        return 42
+
+    @metrics.instrument_handler
+    def handler(event, context):
+        assert fetch_engine.submit_provider_fetch(work).result() == 42
+        assert fetch_engine.submit_hedged_provider_fetch(work).result() == 42
+        metrics.increment("CacheMiss", 2)
+        return {"statusCode": 200, "headers": {}}
+
+    handler({}, FakeContext())
+
+    [record] = get_emf_records(capsys.readouterr().out)
+    metric_units = {metric["Name"]: metric["Unit"] for metric in record["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+    assert metric_units == {"WorkTime": "Milliseconds", "TotalTime": "Milliseconds", "CacheHit": "Count",
+                            "CacheMiss": "Count", "CacheHitRate": "Percent"}
+    assert record["CacheHit"] == 2 and record["CacheMiss"] == 2 and record["CacheHitRate"] == 50.0
+    assert record["requestId"] == "test-request-id" and record["statusCode"] == 200
+    assert 0 <= record["WorkTime"] <= record["TotalTime"]
+
+
+def test_lambda_handler_reports_provider_dynamodb_and_serialization_stages(monkeypatch, capsys):
+    """A full invocation reports every stage, and the Server-Timing header when enabled."""
+    pytest.importorskip("botocore")
+    import city_weather_data
+    import ip_history
+    import lambda_function
+    from local_dynamodb import LocalDynamoDBTable
+    from open_meteo import OpenMeteoResponse
+    from weather_api import WeatherApiResponse
+
+    now = int(time.time())
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api",
+                        lambda city_name: WeatherApiResponse(city_name, "", 48.85, 2.35, now, 20.0, "Sunny", 1000))
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch",
+                        lambda coordinates: [OpenMeteoResponse(lat, lon, None, 22.0, 0) for lat, lon in coordinates])
+    monkeypatch.setattr(metrics, "SERVER_TIMING_ENABLED", True)
+    ip_history.set_ip_table(LocalDynamoDBTable("ip"))
+    city_weather_data.city_weather_data_cache.clear()
+
+    response = lambda_function.lambda_handler({"queryStringParameters": {"city": "Metricsville"},
+                                               "requestContext": {"http": {"sourceIp": "10.1.2.3"}}}, FakeContext())
+
+    [record] = get_emf_records(capsys.readouterr().out)
+    for stage in ("Total", "WeatherFetch", "WeatherAPIFetch", "OpenMeteoFetch", "Normalize", "IpHistoryUpdate",
+                  "Serialize"):
+        assert f"{stage}Time" in record, stage
+    assert record["WeatherCacheMiss"] == 1 and record["WeatherCacheHitRate"] == 0.0
+    assert response["statusCode"] == 200
+    assert "WeatherFetch;dur=" in response["headers"]["Server-Timing"]
+    assert "Total;dur=" in response["headers"]["Server-Timing"]
+
+
+def test_nothing_is_recorded_outside_of_an_instrumented_invocation(monkeypatch, capsys):
+    """Timers and counters are no-ops without a current invocation, and a disabled handler emits no record."""
+    @metrics.timed("Work")
+    def work():
+        with metrics.timer("Inner"):
+            metrics.increment("Event")
+        return metrics.get_current_metrics()
+
+    assert work() is None
+
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    assert metrics.instrument_handler(lambda event, context: {"statusCode": 200, "inner": work()})(
+        {}, FakeContext()) == {"statusCode": 200, "inner": None}
+    assert get_emf_records(capsys.readouterr().out) == []
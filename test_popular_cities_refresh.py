@@ -0,0 +1,134 @@
+"""Unit tests for the scheduled refresh of popular cities and the shared weather cache.
+
+These tests validate that the refresh selects the most requested cities and only
+fetches those whose shared cache entry is due, that request handling serves
+refreshed cities from the shared cache without calling the providers, and that
+shared cache lookups are batched into BatchGetItem calls.
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("botocore")
+
+import city_weather_data  # noqa: E402
+import ip_history  # noqa: E402
+import popular_cities_refresh  # noqa: E402
+import shared_weather_cache  # noqa: E402
+from geocode_cache import GeocodeCache  # noqa: E402
+from local_dynamodb import LocalDynamoDBTable  # noqa: E402
+from open_meteo import OpenMeteoResponse  # noqa: E402
+from weather_api import WeatherApiResponse  # noqa: E402
+
+CONTEXT = SimpleNamespace(aws_request_id="refresh", get_remaining_time_in_millis=lambda: 60_000)
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Replaces the providers with fakes recording the cities they are asked for, and empties the caches."""
+    now = int(time.time())
+    weather_api_calls = []
+
+    def fake_fetch_data_weather_api(city_name):
+        weather_api_calls.append(city_name)
+        return WeatherApiResponse(city_name, "Country", 10.0 + len(weather_api_calls), 20.0, now, 18.0, "Sunny", 1000)
+
+    monkeypatch.setattr(city_weather_data.weather_api, "fetch_data_weather_api", fake_fetch_data_weather_api)
+    monkeypatch.setattr(city_weather_data.open_meteo, "fetch_data_open_meteo_batch",
+                        lambda coordinates_list: [OpenMeteoResponse(lat, lon, None, 20.0, 0)
+                                                  for lat, lon in coordinates_list])
+    monkeypatch.setattr(city_weather_data, "geocode_cache", GeocodeCache(None))
+    city_weather_data.city_weather_data_cache.clear()
+    yield weather_api_calls
+    city_weather_data.city_weather_data_cache.clear()
+
+
+@pytest.fixture
+def tables():
+    """Backs RequestIPLogs and the shared cache with local DynamoDB stand-ins."""
+    ip_table, shared_cache_table = LocalDynamoDBTable("ip"), LocalDynamoDBTable("city")
+    ip_history.set_ip_table(ip_table)
+    shared_weather_cache.set_shared_cache_table(shared_cache_table)
+    yield ip_table, shared_cache_table
+    ip_history.set_ip_table(None)
+    shared_weather_cache.set_shared_cache_table(None)
+
+
+def test_refresh_publishes_the_most_requested_cities_and_skips_fresh_ones(providers, tables):
+    """Cities are ranked across spellings, and a second run finds every entry fresh until the next run."""
+    ip_table, shared_cache_table = tables
+    ip_table.put_item(Item={"ip": "1.1.1.1", "recent_cities": ["Paris", "Rome", "Oslo"]})
+    ip_table.put_item(Item={"ip": "2.2.2.2", "recent_cities": ["paris", "Rome"]})
+    ip_table.put_item(Item={"ip": "3.3.3.3", "recent_cities": ["Paris "]})
+
+    summary = popular_cities_refresh.refresh_handler({"top_n": 2}, CONTEXT)
+
+    assert summary["cities"] == ["Paris", "Rome"]
+    assert sorted(summary["refreshed"]) == ["Paris", "Rome"] and sorted(providers) == ["Paris", "Rome"]
+    assert {item["city"] for item in shared_cache_table.scan()["Items"]} == {"paris", "rome"}
+
+    providers.clear()
+    summary = popular_cities_refresh.refresh_handler({"top_n": 2}, CONTEXT)
+    assert summary["skipped"] == ["Paris", "Rome"] and summary["refreshed"] == [] and providers == []
+
+
+def test_requests_are_served_from_the_shared_cache(providers, tables):
+    """A city refreshed by another container is served without any provider call, and then cached in-process."""
+    popular_cities_refresh.refresh_handler({"cities": ["Lisbon"]}, CONTEXT)
+    city_weather_data.city_weather_data_cache.clear()
+    providers.clear()
+
+    weather_data = city_weather_data.fetch_cities_weather_data(["lisbon"])["lisbon"]
+
+    assert weather_data.temp_c == 18.0 and providers == []
+    assert len(city_weather_data.city_weather_data_cache) == 1
+
+
+def test_shared_cache_lookups_are_batched_off_the_provider_pool(tables, monkeypatch):
+    """Lookups make one BatchGetItem call per 100 distinct keys, and never submit work to the provider pool."""
+    _, shared_cache_table = tables
+    now = time.time()
+    weather_data = city_weather_data.CityWeatherData(48.86, 2.35, int(now), 18.0, [], ["WeatherAPI"])
+    for i in range(150):
+        shared_weather_cache.put_entry(f"City {i}", weather_data, now + 600, now + 3600)
+    monkeypatch.setattr(shared_weather_cache.fetch_engine, "submit_provider_fetch",
+                        lambda *args: pytest.fail("the shared cache read used the provider pool"))
+
+    city_names = [f"City {i}" for i in range(150)] + ["city 0", "Unknown"]
+    entries = shared_weather_cache.get_entries(city_names)
+
+    assert set(entries) == set(city_names) - {"Unknown"}
+    assert entries["city 0"][0].temp_c == 18.0 and entries["City 149"][1] == int(now + 600)
+    assert shared_cache_table.call_counts["batch_get_item"] == 2 and shared_cache_table.call_counts["get_item"] == 0
+
+
+def test_shared_cache_lookups_retry_unprocessed_keys_on_a_real_table_resource():
+    """Through a real Table resource's client, found items are converted, and unprocessed keys are requested again."""
+    import boto3
+    from botocore.stub import Stubber
+
+    table = boto3.resource("dynamodb", region_name="us-east-1", aws_access_key_id="test",
+                           aws_secret_access_key="test").Table("SharedWeatherCache")
+    paris_item = {"city": {"S": "paris"}, "latitude": {"N": "48.86"}, "longitude": {"N": "2.35"},
+                  "last_update_epoch": {"N": "1000"}, "temp_c": {"N": "18.5"}, "expires_at_epoch": {"N": "2000"},
+                  "ttl": {"N": "3000"}, "providers": {"L": [{"S": "WeatherAPI"}]}}
+    with Stubber(table.meta.client) as stubber:
+        stubber.add_response(
+            "batch_get_item",
+            {"Responses": {"SharedWeatherCache": [paris_item]},
+             "UnprocessedKeys": {"SharedWeatherCache": {"Keys": [{"city": {"S": "rome"}}]}}},
+            {"RequestItems": {"SharedWeatherCache": {"Keys": [{"city": "paris"}, {"city": "rome"}]}}})
+        stubber.add_response(
+            "batch_get_item", {"Responses": {"SharedWeatherCache": []}, "UnprocessedKeys": {}},
+            {"RequestItems": {"SharedWeatherCache": {"Keys": [{"city": "rome"}]}}})
+        shared_weather_cache.set_shared_cache_table(table)
+        try:
+            entries = shared_weather_cache.get_entries(["Paris", "Rome"])
+        finally:
+            shared_weather_cache.set_shared_cache_table(None)
+        stubber.assert_no_pending_responses()
+
+    assert list(entries) == ["Paris"]
+    assert entries["Paris"][0].temp_c == 18.5 and entries["Paris"][1:] == (2000.0, 3000.0)
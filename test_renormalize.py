@@ -0,0 +1,65 @@
+"""Unit tests for the offline bulk re-normalization tool.
+
+These tests validate that archived provider responses are aggregated as of their
+archive time, that unusable records are reported rather than dropped, and that
+the worker pool preserves the input order.
+"""
+
+import copy
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+import renormalize
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "benchmarks" / "fixtures"
+
+
+@pytest.fixture(scope="module")
+def london_responses():
+    """The recorded WeatherAPI and OpenMeteo payloads of London."""
+    weather_api_payload = json.loads((FIXTURES_DIR / "weather_api_current.json").read_text(encoding="utf-8"))["london"]
+    open_meteo_payload = next(payload for payload in
+                              json.loads((FIXTURES_DIR / "open_meteo_forecast.json").read_text(encoding="utf-8"))
+                              if (payload["latitude"], payload["longitude"]) == (51.52, -0.11))
+    return {"WeatherAPI": weather_api_payload, "OpenMeteo": open_meteo_payload}
+
+
+def test_records_are_aggregated_as_of_their_archive_time(london_responses):
+    """Data points are judged fresh against the archive time, and unusable records yield an error row."""
+    archived_at = london_responses["WeatherAPI"]["current"]["last_updated_epoch"] + 600
+    stale_responses = copy.deepcopy(london_responses)
+    stale_responses["OpenMeteo"]["current_weather"]["time"] = "2020-01-01T00:00"
+    lines = [json.dumps({"city": "London", "archived_at": archived_at, "responses": london_responses}),
+             json.dumps({"city": "London", "archived_at": archived_at, "responses": stale_responses}),
+             "", "not json", json.dumps({"city": "Nowhere", "responses": {}})]
+
+    output = io.StringIO()
+    stats = renormalize.renormalize_archive(io.StringIO("\n".join(lines) + "\n"), output)
+    rows = [json.loads(line) for line in output.getvalue().splitlines()]
+
+    assert (stats.num_records, stats.num_errors) == (4, 2)
+    assert rows[0]["temp_c"] == pytest.approx((11.0 + 11.4) / 2)
+    assert rows[0]["providers"] == ["OpenMeteo", "WeatherAPI"] and rows[0]["error"] is None
+    assert rows[1]["temp_c"] == 11.0 and rows[1]["providers"] == ["WeatherAPI"]
+    assert rows[2]["city"] is None and rows[2]["error"].startswith("invalid record")
+    assert rows[3]["city"] == "Nowhere" and rows[3]["error"] == "no provider responses"
+
+
+def test_worker_pool_preserves_the_input_order(london_responses):
+    """Chunks processed by several workers are written in input order, identically to a single worker."""
+    lines = "".join(json.dumps({"city": f"city-{i}", "responses": london_responses}) + "\n" for i in range(50))
+
+    outputs = []
+    for num_workers in (1, 2):
+        output = io.StringIO()
+        renormalize.renormalize_archive(io.StringIO(lines), output, num_workers, chunk_num_records=7,
+                                        output_format="csv")
+        outputs.append(output.getvalue())
+
+    assert outputs[0] == outputs[1]
+    rows = outputs[1].splitlines()
+    assert rows[0] == ",".join(renormalize.OUTPUT_COLUMNS)
+    assert [row.split(",")[0] for row in rows[1:]] == [f"city-{i}" for i in range(50)]
@@ -0,0 +1,96 @@
+"""Unit tests for the standalone HTTP server.
+
+These tests validate the translation of HTTP requests into Lambda events, and that
+the asyncio server serves kept-alive and concurrent requests through the handler.
+"""
+
+import asyncio
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import server
+
+
+def test_http_requests_are_translated_into_lambda_events():
+    """Query parameters, the client IP and the body are placed where lambda_handler reads them."""
+    event = server.build_event("POST", "/?city=Paris&tag=a&tag=b", {"x-forwarded-for": "203.0.113.7, 10.0.0.1"},
+                               b'{"cities": ["Rome"]}', "10.0.0.1", trust_forwarded_for=True)
+
+    assert event["queryStringParameters"] == {"city": "Paris", "tag": "a,b"}
+    assert event["requestContext"]["http"]["sourceIp"] == "203.0.113.7"
+    assert event["requestContext"]["http"]["method"] == "POST"
+    assert event["body"] == '{"cities": ["Rome"]}' and event["isBase64Encoded"] is False
+
+    untrusted_event = server.build_event("GET", "/", {"x-forwarded-for": "203.0.113.7"}, b"", "10.0.0.1")
+    assert untrusted_event["requestContext"]["http"]["sourceIp"] == "10.0.0.1"
+    assert untrusted_event["queryStringParameters"] is None
+
+
+@pytest.fixture
+def running_server():
+    """Runs a LambdaHttpServer, echoing the events it receives, on a background event loop."""
+    def handler(event, context):
+        time.sleep(float((event["queryStringParameters"] or {}).get("sleep", 0)))
+        return {"statusCode": 200, "headers": {"Content-Type": "application/json", "X-Request-ID": context.aws_request_id},
+                "body": json.dumps({"query": event["queryStringParameters"],
+                                    "ip": event["requestContext"]["http"]["sourceIp"]})}
+
+    sock = server.create_listening_socket("127.0.0.1", 0)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(server.LambdaHttpServer(handler, num_worker_threads=8).serve(sock))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        # connection handlers outlive the listening server, so they are cancelled before the loop closes
+        handlers = asyncio.all_tasks(loop)
+        for handler_task in handlers:
+            handler_task.cancel()
+        if handlers:
+            loop.run_until_complete(asyncio.wait(handlers))
+        loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    yield sock.getsockname()[1]
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join()
+
+
+def test_requests_on_a_kept_alive_connection_reach_the_handler(running_server):
+    """Several requests are served on one connection, each with its own request id."""
+    connection = http.client.HTTPConnection("127.0.0.1", running_server, timeout=5)
+    request_ids = set()
+    for city in ("Paris", "Rome"):
+        connection.request("GET", f"/?city={city}")
+        response = connection.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read()) == {"query": {"city": city}, "ip": "127.0.0.1"}
+        request_ids.add(response.getheader("X-Request-ID"))
+    connection.close()
+
+    assert len(request_ids) == 2
+
+
+def test_slow_invocations_do_not_block_other_connections(running_server):
+    """Invocations run on the worker threads, so concurrent slow requests overlap."""
+    def get(path):
+        connection = http.client.HTTPConnection("127.0.0.1", running_server, timeout=5)
+        connection.request("GET", path)
+        status = connection.getresponse().status
+        connection.close()
+        return status
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        statuses = list(executor.map(get, ["/?sleep=0.3"] * 4 + ["/health"]))
+
+    assert statuses == [200] * 5
+    assert time.monotonic() - start < 1.0
@@ -0,0 +1,51 @@
+"""Unit tests for the single-flight request coalescing.
+
+These tests validate that concurrent calls for the same key share a single
+computation, and that its result or error reaches every caller.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_for_a_key_share_one_computation():
+    """Callers arriving while a key is in flight get the leader's result; later callers compute again."""
+    single_flight = SingleFlight()
+    calls = []
+    all_calls_started = threading.Barrier(5)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return len(calls)
+
+    def call():
+        all_calls_started.wait()
+        return single_flight.do("key", compute)
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(executor.map(lambda _: call(), range(5)))
+
+    assert results == [1] * 5
+    assert (single_flight.num_led, single_flight.num_joined) == (1, 4)
+    assert single_flight.do("key", compute) == 2
+
+
+def test_a_failed_computation_raises_its_error_for_every_caller():
+    """The leader's error is raised by every joined caller, and the key is released for retries."""
+    single_flight = SingleFlight()
+    [flight] = single_flight.claim(["key"]).values()
+    [joined_flight] = single_flight.claim(["key", "key"]).values()
+
+    assert flight.is_leader and not joined_flight.is_leader
+    single_flight.land_with_error(flight, ValueError("upstream failed"))
+
+    with pytest.raises(ValueError, match="upstream failed"):
+        joined_flight.future.result()
+    assert len(single_flight) == 0
+    assert single_flight.claim(["key"])["key"].is_leader
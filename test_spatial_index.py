@@ -0,0 +1,58 @@
+"""Unit tests for the geospatial index.
+
+These tests validate that nearest neighbour lookups agree with a linear scan,
+including across the antimeridian and close to the poles, and that points
+beyond the search radius are never returned.
+"""
+
+import random
+
+import pytest
+from spatial_index import SpatialIndex, haversine_distance_km
+
+
+def test_haversine_distance_km():
+    """One degree of latitude is about 111 km, and a longitude degree shrinks towards the poles."""
+    assert haversine_distance_km(0, 0, 1, 0) == pytest.approx(111.2, abs=0.1)
+    assert haversine_distance_km(60, 0, 60, 1) == pytest.approx(111.2 / 2, abs=0.1)
+    assert haversine_distance_km(10, 179.99, 10, -179.99) == pytest.approx(2.19, abs=0.01)
+
+
+@pytest.mark.parametrize("center", [(32.0, 34.8), (0.0, 179.95), (-45.0, -180.0), (89.95, 10.0)])
+def test_nearest_agrees_with_a_linear_scan(center):
+    """The nearest point within the radius is found wherever the search area lies on the grid."""
+    rng = random.Random(0)
+    points = [(max(-90.0, min(90.0, center[0] + rng.uniform(-0.3, 0.3))),
+               (center[1] + rng.uniform(-0.3, 0.3) + 180) % 360 - 180) for _ in range(500)]
+    index = SpatialIndex()
+    for i, (latitude, longitude) in enumerate(points):
+        index.insert(latitude, longitude, i)
+
+    for _ in range(100):
+        latitude = max(-90.0, min(90.0, center[0] + rng.uniform(-0.3, 0.3)))
+        longitude = (center[1] + rng.uniform(-0.3, 0.3) + 180) % 360 - 180
+        distances = [haversine_distance_km(latitude, longitude, *point) for point in points]
+        expected_distance_km = min(distance for distance in distances)
+
+        nearest = index.nearest(latitude, longitude, 3.0)
+
+        if expected_distance_km > 3.0:
+            assert nearest is None
+        else:
+            assert nearest[1] == pytest.approx(expected_distance_km)
+            assert distances[nearest[0]] == pytest.approx(expected_distance_km)
+
+
+def test_points_are_replaced_and_bounded_by_the_radius():
+    """Inserting at an indexed point replaces its value, and farther points are out of reach."""
+    index = SpatialIndex()
+    index.insert(51.5, -0.13, "old")
+    index.insert(51.5, -0.13, "London")
+    index.insert(48.86, 2.35, "Paris")
+
+    assert len(index) == 2
+    assert index.nearest(51.52, -0.1, 5.0)[0] == "London"
+    assert index.nearest(50.0, 1.0, 5.0) is None
+
+    index.clear()
+    assert len(index) == 0 and index.nearest(51.5, -0.13, 5.0) is None
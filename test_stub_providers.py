@@ -0,0 +1,46 @@
+"""Unit tests for the benchmarks' local provider stand-in.
+
+These tests validate that the provider clients, pointed at benchmarks.stub_providers,
+parse the replayed recordings like real responses (fresh timestamps, unknown cities,
+batched OpenMeteo locations).
+"""
+
+import time
+
+import pytest
+
+import open_meteo
+import weather_api
+from benchmarks.stub_providers import REPLAY_PERIOD_NUM_SECONDS, StubProviderServer
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    with StubProviderServer() as server:
+        monkeypatch.setattr(weather_api, "WEATHER_API_ENDPOINT", server.weather_api_endpoint)
+        monkeypatch.setattr(open_meteo, "OPEN_METEO_ENDPOINT", server.open_meteo_endpoint)
+        yield server
+
+
+def test_weather_api_recordings_are_replayed_with_fresh_timestamps(stub_server):
+    """Recorded cities are found case-insensitively and stamped with the current replay period."""
+    response = weather_api.fetch_data_weather_api("tel aviv")
+
+    assert response.city_name == "Tel Aviv-Yafo"
+    assert (response.latitude, response.longitude) == (32.07, 34.76)
+    assert time.time() - response.last_update_epoch < REPLAY_PERIOD_NUM_SECONDS
+
+
+def test_unrecorded_cities_are_reported_as_not_found(stub_server):
+    """Unknown cities get WeatherAPI's 1006 error, which the client maps to WeatherApiCityNotFoundError."""
+    with pytest.raises(weather_api.WeatherApiCityNotFoundError):
+        weather_api.fetch_data_weather_api("Atlantis")
+
+
+def test_open_meteo_batches_are_answered_per_location(stub_server):
+    """A batch gets one payload per location in request order, unrecorded locations included."""
+    responses = open_meteo.fetch_data_open_meteo_batch([(51.52, -0.11), (1.5, 2.5), (35.69, 139.69)])
+
+    assert [(r.latitude, r.longitude) for r in responses] == [(51.52, -0.11), (1.5, 2.5), (35.69, 139.69)]
+    assert all(r.time is not None and r.temp_c is not None for r in responses)
+    assert stub_server.request_counts["OpenMeteo"] == 1
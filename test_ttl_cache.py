@@ -0,0 +1,70 @@
+"""Unit tests for the in-process LRU/TTL cache.
+
+These tests validate per-entry expiry, least-recently-used eviction once the
+cache is full, and the hit/miss/expiration/eviction counters.
+"""
+
+from ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_at_their_own_expiry_time():
+    """Each entry is served until its own expiry time and counted as a miss afterwards."""
+    clock = FakeClock(1000)
+    cache = TTLCache(max_entries=10, clock=clock)
+    cache.put("short", "a", expires_at_epoch=1010)
+    cache.put("long", "b", expires_at_epoch=2000)
+
+    clock.now = 1500
+
+    assert cache.get("short") is None
+    assert cache.get("long") == "b"
+    assert cache.stats() == {"hits": 1, "misses": 1, "expirations": 1, "evictions": 0, "stale_hits": 0,
+                             "hit_rate": 0.5}
+
+
+def test_least_recently_used_entry_is_evicted_when_full():
+    """Once max_entries is exceeded, the entry that was used least recently is evicted."""
+    cache = TTLCache(max_entries=2, clock=FakeClock(0))
+    cache.put("a", 1, expires_at_epoch=100)
+    cache.put("b", 2, expires_at_epoch=100)
+    cache.get("a")
+    cache.put("c", 3, expires_at_epoch=100)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_already_expired_values_are_not_stored():
+    """Putting a value whose expiry time has passed leaves the cache empty."""
+    cache = TTLCache(max_entries=2, clock=FakeClock(100))
+    cache.put("a", 1, expires_at_epoch=50)
+
+    assert len(cache) == 0
+
+
+def test_expired_entries_are_kept_for_get_stale_within_their_stale_window():
+    """An expired entry is no longer returned by get, but by get_stale until its stale window ends."""
+    clock = FakeClock(1000)
+    cache = TTLCache(max_entries=10, clock=clock)
+    cache.put("key", "value", expires_at_epoch=1010, stale_until_epoch=1100)
+
+    assert cache.get_stale("key") is None  # still fresh
+
+    clock.now = 1050
+    assert cache.get("key") is None
+    assert cache.get_stale("key") == "value"
+
+    clock.now = 1100
+    assert cache.get_stale("key") is None
+    assert len(cache) == 0
+    assert cache.stats()["stale_hits"] == 1
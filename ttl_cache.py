@@ -0,0 +1,145 @@
+"""In-Process LRU/TTL Cache Module.
+
+This module provides a small, thread-safe cache that lives for the lifetime of
+a (warm) Lambda container. Every entry carries its own absolute expiry time,
+chosen by the caller when the entry is stored (e.g. derived from the freshness
+of the cached data rather than a fixed TTL), and the number of entries is bounded,
+evicting the least recently used entry first.
+
+Entries may also carry a stale window: once expired, such an entry is no longer
+returned by get, but is kept until the end of its stale window and can still be
+retrieved with get_stale (e.g. to serve stale data while it is being revalidated).
+
+The cache keeps hit, miss, expiration, eviction and stale hit counters, so that its
+effectiveness can be reported alongside other service metrics.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """A bounded LRU cache whose entries expire at a per-entry absolute epoch time.
+
+        Attributes:
+            max_entries: The maximum number of entries kept before evicting the least recently used one.
+            hits: Number of lookups that returned a live entry.
+            misses: Number of lookups that found no live entry (including expired ones).
+            expirations: Number of entries dropped because their expiry time had passed.
+            evictions: Number of entries dropped to stay within max_entries.
+            stale_hits: Number of get_stale lookups that returned an expired entry within its stale window.
+    """
+    def __init__(self, max_entries: int, clock: Callable[[], float] = time.time):
+        """Initializes an empty cache.
+
+            Args:
+                max_entries: The maximum number of entries to keep.
+                clock: The source of the current epoch time, replaceable in tests.
+        """
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        """Returns a string representation of the TTLCache instance, including its counters."""
+        return f"{self.__class__.__name__}(size={len(self)}, max_entries={self.max_entries!r}, stats={self.stats()!r})"
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the live value stored under key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at_epoch, stale_until_epoch = entry
+            now = self._clock()
+            if now >= expires_at_epoch:
+                # entries within their stale window are kept for get_stale
+                if now >= stale_until_epoch:
+                    del self._entries[key]
+                    self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """Returns the value stored under key if it has expired but is still within its stale window, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at_epoch, stale_until_epoch = entry
+            now = self._clock()
+            if now >= stale_until_epoch:
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            if now < expires_at_epoch:
+                return None
+
+            self._entries.move_to_end(key)
+            self.stale_hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, expires_at_epoch: float, stale_until_epoch: Optional[float] = None):
+        """Stores value under key until expires_at_epoch, evicting least recently used entries if full.
+
+            Args:
+                key: The key to store value under.
+                value: The value to store.
+                expires_at_epoch: The epoch time until which get returns value.
+                stale_until_epoch: Optional epoch time (after expires_at_epoch) until which the expired
+                    value is kept for get_stale. Defaults to expires_at_epoch (no stale window).
+
+            Values whose stale window (or, without one, expiry) has already passed are not stored.
+        """
+        stale_until_epoch = max(expires_at_epoch, stale_until_epoch or expires_at_epoch)
+        if self._clock() >= stale_until_epoch:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, expires_at_epoch, stale_until_epoch)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Removes the entry stored under key, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Removes all entries and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.expirations = self.evictions = self.stale_hits = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups served from the cache (0.0 if there were no lookups)."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def stats(self) -> dict:
+        """Returns the cache counters as a dict."""
+        return {"hits": self.hits, "misses": self.misses, "expirations": self.expirations,
+                "evictions": self.evictions, "stale_hits": self.stale_hits, "hit_rate": self.hit_rate}
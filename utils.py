@@ -1,6 +1,9 @@
+import functools
 from datetime import datetime, timezone
 
 
+# providers publish updates every few minutes, so the same timestamps are formatted over and over
+@functools.lru_cache(maxsize=1024)
 def epoch_timestamp_to_iso_format(timestamp_epoch: int) -> str:
     """Converts a Unix epoch timestamp to an ISO 8601 formatted string.
 
@@ -12,8 +12,22 @@ The module follows a clean separation of concerns:
 """
 
 import json
+import os
 import requests
-from weather_service import WeatherServiceError
+import http_session
+from weather_service import WeatherServiceError, WeatherServiceCityNotFoundError
+
+# overridable to point the client at a local stand-in (see benchmarks/stub_providers.py)
+WEATHER_API_ENDPOINT = os.environ.get("WEATHER_API_ENDPOINT", "https://api.weatherapi.com/v1/current.json")
+
+SESSION_CONFIG = http_session.HttpSessionConfig("WEATHER_API", connect_timeout_num_seconds=2.0,
+                                                read_timeout_num_seconds=3.0, pool_maxsize=10)
+
+# Upper bound on how long a single WeatherAPI request may take before it is abandoned
+FETCH_TIMEOUT_NUM_SECONDS = SESSION_CONFIG.total_timeout_num_seconds
+
+# How often WeatherAPI publishes new current weather data for a location
+UPDATE_INTERVAL_NUM_SECONDS = 15 * 60
 
 
 class WeatherApiError(WeatherServiceError):
@@ -21,7 +35,7 @@ class WeatherApiError(WeatherServiceError):
     pass
 
 
-class WeatherApiCityNotFoundError(WeatherApiError):
+class WeatherApiCityNotFoundError(WeatherApiError, WeatherServiceCityNotFoundError):
     """Raised when the requested city cannot be found in the WeatherAPI database."""
     pass
 
@@ -61,6 +75,8 @@ class WeatherApiResponse:
             condition_text: Human-readable weather description (e.g., 'Partly cloudy').
             condition_code: WeatherApi's Unique numeric code for the current weather condition.
     """
+    __slots__ = ("city_name", "country_name", "latitude", "longitude", "last_update_epoch", "temp_c",
+                 "condition_text", "condition_code")
 
     # class WeatherCondition(Enum):
     #     SUNNY = (1000, "Sunny")
@@ -120,6 +136,44 @@ class WeatherApiResponse:
         )
 
 
+def parse_weather_api_response(data: dict) -> WeatherApiResponse:
+    """Parses a WeatherAPI current.json JSON payload into a WeatherApiResponse.
+
+        Args:
+            data: The decoded JSON object returned by the current.json endpoint.
+
+        Returns:
+            A WeatherApiResponse object populated with location metadata and current weather conditions.
+    """
+    location_dict = data.get("location", {})
+    city_name = location_dict.get("name")
+    country_name = location_dict.get("country")
+    latitude = location_dict.get("lat", None)
+    longitude = location_dict.get("lon", None)
+
+    current_dict = data.get("current", {})
+    last_updated_epoch = current_dict.get("last_updated_epoch", None)
+    temp_c = current_dict.get("temp_c", None)
+
+    condition_dict = current_dict.get("condition", {})
+    condition_text = condition_dict.get("text", None)
+    condition_code = condition_dict.get("code", None)
+
+    return WeatherApiResponse(city_name, country_name, latitude, longitude, last_updated_epoch, temp_c,
+                              condition_text, condition_code)
+
+
+def get_error_code(response: requests.Response) -> int:
+    """Returns the error code of a WeatherAPI error response, or -1 if its body is not a WeatherAPI error.
+
+        Failures of intermediaries (e.g. a load balancer's HTML 502 page) have no such body.
+    """
+    try:
+        return json.loads(response.content.decode('utf-8')).get("error", {}).get("code", -1)
+    except (ValueError, AttributeError):
+        return -1
+
+
 def fetch_data_weather_api(city_name: str) -> WeatherApiResponse:
     """Fetches real-time weather data from the WeatherAPI service.
 
@@ -136,42 +190,23 @@ def fetch_data_weather_api(city_name: str) -> WeatherApiResponse:
         Raises:
             WeatherApiCityNotFoundError: If the API returns a 1006 error code
                 indicating the city was not found.
-            WeatherApiRequestError: If a network error occurs or the API
+            WeatherApiRequestError: If a network error or timeout occurs or the API
                 returns a non-success status code.
     """
     WEATHER_API_KEY = "dabfd11ef5ff4c8da5e215521253012"
-    WEATHER_API_ENDPOINT = f"https://api.weatherapi.com/v1/current.json?key={WEATHER_API_KEY}&q={city_name}"
     try:
-        response = requests.get(WEATHER_API_ENDPOINT)
+        # reuses a pooled keep-alive connection of a warm container and is bounded by SESSION_CONFIG timeouts
+        response = http_session.session_get(SESSION_CONFIG, WEATHER_API_ENDPOINT,
+                                            params={"key": WEATHER_API_KEY, "q": city_name})
 
         # Raise an exception for bad status codes (4xx or 5xx)
         response.raise_for_status()
 
         # The response body from Lambda is a JSON string, which we load into a Python dict
-        data = response.json()
-
-        location_dict = data.get("location", {})
-        city_name = location_dict.get("name")
-        country_name = location_dict.get("country")
-        latitude = location_dict.get("lat", None)
-        longitude = location_dict.get("lon", None)
-
-        current_dict = data.get("current", {})
-        last_updated_epoch = current_dict.get("last_updated_epoch", None)
-        temp_c = current_dict.get("temp_c", None)
-
-        condition_dict = current_dict.get("condition", {})
-        condition_text = condition_dict.get("text", None)
-        condition_code = condition_dict.get("code", None)
-
-        return WeatherApiResponse(city_name, country_name, latitude, longitude, last_updated_epoch, temp_c,
-                                  condition_text, condition_code)
+        return parse_weather_api_response(response.json())
 
     except (requests.exceptions.HTTPError, requests.exceptions.RequestException) as err:
-        if (err.response is not None
-            and err.response.content is not None
-            and json.loads(err.response.content.decode('utf-8'))
-                        .get("error", {}).get("code", -1) == 1006):
+        if err.response is not None and get_error_code(err.response) == 1006:
             raise WeatherApiCityNotFoundError()
         else:
             raise WeatherApiRequestError(err)
@@ -0,0 +1,91 @@
+"""Generated Weather Code Tables Module.
+
+DO NOT EDIT: this file is generated by generate_weather_code_tables.py from the
+provider weather code CSV files. Re-run the generator after changing a CSV file
+or the weather condition text classification rules.
+
+Each table maps a provider's numeric weather code to a tuple of
+(provider description, WeatherCondition member name).
+"""
+
+OPEN_METEO_WEATHER_CODES = {
+    0: ('Clear sky', 'CLEAR'),
+    1: ('Mainly clear', 'CLEAR'),
+    2: ('Partly cloudy', 'PARTIALLY_CLOUDY'),
+    3: ('Overcast', 'OVERCAST'),
+    45: ('Fog', 'FOG'),
+    48: ('Depositing rime fog', 'FOG'),
+    51: ('Light drizzle', 'DRIZZLE'),
+    53: ('Moderate drizzle', 'DRIZZLE'),
+    55: ('Dense drizzle', 'DRIZZLE'),
+    56: ('Light freezing drizzle', 'DRIZZLE'),
+    57: ('Dense freezing drizzle', 'DRIZZLE'),
+    61: ('Slight rain', 'LIGHT_RAIN'),
+    63: ('Moderate rain', 'MODERATE_RAIN'),
+    65: ('Heavy rain', 'HEAVY_RAIN'),
+    66: ('Light freezing rain', 'LIGHT_RAIN'),
+    67: ('Heavy freezing rain', 'HEAVY_RAIN'),
+    71: ('Slight snowfall', 'LIGHT_SNOW'),
+    73: ('Moderate snowfall', 'MODERATE_SNOW'),
+    75: ('Heavy snowfall', 'HEAVY_SNOW'),
+    77: ('Snow grains', 'MODERATE_RAIN'),
+    80: ('Slight rain showers', 'LIGHT_RAIN'),
+    81: ('Moderate rain showers', 'MODERATE_RAIN'),
+    82: ('Violent rain showers', 'HEAVY_RAIN'),
+    85: ('Slight snow showers', 'LIGHT_SNOW'),
+    86: ('Heavy snow showers', 'HEAVY_SNOW'),
+    95: ('Thunderstorm', 'UNRECOGNIZED'),
+    96: ('Thunderstorm with slight hail', 'UNRECOGNIZED'),
+    99: ('Thunderstorm with heavy hail', 'UNRECOGNIZED'),
+}
+
+WEATHER_API_WEATHER_CODES = {
+    1000: ('Sunny', 'CLEAR'),
+    1003: ('Partly cloudy', 'PARTIALLY_CLOUDY'),
+    1006: ('Cloudy', 'CLOUDY'),
+    1009: ('Overcast', 'OVERCAST'),
+    1030: ('Mist', 'MIST'),
+    1063: ('Patchy rain possible', 'LIGHT_RAIN'),
+    1066: ('Patchy snow possible', 'LIGHT_SNOW'),
+    1069: ('Patchy sleet possible', 'UNRECOGNIZED'),
+    1072: ('Patchy freezing drizzle possible', 'DRIZZLE'),
+    1087: ('Thundery outbreaks possible', 'UNRECOGNIZED'),
+    1114: ('Blowing snow', 'MODERATE_SNOW'),
+    1117: ('Blizzard', 'UNRECOGNIZED'),
+    1135: ('Fog', 'FOG'),
+    1147: ('Freezing fog', 'FOG'),
+    1150: ('Patchy light drizzle', 'DRIZZLE'),
+    1153: ('Light drizzle', 'DRIZZLE'),
+    1168: ('Freezing drizzle', 'DRIZZLE'),
+    1171: ('Heavy freezing drizzle', 'DRIZZLE'),
+    1180: ('Patchy light rain', 'LIGHT_RAIN'),
+    1183: ('Light rain', 'LIGHT_RAIN'),
+    1186: ('Moderate rain at times', 'MODERATE_RAIN'),
+    1189: ('Moderate rain', 'MODERATE_RAIN'),
+    1192: ('Heavy rain at times', 'HEAVY_RAIN'),
+    1195: ('Heavy rain', 'HEAVY_RAIN'),
+    1198: ('Light freezing rain', 'LIGHT_RAIN'),
+    1201: ('Moderate or heavy freezing rain', 'MODERATE_RAIN'),
+    1204: ('Light sleet', 'UNRECOGNIZED'),
+    1207: ('Moderate or heavy sleet', 'UNRECOGNIZED'),
+    1210: ('Patchy light snow', 'LIGHT_SNOW'),
+    1213: ('Light snow', 'LIGHT_SNOW'),
+    1216: ('Patchy moderate snow', 'LIGHT_SNOW'),
+    1219: ('Moderate snow', 'MODERATE_SNOW'),
+    1222: ('Patchy heavy snow', 'LIGHT_SNOW'),
+    1225: ('Heavy snow', 'HEAVY_SNOW'),
+    1237: ('Ice pellets', 'UNRECOGNIZED'),
+    1240: ('Light rain shower', 'LIGHT_RAIN'),
+    1243: ('Moderate or heavy rain shower', 'MODERATE_RAIN'),
+    1246: ('Torrential rain shower', 'MODERATE_RAIN'),
+    1249: ('Light sleet showers', 'UNRECOGNIZED'),
+    1252: ('Moderate or heavy sleet showers', 'UNRECOGNIZED'),
+    1255: ('Light snow showers', 'LIGHT_SNOW'),
+    1258: ('Moderate or heavy snow showers', 'MODERATE_SNOW'),
+    1261: ('Light showers of ice pellets', 'UNRECOGNIZED'),
+    1264: ('Moderate or heavy showers of ice pellets', 'UNRECOGNIZED'),
+    1273: ('Patchy light rain with thunder', 'LIGHT_RAIN'),
+    1276: ('Moderate or heavy rain with thunder', 'MODERATE_RAIN'),
+    1279: ('Patchy light snow with thunder', 'LIGHT_SNOW'),
+    1282: ('Moderate or heavy snow with thunder', 'MODERATE_SNOW'),
+}
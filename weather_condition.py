@@ -0,0 +1,104 @@
+"""Normalized Weather Condition Module.
+
+This module defines the provider-agnostic WeatherCondition enumeration and the
+text classification rules that map a provider's weather description onto it.
+
+It deliberately has no dependencies on the rest of the application, so that the
+build-time generate_weather_code_tables script can classify the provider code
+tables with exactly the rules applied at runtime.
+"""
+
+import functools
+from enum import Enum
+from typing import Tuple
+
+
+class WeatherCondition(Enum):
+    """Enumeration of normalized weather condition states used across the application.
+
+        Each member contains a tuple of (id, display_name) to allow for
+        consistent UI rendering and internal logic.
+    """
+    CLEAR = (0, "Clear")
+    PARTIALLY_CLOUDY = (1, "Partially Cloudy")
+    CLOUDY = (2, "Cloudy")
+    DRIZZLE = (3, "Drizzle")
+    LIGHT_RAIN = (4, "Light Rain")
+    MODERATE_RAIN = (5, "Moderate Rain")
+    HEAVY_RAIN = (6, "Heavy Rain")
+    LIGHT_SNOW = (7, "Light Snow")
+    MODERATE_SNOW = (8, "Moderate Snow")
+    HEAVY_SNOW = (9, "Heavy Snow")
+    OVERCAST = (10, "Overcast")
+    MIST = (11, "Mist")
+    FOG = (12, "Fog")
+    UNRECOGNIZED = (13, "Unrecognized")
+
+
+def convert_weather_condition_text_to_weather_condition(weather_condition_text: str) -> WeatherCondition:
+    """Normalizes raw weather description strings into a standard WeatherCondition enum.
+
+        This function performs 'fuzzy' text matching by stripping common API modifiers
+        (e.g., 'at times', 'slight', 'patchy') and mapping the core keywords to an
+        internal, provider-agnostic WeatherCondition representation.
+
+        Args:
+            weather_condition_text: The raw condition string from a weather service.
+
+        Returns:
+            A WeatherCondition enum member. Defaults to UNRECOGNIZED if no match is found.
+    """
+    clear_weather_condition_text = (weather_condition_text.lower().replace("shower", "")
+                              .replace("at times", "")
+                              .replace("slight", "light")
+                              .replace("fall", "")
+                              .replace("partly", "partially")
+                              .replace("patchy", "light")
+                              .replace("violent", "heavy")
+                              .strip())
+
+    if "clear" in clear_weather_condition_text or "sunny" in clear_weather_condition_text:
+        return WeatherCondition.CLEAR
+    elif "cloudy" in clear_weather_condition_text:
+        if "partially" in clear_weather_condition_text:
+            return WeatherCondition.PARTIALLY_CLOUDY
+        else:
+            return WeatherCondition.CLOUDY
+    elif "drizzle" in clear_weather_condition_text:
+        return WeatherCondition.DRIZZLE
+    elif "rain" in clear_weather_condition_text:
+        if "light" in clear_weather_condition_text:
+            return WeatherCondition.LIGHT_RAIN
+        elif "moderate" in clear_weather_condition_text:
+            return WeatherCondition.MODERATE_RAIN
+        elif "heavy" in clear_weather_condition_text:
+            return WeatherCondition.HEAVY_RAIN
+        else:
+            return WeatherCondition.MODERATE_RAIN
+    elif "snow" in clear_weather_condition_text:
+        if "light" in clear_weather_condition_text:
+            return WeatherCondition.LIGHT_SNOW
+        elif "moderate" in clear_weather_condition_text:
+            return WeatherCondition.MODERATE_SNOW
+        elif "heavy" in clear_weather_condition_text:
+            return WeatherCondition.HEAVY_SNOW
+        else:
+            return WeatherCondition.MODERATE_SNOW
+    elif "mist" in clear_weather_condition_text:
+        return WeatherCondition.MIST
+    elif "fog" in clear_weather_condition_text:
+        return WeatherCondition.FOG
+    elif "overcast" in clear_weather_condition_text:
+        return WeatherCondition.OVERCAST
+    else:
+        return WeatherCondition.UNRECOGNIZED
+
+
+@functools.lru_cache(maxsize=256)
+def format_weather_conditions(weather_conditions: Tuple[WeatherCondition, ...]) -> str:
+    """Returns the display string of a combination of weather conditions (e.g. "Clear or Mist").
+
+        There are only a few distinct combinations, so each display string is built once and reused.
+    """
+    return " or ".join(weather_condition.value[1] for weather_condition in weather_conditions) \
+        if len(weather_conditions) > 0 else "N / A"
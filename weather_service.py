@@ -20,3 +20,12 @@ class WeatherServiceError(Exception):
         within this application, regardless of the underlying service provider.
     """
     pass
+
+
+class WeatherServiceCityNotFoundError(WeatherServiceError):
+    """Raised by a weather service that cannot resolve the requested city.
+
+        Provider-specific "not found" errors derive from this class, so that callers can
+        tell an unknown city apart from a failed request without knowing the provider.
+    """
+    pass